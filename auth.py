@@ -0,0 +1,243 @@
+import collections
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# ===== Password Hashing =====
+# Stored as "scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>", or
+# "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>" where OpenSSL lacks
+# scrypt. Bare 64-character hex strings are legacy unsalted SHA-256
+# hashes and are replaced on the next successful login.
+SCRYPT_N = 2 ** 14                # ~50 ms and 16 MB per hash
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600000
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# ===== Session Cache =====
+DEFAULT_WORKERS = 2               # Threads running the KDF
+DEFAULT_SESSION_TTL = 900         # Seconds a session stays valid without use
+DEFAULT_SESSION_LIMIT = 256       # Sessions kept before the least recent is evicted
+
+KDF_SECONDS = metrics.histogram(
+    "parking_auth_kdf_seconds", "Time spent deriving one password hash"
+)
+LOGINS_OK = metrics.counter(
+    "parking_auth_logins_total", "Login attempts", labels={"result": "ok"}
+)
+LOGINS_FAILED = metrics.counter(
+    "parking_auth_logins_total", "Login attempts", labels={"result": "failed"}
+)
+HASHES_UPGRADED = metrics.counter(
+    "parking_auth_upgraded_total", "Legacy password hashes replaced at login"
+)
+
+
+def _scrypt(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r, dklen=HASH_BYTES
+    )
+
+
+HAS_SCRYPT = hasattr(hashlib, "scrypt")
+
+
+def hash_password(password):
+    """Returns a salted, encoded hash for storing in users.password"""
+    salt = secrets.token_bytes(SALT_BYTES)
+    started = time.perf_counter()
+    if HAS_SCRYPT:
+        digest = _scrypt(password, salt)
+        encoded = f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+    else:
+        digest = hashlib.pbkdf2_hmac(
+            "sha256", password.encode(), salt, PBKDF2_ITERATIONS, HASH_BYTES
+        )
+        encoded = f"pbkdf2_sha256${PBKDF2_ITERATIONS}${salt.hex()}${digest.hex()}"
+    KDF_SECONDS.since(started)
+    return encoded
+
+
+def verify_password(password, stored):
+    """
+    Checks a password against a stored hash of any supported format.
+    Returns (matches, needs_upgrade); needs_upgrade is True for legacy or
+    weaker-than-current hashes that should be re-hashed.
+    """
+    started = time.perf_counter()
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            digest = _scrypt(password, bytes.fromhex(parts[4]), n, r, p)
+            matches = hmac.compare_digest(digest.hex(), parts[5])
+            weaker = (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            iterations = int(parts[1])
+            digest = hashlib.pbkdf2_hmac(
+                "sha256", password.encode(), bytes.fromhex(parts[2]), iterations, HASH_BYTES
+            )
+            matches = hmac.compare_digest(digest.hex(), parts[3])
+            weaker = HAS_SCRYPT or iterations < PBKDF2_ITERATIONS
+        elif len(stored) == 64:
+            digest = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(digest, stored), True
+        else:
+            return False, False
+    except ValueError:
+        return False, False  # Corrupt hash parameters
+    KDF_SECONDS.since(started)
+    return matches, matches and weaker
+
+
+class Session:
+    """An authenticated operator, identified by an opaque token"""
+    __slots__ = ("token", "user_id", "username", "role", "verifier", "expires")
+
+    def __init__(self, token, user_id, username, role, verifier, expires):
+        self.token = token
+        self.user_id = user_id
+        self.username = username
+        self.role = role
+        self.verifier = verifier      # Keyed fast hash of the password, for re-auth
+        self.expires = expires
+
+
+class SessionCache:
+    """
+    In-memory session store with a sliding TTL and LRU eviction.
+    Lookups refresh a session's expiry and recency; once limit sessions
+    exist the least recently used one is dropped. Thread-safe.
+    """
+    def __init__(self, ttl=DEFAULT_SESSION_TTL, limit=DEFAULT_SESSION_LIMIT):
+        self.ttl = ttl
+        self.limit = limit
+        self.sessions = collections.OrderedDict()  # token -> Session, oldest first
+        self.lock = threading.Lock()
+
+    def add(self, session):
+        with self.lock:
+            self.sessions[session.token] = session
+            while len(self.sessions) > self.limit:
+                self.sessions.popitem(last=False)
+
+    def get(self, token, now=None):
+        """Returns the live session for a token, or None"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            session = self.sessions.get(token)
+            if session is None:
+                return None
+            if session.expires <= now:
+                del self.sessions[token]
+                return None
+            session.expires = now + self.ttl
+            self.sessions.move_to_end(token)
+            return session
+
+    def remove(self, token):
+        with self.lock:
+            self.sessions.pop(token, None)
+
+    def remove_user(self, user_id):
+        """Drops every session of a user, e.g. after a password change"""
+        with self.lock:
+            for token in [t for t, s in self.sessions.items() if s.user_id == user_id]:
+                del self.sessions[token]
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class Authenticator:
+    """
+    Password checks and sessions for operators.
+    The KDF and the user lookup run on a small worker pool, each worker
+    reading through its own pooled connection (see database.UserStore),
+    so callers on the Tk thread get a Future back immediately.
+    Successful logins create a cached session; role checks and
+    re-authentication against it never touch the database or the KDF.
+    """
+    def __init__(self, users, workers=DEFAULT_WORKERS,
+                 session_ttl=DEFAULT_SESSION_TTL, session_limit=DEFAULT_SESSION_LIMIT):
+        self.users = users            # database.UserStore
+        self.sessions = SessionCache(session_ttl, session_limit)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth")
+        self.verifier_key = secrets.token_bytes(32)  # Never leaves the process
+        self.dummy_hash = None        # Checked for unknown users, created on first use
+
+    def _verifier(self, password):
+        return hmac.new(self.verifier_key, password.encode(), hashlib.sha256).digest()
+
+    def login(self, username, password):
+        """Returns a Future resolving to a Session, or None if rejected"""
+        return self.pool.submit(self._login, username, password)
+
+    def register(self, username, password, role="user"):
+        """
+        Returns a Future that creates a user.
+        The Future raises sqlite3.IntegrityError if the name is taken.
+        """
+        return self.pool.submit(self._register, username, password, role)
+
+    def session(self, token):
+        """Returns the live session for a token, or None"""
+        return self.sessions.get(token)
+
+    def has_role(self, token, role):
+        session = self.sessions.get(token)
+        return session is not None and session.role == role
+
+    def reauthenticate(self, token, password):
+        """
+        Confirms the password of a live session without the KDF.
+        Compares against a keyed hash kept in memory since login.
+        """
+        session = self.sessions.get(token)
+        if session is None:
+            return False
+        return hmac.compare_digest(session.verifier, self._verifier(password))
+
+    def logout(self, token):
+        self.sessions.remove(token)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def _login(self, username, password):
+        row = self.users.find(username)
+        if row is None:
+            # Spend the same time as a real check so names cannot be probed
+            if self.dummy_hash is None:
+                self.dummy_hash = hash_password(secrets.token_hex(8))
+            verify_password(password, self.dummy_hash)
+            LOGINS_FAILED.inc()
+            return None
+        user_id, stored, role = row
+        matches, needs_upgrade = verify_password(password, stored)
+        if not matches:
+            LOGINS_FAILED.inc()
+            return None
+        if needs_upgrade:
+            # Only replace the hash we checked, in case it changed meanwhile
+            if self.users.replace_password(user_id, hash_password(password), stored):
+                HASHES_UPGRADED.inc()
+        LOGINS_OK.inc()
+        session = Session(
+            secrets.token_urlsafe(24), user_id, username, role,
+            self._verifier(password), time.monotonic() + self.sessions.ttl
+        )
+        self.sessions.add(session)
+        return session
+
+    def _register(self, username, password, role):
+        self.users.add(username, hash_password(password), role)
+
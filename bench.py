@@ -0,0 +1,275 @@
+import argparse
+import collections
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import config
+from engine import ParkingEngine
+from migrations import migrate
+from mqtt_async import FakeBroker, lot_topic_prefix
+from persistence import RecordWriter
+from slot_view import format_slot_row
+
+# ===== Benchmark Defaults =====
+DEFAULT_SLOTS = 1000
+DEFAULT_RATE = 5000               # Messages per second offered to the broker
+DEFAULT_DURATION = 10.0           # Seconds of generated traffic
+DEFAULT_CHANGE_PROB = 0.05        # Share of messages that flip a slot's state
+VISIBLE_SLOTS = 48                # Cards refreshed per simulated UI tick
+PUBLISH_SLICE = 0.01              # Seconds of traffic published per burst
+
+
+def percentiles(samples):
+    """Summarises latency samples (seconds) in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) * 1000,
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1] * 1000,
+    }
+
+
+class SensorSimulator:
+    """
+    Synthetic slot sensor traffic for a FakeBroker.
+    Generates messages at a fixed rate for random slots, a share of which
+    flip the slot's state; the rest are heartbeats repeating it. Can also
+    replay a recorded "offset_seconds,topic,payload" CSV file.
+    """
+    def __init__(self, broker, lot, slot_count, rate, change_prob, seed=1):
+        self.broker = broker
+        self.prefix = lot_topic_prefix(lot)
+        self.slot_count = slot_count
+        self.rate = rate
+        self.change_prob = change_prob
+        self.random = random.Random(seed)
+        self.states = bytearray(slot_count + 1)
+        self.seq = [0] * (slot_count + 1)
+        self.published = 0
+        self.change_times = {}                           # slot -> time of last change
+        self.exit_times = collections.defaultdict(collections.deque)  # slot -> pending exits
+
+    def publish(self, slot_num, status):
+        now = time.perf_counter()
+        if status != self.states[slot_num]:
+            self.states[slot_num] = status
+            self.change_times[slot_num] = now
+            if not status:
+                self.exit_times[slot_num].append(now)
+        self.seq[slot_num] += 1
+        payload = b"occupied:%d" % self.seq[slot_num] if status else b"empty:%d" % self.seq[slot_num]
+        self.broker.publish(f"{self.prefix}{slot_num}", payload)
+        self.published += 1
+
+    def generate(self, duration):
+        """Publishes paced traffic for the given number of seconds"""
+        per_slice = max(1, int(self.rate * PUBLISH_SLICE))
+        start = time.perf_counter()
+        next_slice = start
+        while next_slice - start < duration:
+            for _ in range(per_slice):
+                slot_num = self.random.randint(1, self.slot_count)
+                status = self.states[slot_num]
+                if self.random.random() < self.change_prob:
+                    status ^= 1
+                self.publish(slot_num, status)
+            next_slice += PUBLISH_SLICE
+            delay = next_slice - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def replay(self, path, speed=1.0):
+        """Replays a recorded CSV of offset,topic,payload lines"""
+        start = time.perf_counter()
+        with open(path) as f:
+            for line in f:
+                offset, topic, payload = line.rstrip("\n").split(",", 2)
+                delay = start + float(offset) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                slot_num = int(topic.rpartition("/")[2])
+                status = 1 if payload.startswith("occupied") else 0
+                self.publish(slot_num, status)
+
+
+class BenchEngine(ParkingEngine):
+    """ParkingEngine that timestamps state updates for the benchmark"""
+    def __init__(self, simulator_ref, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.simulator_ref = simulator_ref
+        self.state_latency = []
+        self.apply_cost = []
+
+    def apply_updates(self):
+        started = time.perf_counter()
+        changed = super().apply_updates()
+        now = time.perf_counter()
+        if changed:
+            self.apply_cost.append(now - started)
+            change_times = self.simulator_ref[0].change_times
+            for slot_num in changed:
+                self.state_latency.append(now - change_times[slot_num])
+        return changed
+
+
+def bench_engine(args, workdir):
+    """Runs simulated traffic through a headless engine"""
+    broker = FakeBroker()
+    simulator_ref = [None]
+    engine = BenchEngine(
+        simulator_ref,
+        slot_count=args.slots,
+        db_path=os.path.join(workdir, "bench.db"),
+        lot_name="bench",
+        transport_factory=broker.client,
+        use_hardware=args.hardware
+    )
+    simulator = SensorSimulator(
+        broker, "bench", args.slots, args.rate, args.change_prob
+    )
+    simulator_ref[0] = simulator
+
+    durable_latency = []
+
+    def on_commit(rows):
+        now = time.perf_counter()
+        for row in rows:
+            pending = simulator.exit_times[row[0]]
+            if pending:
+                durable_latency.append(now - pending.popleft())
+
+    engine.start()
+    engine.record_writer.on_commit = on_commit
+    while not engine.mqtt_runtime.connected():
+        time.sleep(0.01)
+    consumer = threading.Thread(target=engine.run_forever, daemon=True)
+    consumer.start()
+
+    started = time.perf_counter()
+    if args.replay:
+        simulator.replay(args.replay, args.speed)
+    else:
+        simulator.generate(args.duration)
+    published_in = time.perf_counter() - started
+
+    # Let the pipeline drain before reading counters
+    deadline = time.perf_counter() + 10
+    while (engine.mqtt_runtime.stats()["received"] < simulator.published
+           and time.perf_counter() < deadline):
+        time.sleep(0.01)
+    time.sleep(config.MQTT_APPLY_MS / 1000.0 * 2)
+    engine.record_writer.flush()
+    elapsed = time.perf_counter() - started
+    ingest = engine.mqtt_runtime.stats()
+
+    # UI tick: format the visible cards and run the sensor check
+    tick_cost = []
+    visible = range(1, min(args.slots, VISIBLE_SLOTS) + 1)
+    for _ in range(200):
+        tick_started = time.perf_counter()
+        now = time.time()
+        for slot_num in visible:
+            format_slot_row(engine.slots, slot_num, now)
+        engine.check_sensors(now)
+        tick_cost.append(time.perf_counter() - tick_started)
+
+    engine.request_shutdown()
+    consumer.join()
+    written = engine.record_writer.written
+    engine.close()
+
+    return {
+        "published": simulator.published,
+        "publish_seconds": published_in,
+        "received": ingest["received"],
+        "unrouted": ingest["unrouted"],
+        "ingest_msgs_per_s": ingest["received"] / elapsed,
+        "dedup": engine.dedup.stats(),
+        "records_written": written,
+        "state_latency_ms": percentiles(engine.state_latency),
+        "apply_batch_ms": percentiles(engine.apply_cost),
+        "durable_latency_ms": percentiles(durable_latency),
+        "ui_tick_ms": percentiles(tick_cost),
+    }
+
+
+def bench_sqlite(workdir, rows=50000, single_rows=1000):
+    """Measures record insert throughput, batched and one commit per row"""
+    path = os.path.join(workdir, "insert.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    record = (1, 1700000000, 1700003600, 3600, 300)
+
+    started = time.perf_counter()
+    for _ in range(single_rows):
+        conn.execute("""
+            INSERT INTO parking_records (slot, entry_time, exit_time, duration, charge)
+            VALUES (?, ?, ?, ?, ?)
+        """, record)
+        conn.commit()
+    single_rate = single_rows / (time.perf_counter() - started)
+    conn.close()
+
+    writer = RecordWriter(path)
+    started = time.perf_counter()
+    for _ in range(rows):
+        writer.submit(record)
+    writer.flush()
+    batched_rate = rows / (time.perf_counter() - started)
+    writer.close()
+    return {
+        "commit_per_record_per_s": single_rate,
+        "record_writer_per_s": batched_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parking pipeline")
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS)
+    parser.add_argument("--rate", type=int, default=DEFAULT_RATE, help="messages per second")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    parser.add_argument("--change-prob", type=float, default=DEFAULT_CHANGE_PROB)
+    parser.add_argument("--replay", help="CSV of offset,topic,payload to replay instead")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    parser.add_argument("--hardware", action="store_true",
+                        help="also run the gate and IR sensor on fake GPIO")
+    parser.add_argument("--output", default="bench_output.json")
+    args = parser.parse_args()
+
+    config.use_fake_gpio = True
+    workdir = tempfile.mkdtemp(prefix="parking-bench-")
+    try:
+        results = {
+            "params": vars(args),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "engine": bench_engine(args, workdir),
+            "inserts": bench_sqlite(workdir),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import json
+import math
+import sqlite3
+import time
+from array import array
+
+import config
+from reports import add_revenue
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, re-pricing falls back to a Python loop
+    np = None
+
+# ===== Billing Configuration =====
+DAY = 86400
+MINUTES_PER_DAY = 1440
+REPRICE_CHUNK = 50000             # Records re-priced per write transaction
+CENT_EPSILON = 1e-6               # Float noise ignored before rounding charges up
+
+# Default pricing in cents per hour, used when no tariff file is configured
+DEFAULT_TARIFF = {
+    "bands": [["00:00", "07:00", 100], ["07:00", "19:00", 300], ["19:00", "24:00", 150]],
+    "grace_minutes": 15,
+    "daily_cap": 2000,
+}
+
+
+def parse_clock(text):
+    """Converts "HH:MM" (up to "24:00") to minutes after midnight"""
+    hours, _, minutes = text.partition(":")
+    value = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= value <= MINUTES_PER_DAY:
+        raise ValueError(f"invalid time of day: {text}")
+    return value
+
+
+class Tariff:
+    """
+    Pricing for one zone: time-of-day rates, a grace period and a cap.
+    bands are (start, end, cents_per_hour) with "HH:MM" local times; a band
+    whose end is not after its start wraps past midnight, later bands
+    override earlier ones and uncovered minutes are free. Stays up to
+    grace_minutes cost nothing; longer ones pay from entry. daily_cap
+    limits each 24 hours counted from entry.
+    The rates are kept as a cumulative cost per minute of the day, so a
+    charge is two table lookups whatever the length of the stay, and the
+    same formula evaluates whole NumPy arrays at once.
+    """
+    def __init__(self, bands, grace_minutes=0, daily_cap=None, utc_offset=0):
+        self.grace = grace_minutes * 60
+        self.daily_cap = daily_cap
+        self.utc_offset = utc_offset  # Seconds east of UTC for the local time of day
+        rates = [0.0] * MINUTES_PER_DAY
+        for start, end, cents_per_hour in bands:
+            first = parse_clock(start)
+            last = parse_clock(end)
+            minutes = range(first, last) if last > first else (
+                list(range(first, MINUTES_PER_DAY)) + list(range(last))
+            )
+            for minute in minutes:
+                rates[minute] = cents_per_hour / 3600.0
+        self.rates = array("d", rates)  # Cents per second within each minute
+        cumulative = array("d", [0.0]) * (MINUTES_PER_DAY + 1)
+        for minute, rate in enumerate(rates):
+            cumulative[minute + 1] = cumulative[minute] + rate * 60
+        self.cumulative = cumulative    # Cost from midnight to the start of each minute
+        self.day_cost = cumulative[MINUTES_PER_DAY]
+        if daily_cap is not None:
+            self.day_cost = min(self.day_cost, daily_cap)
+
+    @classmethod
+    def from_dict(cls, data, utc_offset=0):
+        return cls(
+            data.get("bands", []), data.get("grace_minutes", 0),
+            data.get("daily_cap"), utc_offset
+        )
+
+    def _cost_to(self, timestamp):
+        """Uncapped cost from the epoch's local midnight up to timestamp"""
+        days, seconds = divmod(timestamp + self.utc_offset, DAY)
+        minute, second = divmod(seconds, 60)
+        minute = int(minute)
+        return (days * self.cumulative[MINUTES_PER_DAY] + self.cumulative[minute]
+                + second * self.rates[minute])
+
+    def charge(self, entry_time, exit_time):
+        """Returns the charge in cents for one stay"""
+        duration = exit_time - entry_time
+        if duration <= self.grace:
+            return 0
+        # Every full 24 hours covers each minute of the day exactly once
+        full_days, rest = divmod(duration, DAY)
+        rest_cost = self._cost_to(exit_time) - self._cost_to(exit_time - rest)
+        if self.daily_cap is not None:
+            rest_cost = min(rest_cost, self.daily_cap)
+        return math.ceil(full_days * self.day_cost + rest_cost - CENT_EPSILON)
+
+    def _costs_to(self, timestamps):
+        days, seconds = np.divmod(timestamps + self.utc_offset, DAY)
+        minutes, second = np.divmod(seconds, 60)
+        minutes = minutes.astype(np.intp)
+        cumulative = np.frombuffer(self.cumulative, dtype=np.float64)
+        rates = np.frombuffer(self.rates, dtype=np.float64)
+        return (days * cumulative[MINUTES_PER_DAY] + cumulative[minutes]
+                + second * rates[minutes])
+
+    def charges(self, entry_times, exit_times):
+        """charge() over NumPy arrays of epoch seconds; returns int64 cents"""
+        entry_times = np.asarray(entry_times, dtype=np.int64)
+        exit_times = np.asarray(exit_times, dtype=np.int64)
+        duration = exit_times - entry_times
+        full_days, rest = np.divmod(duration, DAY)
+        rest_cost = self._costs_to(exit_times) - self._costs_to(exit_times - rest)
+        if self.daily_cap is not None:
+            rest_cost = np.minimum(rest_cost, self.daily_cap)
+        cents = np.ceil(full_days * self.day_cost + rest_cost - CENT_EPSILON)
+        return np.where(duration <= self.grace, 0, cents).astype(np.int64)
+
+
+class TariffTable:
+    """
+    Tariffs per zone, with a default for zones that have none.
+    zones maps slot number -> zone (SlotStateStore.zones); slots outside
+    it are zone 0.
+    """
+    def __init__(self, default, tariffs=None, zones=None):
+        self.default = default
+        self.tariffs = dict(tariffs or {})
+        self.zones = zones if zones is not None else array("H", [0])
+
+    def tariff_for(self, slot_num):
+        zone = self.zones[slot_num] if 0 <= slot_num < len(self.zones) else 0
+        return self.tariffs.get(zone, self.default)
+
+    def charge(self, slot_num, entry_time, exit_time):
+        """Returns the charge in cents for a stay in a slot"""
+        return self.tariff_for(slot_num).charge(entry_time, exit_time)
+
+    def charges(self, slots, entry_times, exit_times):
+        """
+        Vectorised charge() for parallel arrays. Each zone's tariff is
+        evaluated once over the stays in that zone.
+        """
+        if np is None:
+            return [self.charge(*stay) for stay in zip(slots, entry_times, exit_times)]
+        slots = np.asarray(slots, dtype=np.int64)
+        entry_times = np.asarray(entry_times, dtype=np.int64)
+        exit_times = np.asarray(exit_times, dtype=np.int64)
+        result = self.default.charges(entry_times, exit_times)
+        if self.tariffs:
+            zones = np.frombuffer(self.zones, dtype=np.uint16) if isinstance(
+                self.zones, array) else np.asarray(self.zones)
+            known = (slots >= 0) & (slots < len(zones))
+            slot_zones = np.where(known, zones[np.where(known, slots, 0)], 0)
+            for zone, tariff in self.tariffs.items():
+                mask = slot_zones == zone
+                if mask.any():
+                    result[mask] = tariff.charges(entry_times[mask], exit_times[mask])
+        return result
+
+
+def load_tariffs(path=None, zones=None):
+    """
+    Builds a TariffTable from a JSON file, or from DEFAULT_TARIFF when
+    path is None. The file holds {"default": {...}, "zones": {"<zone>":
+    {...}}, "utc_offset": seconds}; each tariff has "bands" as
+    [start, end, cents_per_hour], "grace_minutes" and "daily_cap".
+    The UTC offset defaults to the host's current one.
+    """
+    data = {"default": DEFAULT_TARIFF}
+    if path:
+        with open(path) as f:
+            data = json.load(f)
+    utc_offset = data.get("utc_offset", time.localtime().tm_gmtoff)
+    default = Tariff.from_dict(data.get("default", DEFAULT_TARIFF), utc_offset)
+    tariffs = {
+        int(zone): Tariff.from_dict(tariff, utc_offset)
+        for zone, tariff in data.get("zones", {}).items()
+    }
+    return TariffTable(default, tariffs, zones)
+
+
+def reprice(conn, table, since=None, chunk_size=REPRICE_CHUNK):
+    """
+    Recomputes the charge of every parking record that exited at or after
+    since (epoch seconds; all history by default) with a new TariffTable.
+    Records are read by id range and priced a chunk at a time; only
+    changed charges are written, in one short transaction per chunk
+    together with their rollup_revenue_daily deltas, so reporting keeps
+    running meanwhile. Returns (records_checked, records_changed).
+    """
+    select = """
+        SELECT id, slot, entry_time, exit_time, COALESCE(charge, -1)
+        FROM parking_records WHERE id > ? AND exit_time >= ? ORDER BY id LIMIT ?
+    """
+    checked = 0
+    changed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(select, (last_id, since or 0, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        checked += len(rows)
+        if np is not None:
+            ids, slots, entries, exits, old = np.array(rows, dtype=np.int64).T
+            new = table.charges(slots, entries, exits)
+            moved = np.flatnonzero(new != old)
+            updates = list(zip(new[moved].tolist(), ids[moved].tolist()))
+            # Unpriced records (-1) were never counted in the revenue rollup
+            days, day_index = np.unique(exits[moved] - exits[moved] % DAY, return_inverse=True)
+            first_priced = np.bincount(day_index, weights=old[moved] < 0)
+            deltas = np.bincount(day_index, weights=new[moved] - np.maximum(old[moved], 0))
+            revenue = {
+                day: [int(stays), int(delta)]
+                for day, stays, delta in zip(days.tolist(), first_priced, np.rint(deltas))
+            }
+        else:
+            updates = []
+            revenue = {}
+            for record_id, slot, entry, exit_, old in rows:
+                charge = table.charge(slot, entry, exit_)
+                if charge == old:
+                    continue
+                updates.append((charge, record_id))
+                totals = revenue.setdefault(exit_ - exit_ % DAY, [0, 0])
+                totals[0] += old < 0
+                totals[1] += charge - max(old, 0)
+        if not updates:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("UPDATE parking_records SET charge=? WHERE id=?", updates)
+            add_revenue(conn, revenue)
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        conn.commit()
+        changed += len(updates)
+    return checked, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-price parking history with a tariff")
+    parser.add_argument("--db", default=config.database_path, help="SQLite database path")
+    parser.add_argument("--tariffs", default=config.tariff_path,
+                        help="tariff JSON file (default: built-in tariff)")
+    parser.add_argument("--layout", default=config.layout_path,
+                        help="slot layout JSON that assigns slots to zones")
+    parser.add_argument("--slots", type=int, default=config.slot_count)
+    parser.add_argument("--since", help="only stays that ended on or after YYYY-MM-DD")
+    args = parser.parse_args()
+
+    since = None
+    if args.since:
+        since = int(time.mktime(time.strptime(args.since, "%Y-%m-%d")))
+    from persistence import connect
+    from slot_layout import load_layout
+    zones = load_layout(args.layout, args.slots).zones
+    conn = connect(args.db)
+    conn.isolation_level = None  # reprice() manages its own transactions
+    try:
+        started = time.perf_counter()
+        checked, changed = reprice(conn, load_tariffs(args.tariffs, zones), since)
+        print(f"Re-priced {checked} records, {changed} changed, "
+              f"in {time.perf_counter() - started:.1f} s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+
+# ===== Global Configuration =====
+# MQTT broker settings for communication
+mqtt_broker = os.environ.get("PARKING_MQTT_BROKER", "broker.hivemq.com")  # Public MQTT broker
+mqtt_port = int(os.environ.get("PARKING_MQTT_PORT", "1883"))              # Default MQTT port
+topic_prefix = "parking/slots/"    # Legacy single-lot topic prefix
+lot_name = os.environ.get("PARKING_LOT", "main")  # Lot served by this engine: parking/<lot>/slots/<n>
+accept_legacy_topics = True        # Also read parking/slots/<n> into this lot
+MQTT_SHARDS = 1                    # Broker connections used for lot subscriptions
+MQTT_APPLY_MS = 100                # Interval for applying queued slot updates
+TIMER_TICK_MS = 50                 # Resolution of the shared timer wheel
+SENSOR_TTL = 90                    # Seconds of silence before a slot sensor counts as dead
+SENSOR_CHECK_S = 10                # Interval between dead-sensor checks
+INGEST_PROCESSES = int(os.environ.get("PARKING_INGEST_PROCESSES", "0"))  # Worker processes, 0 ingests in-process
+
+# ===== Database Configuration =====
+database_path = os.environ.get("PARKING_DB", "parking_system.db")
+RECORD_BATCH_SIZE = 200            # Parking records per write transaction
+RECORD_FLUSH_MS = 500              # Longest delay before a record is committed
+journal_path = os.environ.get("PARKING_JOURNAL")  # Session journal, defaults to <database>.journal
+JOURNAL_CHECKPOINT_S = 60          # Interval for folding the journal into a slot snapshot
+capture_path = os.environ.get("PARKING_CAPTURE")  # Record raw MQTT/IR input for replay.py (a new file per start)
+tariff_path = os.environ.get("PARKING_TARIFFS")  # Tariff JSON (see billing.py), built-in tariff if unset
+
+# ===== Metrics Configuration =====
+METRICS_HOST = "127.0.0.1"         # Prometheus endpoint is local-only by default
+METRICS_PORT = int(os.environ.get("PARKING_METRICS_PORT", "9108"))  # 0 disables /metrics
+METRICS_LOG_S = 60                 # Interval of the metrics summary line, 0 disables it
+
+# ===== Authentication Configuration =====
+AUTH_WORKERS = 2                   # Threads running password hashing off the GUI thread
+SESSION_TTL_S = 900                # Idle seconds before a cached session expires
+SESSION_CACHE_SIZE = 256           # Sessions kept before least-recently-used eviction
+
+# ===== Lot Configuration =====
+slot_count = int(os.environ.get("PARKING_SLOT_COUNT", "2"))  # Slots managed by the engine
+layout_path = os.environ.get("PARKING_LAYOUT")  # Slot levels/zones/positions (see slot_layout.py)
+
+# ===== GPIO Configuration =====
+# Pin definitions for hardware components
+SERVO_PIN = 17                    # GPIO pin for servo motor control
+SERVO_FREQUENCY = 50              # PWM frequency: 50Hz
+IR_PIN = 4                        # GPIO pin for IR sensor input
+IR_BOUNCE_MS = 50                 # Driver debounce for IR sensor edges
+IR_HOLDOFF_MS = 200               # Minimum time between accepted IR edges
+IR_DRAIN_BATCH = 32               # Max sensor events handled per wakeup
+use_fake_gpio = os.environ.get("PARKING_FAKE_GPIO") == "1"  # Force the off-Pi backend
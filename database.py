@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from auth import hash_password
+from migrations import migrate
+from persistence import connect
+
+
+class ConnectionPool:
+    """
+    Per-thread SQLite connections to one database file.
+    Each thread gets at most one read connection (query_only) and one write
+    connection, created on first use and kept so their prepared-statement
+    caches stay warm. Writes go through transaction(), which takes the
+    write lock up front with BEGIN IMMEDIATE: under WAL, readers on other
+    threads carry on meanwhile and a competing writer waits on the busy
+    timeout instead of failing with "database is locked".
+    """
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []         # Every connection handed out, for close()
+
+    def _open(self, read_only):
+        conn = connect(self.path, read_only=read_only)
+        with self.lock:
+            self.connections.append(conn)
+        return conn
+
+    def reader(self):
+        """Returns this thread's read-only connection"""
+        conn = getattr(self.local, "reader", None)
+        if conn is None:
+            conn = self.local.reader = self._open(read_only=True)
+        return conn
+
+    def writer(self):
+        """Returns this thread's write connection"""
+        conn = getattr(self.local, "writer", None)
+        if conn is None:
+            conn = self.local.writer = self._open(read_only=False)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Runs a block in an immediate write transaction on this thread's writer"""
+        conn = self.writer()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def close(self):
+        """Closes every connection; call once all users have stopped"""
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            conn.close()
+        self.local = threading.local()
+
+
+class UserStore:
+    """Data access for the users table"""
+    def __init__(self, pool):
+        self.pool = pool
+
+    def find(self, username):
+        """Returns (id, password_hash, role) for a username, or None"""
+        return self.pool.reader().execute(
+            "SELECT id, password, role FROM users WHERE username=?", (username,)
+        ).fetchone()
+
+    def add(self, username, password_hash, role):
+        """Creates a user; raises sqlite3.IntegrityError if the name is taken"""
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                (username, password_hash, role)
+            )
+
+    def replace_password(self, user_id, new_hash, old_hash):
+        """
+        Swaps a user's password hash if it still equals old_hash.
+        Returns False when another writer changed it first.
+        """
+        with self.pool.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE users SET password=? WHERE id=? AND password=?",
+                (new_hash, user_id, old_hash)
+            )
+        return cursor.rowcount == 1
+
+
+def open_database(path):
+    """
+    Opens the parking database and migrates it to the current schema.
+    Sets up default admin user if not exists. Returns a ConnectionPool.
+    """
+    pool = ConnectionPool(path)
+
+    # Create or upgrade tables to the latest schema version
+    migrate(pool.writer())
+
+    # Create default admin account; hashing is slow, so only when missing
+    users = UserStore(pool)
+    if users.find("admin") is None:
+        try:
+            users.add("admin", hash_password("admin123"), "admin")
+        except sqlite3.IntegrityError:
+            # Created concurrently by another process
+            pass
+    return pool
@@ -0,0 +1,143 @@
+import time
+from array import array
+
+# ===== Dedup Configuration =====
+SENSOR_TTL = 90.0                 # Seconds without any message before a sensor counts as dead
+SEQ_REORDER_WINDOW = 16           # Sequences at most this far behind count as reordered
+RESTART_SEQ = 1                   # First sequence number a controller sends after boot
+RESTART_GAP = 5.0                 # Seconds of silence after which a lower sequence is a restart
+UNKNOWN = 255                     # last_state value before the first message
+
+
+def _is_stale(seq, last_seq, silence):
+    """
+    True when seq is an old, reordered message rather than a new one.
+    A rebooted controller starts again at RESTART_SEQ, but that message
+    may be lost, so a sequence far below the last one, or one arriving
+    after RESTART_GAP seconds of silence, is taken as a restart too.
+    """
+    return (seq != RESTART_SEQ and seq <= last_seq
+            and last_seq - seq < SEQ_REORDER_WINDOW and silence < RESTART_GAP)
+
+
+class DedupFilter:
+    """
+    State-change filter placed in front of a slot update sink.
+    Keeps the last state, sequence number and arrival time per slot.
+    Repeats of the current state (heartbeats) and out-of-order sequence
+    numbers only refresh the sensor's last-seen time; real changes are
+    forwarded downstream, so downstream work follows car movements rather
+    than the sensors' publish rate.
+    Designed to be fed from a single ingestion thread. last_seen may be
+    passed in (any writable "d" buffer of slot_count + 1 entries) to keep
+    the arrival times somewhere other processes can read them.
+    """
+    def __init__(self, slot_count, downstream, ttl=SENSOR_TTL, last_seen=None):
+        size = slot_count + 1
+        self.slot_count = slot_count
+        self.downstream = downstream
+        self.ttl = ttl
+        self.last_state = bytearray([UNKNOWN]) * size
+        self.last_seq = array("q", [-1]) * size
+        if last_seen is None:
+            last_seen = array("d", [0.0]) * size
+        self.last_seen = last_seen
+        self.frame_bits = {}          # controller -> last occupancy bitfield
+        self.frame_seq = {}           # controller -> last frame sequence
+        self.frame_seen = {}          # controller -> arrival time of its last frame
+        self.delivered = 0            # Messages forwarded as state changes
+        self.suppressed = 0           # Repeats of the current state
+        self.stale = 0                # Messages older than the last sequence seen
+
+    def put(self, slot_num, status, timestamp=None, seq=None):
+        """
+        Offers a slot status to the filter.
+        Returns True when it was forwarded downstream.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        silence = timestamp - self.last_seen[slot_num]
+        self.last_seen[slot_num] = timestamp
+
+        if seq is not None:
+            if _is_stale(seq, self.last_seq[slot_num], silence):
+                self.stale += 1
+                return False
+            self.last_seq[slot_num] = seq
+
+        if self.last_state[slot_num] == status:
+            self.suppressed += 1
+            return False
+        self.last_state[slot_num] = status
+        self.delivered += 1
+        self.downstream.put(slot_num, status, timestamp)
+        return True
+
+    def put_frame(self, controller, frame, timestamp=None):
+        """
+        Offers a decoded multi-slot frame (see frames.py) to the filter.
+        Only bits that differ from the controller's previous frame are
+        examined, so a frame with no changes costs O(1) Python work apart
+        from the last-seen refresh. Returns the number of slots forwarded.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        silence = timestamp - self.frame_seen.get(controller, 0.0)
+        self.frame_seen[controller] = timestamp
+        if _is_stale(frame.seq, self.frame_seq.get(controller, -1), silence):
+            self.stale += frame.count
+            return 0
+        self.frame_seq[controller] = frame.seq
+
+        first = max(frame.first_slot, 1)
+        last = min(frame.first_slot + frame.count - 1, self.slot_count)
+        if first > last:
+            return 0
+        span = last - first + 1
+        self.last_seen[first:last + 1] = array("d", [timestamp]) * span
+
+        bits = frame.occupancy_bits()
+        previous = self.frame_bits.get(controller)
+        changed = bits ^ previous if previous is not None else (1 << frame.count) - 1
+        self.frame_bits[controller] = bits
+
+        forwarded = 0
+        offset = frame.first_slot
+        while changed:
+            low = changed & -changed
+            i = low.bit_length() - 1
+            changed ^= low
+            slot_num = offset + i
+            if slot_num < first or slot_num > last:
+                continue
+            status = 1 if bits & low else 0
+            if self.last_state[slot_num] == status:
+                continue
+            self.last_state[slot_num] = status
+            self.downstream.put(slot_num, status, timestamp)
+            forwarded += 1
+        self.delivered += forwarded
+        self.suppressed += span - forwarded
+        return forwarded
+
+    def dead_sensors(self, now=None):
+        """
+        Returns slots that have reported before but have been silent for
+        longer than the TTL. Slots that never reported are not listed.
+        """
+        if now is None:
+            now = time.time()
+        cutoff = now - self.ttl
+        last_seen = self.last_seen
+        return [
+            slot_num for slot_num in range(1, self.slot_count + 1)
+            if 0.0 < last_seen[slot_num] < cutoff
+        ]
+
+    def stats(self):
+        """Returns delivered vs. suppressed message counts"""
+        return {
+            "delivered": self.delivered,
+            "suppressed": self.suppressed,
+            "stale": self.stale,
+        }
@@ -0,0 +1,515 @@
+import argparse
+import functools
+import signal
+import threading
+import time
+
+import config
+import hardware
+import metrics
+from billing import load_tariffs
+from database import open_database
+from gate_controller import GateController
+from gpio_events import EdgeSensor
+from dedup import DedupFilter
+from journal import SessionJournal
+from mqtt_async import AsyncIngestRuntime, PahoTransport
+from mqtt_ingest import SlotUpdateQueue
+from persistence import RecordWriter, recover_sessions, submit_stay
+from replay import CaptureLog, rotated_path
+from shared_ingest import IngestCluster, parse_lots
+from slot_layout import NearestSlotAllocator, load_layout, parse_flags
+from slot_store import SlotStateStore
+from timer_wheel import TimerWheel
+
+APPLY_SECONDS = metrics.histogram(
+    "parking_apply_seconds", "Time to apply one batch of queued slot updates"
+)
+RECORDS_SUBMITTED = metrics.counter(
+    "parking_records_submitted_total", "Finished stays queued for writing"
+)
+GATE_REQUESTS_OPEN = metrics.counter(
+    "parking_gate_requests_total", "Gate intents posted", labels={"target": "open"}
+)
+GATE_REQUESTS_CLOSE = metrics.counter(
+    "parking_gate_requests_total", "Gate intents posted", labels={"target": "closed"}
+)
+
+
+class ParkingEngine:
+    """
+    UI-free core of the parking system.
+    Owns slot state, MQTT ingestion, record persistence, the gate and the
+    IR sensor. Construction is cheap and has no side effects; the database
+    is opened by open_database() and hardware/network services only start
+    in start(), so the engine can run headless or behind any frontend.
+    With processes > 0, ingestion and record writing move to an
+    IngestCluster and self.slots reads its shared memory; lots then maps
+    every lot to its slot count, laid out one after another.
+    """
+    def __init__(self, slot_count=None, db_path=None, use_mqtt=True,
+                 use_hardware=True, lot_name=None, transport_factory=None,
+                 journal_path=None, processes=None, lots=None, layout=None,
+                 clock=None):
+        self.slot_count = slot_count or config.slot_count
+        self.lot_name = lot_name or config.lot_name
+        self.lots = dict(lots or {self.lot_name: self.slot_count})
+        self.processes = config.INGEST_PROCESSES if processes is None else processes
+        if self.processes:
+            self.slot_count = sum(self.lots.values())
+        self.transport_factory = transport_factory  # Defaults to a paho connection
+        self.db_path = db_path or config.database_path
+        self.journal_path = journal_path or config.journal_path or self.db_path + ".journal"
+        self.use_mqtt = use_mqtt
+        self.use_hardware = use_hardware
+        # Anything with time()/monotonic(); replays pass a VirtualClock
+        self.clock = clock or time
+
+        # Level, zone, position and flags of every slot
+        self.layout = layout or load_layout(config.layout_path, self.slot_count)
+        if self.layout.slot_count != self.slot_count:
+            raise ValueError(
+                f"layout has {self.layout.slot_count} slots, expected {self.slot_count}"
+            )
+        # Occupancy and timing for every slot
+        self.slots = SlotStateStore(self.slot_count, self.layout.zones[1:])
+        self.allocator = None         # NearestSlotAllocator, built by start()
+        # MQTT updates reach the consumer thread through this queue,
+        # after repeats and heartbeats have been filtered out
+        self.slot_updates = SlotUpdateQueue()
+        self.dedup = DedupFilter(self.slot_count, self.slot_updates, config.SENSOR_TTL)
+        self.dead_sensors = set()
+        # All periodic work runs from this wheel, driven by the frontend's loop
+        self.timers = TimerWheel(tick=config.TIMER_TICK_MS / 1000.0, clock=self.clock.monotonic)
+        self.service_timers = []      # Handles of the timers start() registered
+
+        self.tariffs = None           # TariffTable pricing stays at exit, loaded by start()
+        self.db = None                # ConnectionPool, see open_database()
+        self.journal = None           # SessionJournal of entries/exits since the last checkpoint
+        self.pending_checkpoint = None  # (FlushRequest, snapshot, journal position) being saved
+        self.checkpoint_poll = None   # Timer checking on the pending checkpoint
+        self.record_writer = None
+        self.mqtt_runtime = None
+        self.cluster = None           # IngestCluster in multi-process mode
+        self.gate = None
+        self.ir_sensor = None
+        self.metrics_server = None
+        self.capture = None           # CaptureLog of raw inputs, see config.capture_path
+        self.running = False
+        self.wakeup = threading.Event()    # Set when work arrives for run_forever
+        self.shutdown = threading.Event()  # Set to end run_forever
+
+    def open_database(self):
+        """
+        Opens (and migrates) the database on first use.
+        Returns the engine's ConnectionPool; each thread reads and writes
+        through its own connections from it.
+        """
+        if self.db is None:
+            self.db = open_database(self.db_path)
+        return self.db
+
+    def start(self, ir_notify=None):
+        """
+        Starts the record writer, gate, IR sensor and MQTT client.
+        ir_notify is called from the GPIO thread when sensor edges arrive,
+        so the GUI can wake its Tk loop; without it they wake run_forever().
+        """
+        if self.running:
+            return
+        self.open_database()
+        self.tariffs = load_tariffs(config.tariff_path, self.layout.zones)
+
+        if self.processes and self.use_mqtt:
+            # Worker processes ingest; their writer process owns records and journal
+            self.start_cluster()
+        else:
+            # Parking records are written in batches by a background thread
+            self.record_writer = RecordWriter(
+                self.db_path,
+                batch_size=config.RECORD_BATCH_SIZE,
+                flush_ms=config.RECORD_FLUSH_MS
+            )
+            # Cars parked before a restart get their entry times back
+            self.recover_sessions()
+
+        if self.use_hardware:
+            # Gate servo is driven from its own worker thread
+            self.gate = GateController(hardware.get_servo())
+
+            # IR sensor edges are queued by the GPIO callback thread
+            self.ir_sensor = EdgeSensor(
+                hardware.get_gpio(), config.IR_PIN,
+                bounce_ms=config.IR_BOUNCE_MS,
+                holdoff_ms=config.IR_HOLDOFF_MS,
+                notify=ir_notify or self.wakeup.set
+            )
+            self.ir_sensor.start()
+
+        # Built once slots hold their recovered state
+        self.allocator = NearestSlotAllocator(self.layout, self.slots.occupied)
+
+        if config.capture_path and self.cluster is None:
+            self.capture = CaptureLog(rotated_path(config.capture_path))
+            print(f"Capturing input to {self.capture.path}")
+        if self.use_mqtt and self.cluster is None:
+            self.setup_mqtt()
+        self.setup_metrics()
+        self.service_timers = [
+            self.timers.call_every(config.SENSOR_CHECK_S, self.check_sensors),
+        ]
+        if self.journal is not None:
+            self.service_timers.append(
+                self.timers.call_every(config.JOURNAL_CHECKPOINT_S, self.checkpoint)
+            )
+        self.shutdown.clear()
+        self.running = True
+
+    def request_shutdown(self):
+        """Asks run_forever to return; safe to call from signal handlers"""
+        self.shutdown.set()
+        self.wakeup.set()
+
+    def stop(self):
+        """Stops every background service and flushes pending records"""
+        if not self.running:
+            return
+        self.running = False
+        self.allocator = None
+        self.request_shutdown()
+        for handle in self.service_timers:
+            handle.cancel()
+        self.service_timers = []
+        if self.checkpoint_poll is not None:
+            self.checkpoint_poll.cancel()
+            self.checkpoint_poll = None
+        self.pending_checkpoint = None
+        if self.mqtt_runtime is not None:
+            self.mqtt_runtime.stop()
+            self.mqtt_runtime = None
+        if self.ir_sensor is not None:
+            self.ir_sensor.stop()
+            self.ir_sensor = None
+        if self.gate is not None:
+            self.gate.stop(timeout=2)
+            self.gate = None
+        if self.cluster is not None:
+            # The cluster's writer drains and checkpoints on its own
+            self.cluster.stop()
+            self.cluster = None
+            self.slots = SlotStateStore(self.slot_count, self.layout.zones[1:])
+        else:
+            # Apply anything still queued so finished stays are recorded
+            self.apply_updates()
+            saved = self.record_writer.close(timeout=5)
+            self.record_writer = None
+            if saved:
+                # Leave an empty journal behind so the next start only loads the snapshot
+                self.journal.checkpoint(self.slots)
+            else:
+                print("Some parking records were not saved; the next start recovers them "
+                      "from the session journal")
+            self.journal.close()
+            self.journal = None
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+
+    def close(self):
+        """Stops the engine and closes the database"""
+        self.stop()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def recover_sessions(self):
+        """
+        Restores slot state from the session journal and re-queues
+        replayed stays the database does not have yet.
+        """
+        self.journal = SessionJournal(self.journal_path)
+        recover_sessions(self.journal, self.slots, self.db.reader(), self.save_record)
+
+    def checkpoint(self):
+        """
+        Starts folding the journal into a slot snapshot; runs every
+        JOURNAL_CHECKPOINT_S. The snapshot and journal position are taken
+        now and the record writer is asked to flush, without waiting for
+        it; finish_checkpoint() writes the checkpoint once every record
+        submitted before it is committed, so no exit leaves the journal
+        before its record is durable.
+        """
+        if self.journal is None or not self.journal.events or self.pending_checkpoint:
+            return
+        self.pending_checkpoint = (
+            self.record_writer.request_flush(), self.slots.snapshot(), self.journal.position
+        )
+        self.checkpoint_poll = self.timers.call_later(self.timers.tick, self.finish_checkpoint)
+
+    def finish_checkpoint(self):
+        """Polled from the timer wheel until the checkpoint's flush is done"""
+        flushed, snapshot, position = self.pending_checkpoint
+        if not flushed.done():
+            self.checkpoint_poll = self.timers.call_later(self.timers.tick, self.finish_checkpoint)
+            return
+        self.pending_checkpoint = None
+        self.checkpoint_poll = None
+        if flushed.ok:
+            self.journal.checkpoint_at(snapshot, position)
+        else:
+            print("Keeping the session journal until failed parking records are saved")
+
+    def start_cluster(self):
+        """
+        Starts the multi-process ingestion cluster and switches self.slots
+        to its shared state. Blocks until the writer process has recovered
+        the journal. The transport factory is sent to the workers, so it
+        must be picklable (no lambdas).
+        """
+        transport_factory = self.transport_factory or functools.partial(
+            PahoTransport, config.mqtt_broker, config.mqtt_port
+        )
+        self.cluster = IngestCluster(
+            self.lots, self.db_path, self.journal_path, self.processes,
+            transport_factory,
+            legacy_lot=self.lot_name if config.accept_legacy_topics else None,
+            zones=self.layout.zones[1:]
+        )
+        self.cluster.start()
+        self.slots = self.cluster.slots
+        metrics.gauge(
+            "parking_ingest_messages", "MQTT messages seen by the ingestion workers",
+            fn=lambda: self.cluster.received() if self.cluster else 0
+        )
+
+    def setup_mqtt(self):
+        """
+        Starts the asyncio MQTT runtime for this engine's lot.
+        Returns immediately; the connection is made in the background with
+        backoff, so an unreachable broker never blocks startup.
+        """
+        transport_factory = self.transport_factory or (
+            lambda: PahoTransport(config.mqtt_broker, config.mqtt_port)
+        )
+        self.mqtt_runtime = AsyncIngestRuntime(
+            {self.lot_name: self.slot_count},
+            {self.lot_name: self.dedup},
+            transport_factory,
+            shard_count=config.MQTT_SHARDS,
+            legacy_lot=self.lot_name if config.accept_legacy_topics else None,
+            tap=self.capture.record_message if self.capture else None
+        )
+        self.mqtt_runtime.start()
+
+    def setup_metrics(self):
+        """
+        Registers the engine's gauges and starts the /metrics endpoint and
+        the periodic summary line, as configured.
+        """
+        metrics.gauge(
+            "parking_slots_occupied", "Slots currently occupied",
+            fn=lambda: self.slots.occupied_count
+        )
+        metrics.gauge(
+            "parking_update_queue_depth", "Slot updates waiting to be applied",
+            fn=lambda: self.slot_updates.queue.qsize()
+        )
+        metrics.gauge(
+            "parking_record_queue_depth", "Parking records waiting to be committed",
+            fn=lambda: self.record_writer.pending() if self.record_writer else 0
+        )
+        metrics.gauge(
+            "parking_dead_sensors", "Slot sensors silent for longer than the TTL",
+            fn=lambda: len(self.dead_sensors)
+        )
+        for result in ("delivered", "suppressed", "stale"):
+            metrics.counter(
+                "parking_dedup_messages_total",
+                "Slot messages by dedup result: state changes forwarded, "
+                "repeats suppressed, out-of-order dropped",
+                labels={"result": result},
+                fn=functools.partial(lambda key: self.dedup_stats()[key], result)
+            )
+        self.metrics_server = metrics.MetricsServer(
+            config.METRICS_HOST, config.METRICS_PORT, config.METRICS_LOG_S
+        )
+        self.metrics_server.start()
+
+    def dedup_stats(self):
+        """Returns delivered/suppressed/stale message counts, from the workers in cluster mode"""
+        if self.cluster is not None:
+            return self.cluster.dedup_stats()
+        return self.dedup.stats()
+
+    def apply_updates(self):
+        """
+        Applies queued slot updates on the consumer thread.
+        Bursts are coalesced per slot, while every entry/exit in the burst
+        is still timed and recorded. Returns the slots that changed.
+        """
+        if self.cluster is not None:
+            # Workers already applied them; report what changed since last time
+            changed = self.cluster.slots.changed_slots()
+            if self.allocator is not None:
+                occupied = self.slots.occupied
+                for slot_num in changed:
+                    if not occupied[slot_num]:
+                        self.allocator.release(slot_num)
+            return changed
+        started = time.perf_counter()
+        changes = self.slot_updates.drain(self.slots.occupied)
+        for slot_num, transitions in changes.items():
+            for occupied, timestamp in transitions:
+                if occupied:
+                    self.start_timer(slot_num, timestamp)
+                else:
+                    self.stop_timer(slot_num, timestamp)
+        if changes:
+            APPLY_SECONDS.since(started)
+        return list(changes)
+
+    def check_sensors(self, now=None):
+        """
+        Reports slot sensors that stopped sending heartbeats.
+        Runs every SENSOR_CHECK_S from the timer wheel.
+        """
+        if now is None:
+            now = self.clock.time()
+        if self.cluster is not None:
+            dead = set(self.cluster.slots.dead_sensors(now, config.SENSOR_TTL))
+        else:
+            dead = set(self.dedup.dead_sensors(now))
+        for slot_num in sorted(dead - self.dead_sensors):
+            print(f"Sensor for slot {slot_num} silent for over {config.SENSOR_TTL}s")
+        self.dead_sensors = dead
+        return dead
+
+    def start_timer(self, slot_num, entry_time=None):
+        """Records the entry time of a car parking in a slot"""
+        if entry_time is None:
+            entry_time = self.clock.time()
+        if self.slots.set_occupied(slot_num, entry_time) and self.journal is not None:
+            self.journal.log_entry(slot_num, entry_time)
+
+    def stop_timer(self, slot_num, exit_time=None):
+        """
+        Stops timing for a parking slot.
+        Records exit time and saves the finished stay.
+        """
+        if exit_time is None:
+            exit_time = self.clock.time()
+        entry_time = self.slots.set_empty(slot_num, exit_time)
+        if entry_time is not None:
+            if self.allocator is not None:
+                self.allocator.release(slot_num)
+            if self.journal is not None:
+                self.journal.log_exit(slot_num, exit_time)
+            # Save parking record
+            self.save_record(slot_num, entry_time, exit_time)
+
+    def nearest_free_slot(self, entrance=None, flags=(), zone=None):
+        """
+        Returns the free slot closest to an entrance that has every flag
+        in flags ("ev", "accessible") and is in zone, if given; None when
+        nothing matches. Call from the thread that applies updates.
+        """
+        if self.allocator is None:
+            return None
+        return self.allocator.nearest_free(
+            entrance or next(iter(self.layout.entrances)), parse_flags(flags), zone
+        )
+
+    def save_record(self, slot, entry_time, exit_time):
+        """
+        Queues a parking record for the background writer.
+        Records slot number, entry/exit epoch seconds, duration seconds and
+        the charge in cents under the current tariffs.
+        """
+        submit_stay(self.record_writer, self.tariffs, slot, entry_time, exit_time)
+        RECORDS_SUBMITTED.inc()
+
+    def handle_ir_events(self):
+        """
+        Drains queued IR sensor edges and controls gate accordingly.
+        Only the latest level in a batch decides the gate intent.
+        Returns True if more events are still queued.
+        """
+        if self.ir_sensor is None:
+            return False
+        events = self.ir_sensor.drain(config.IR_DRAIN_BATCH)
+        if self.capture is not None:
+            for event in events:
+                self.capture.record_edge(event.level, event.timestamp)
+        if events:
+            if events[-1].level:
+                self.open_gate()
+            else:
+                self.close_gate()
+        return self.ir_sensor.pending() > 0
+
+    def open_gate(self):
+        """Posts an intent to open the parking gate"""
+        if self.gate is not None:
+            GATE_REQUESTS_OPEN.inc()
+            self.gate.request_open()
+
+    def close_gate(self):
+        """Posts an intent to close the parking gate"""
+        if self.gate is not None:
+            GATE_REQUESTS_CLOSE.inc()
+            self.gate.request_close()
+
+    def run_forever(self):
+        """
+        Headless consumer loop.
+        Drives the timer wheel, which applies MQTT updates every
+        MQTT_APPLY_MS, and reacts to IR edges as soon as the sensor wakes
+        it, until stop() is called.
+        """
+        apply_timer = self.timers.call_every(config.MQTT_APPLY_MS / 1000.0, self.apply_updates)
+        try:
+            while not self.shutdown.is_set():
+                self.wakeup.wait(self.timers.time_until_next())
+                self.wakeup.clear()
+                self.timers.advance()
+                while self.handle_ir_events():
+                    pass
+        finally:
+            apply_timer.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the parking engine without a GUI")
+    parser.add_argument("--slots", type=int, default=config.slot_count)
+    parser.add_argument("--db", default=config.database_path)
+    parser.add_argument("--no-mqtt", action="store_true", help="do not connect to the broker")
+    parser.add_argument("--no-hardware", action="store_true", help="skip gate and IR sensor")
+    parser.add_argument("--processes", type=int, default=config.INGEST_PROCESSES,
+                        help="ingestion worker processes, 0 ingests in-process")
+    parser.add_argument("--lots", help='lots for multi-process mode, e.g. "north:500,south:800"')
+    args = parser.parse_args()
+
+    engine = ParkingEngine(
+        slot_count=args.slots,
+        db_path=args.db,
+        use_mqtt=not args.no_mqtt,
+        use_hardware=not args.no_hardware,
+        processes=args.processes,
+        lots=parse_lots(args.lots) if args.lots else None
+    )
+    signal.signal(signal.SIGINT, lambda signum, frame: engine.request_shutdown())
+    signal.signal(signal.SIGTERM, lambda signum, frame: engine.request_shutdown())
+    try:
+        engine.start()
+        print(f"Parking engine running with {engine.slot_count} slots")
+        engine.run_forever()
+    finally:
+        engine.close()
+        hardware.cleanup()
+
+
+if __name__ == "__main__":
+    main()
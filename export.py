@@ -0,0 +1,139 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+
+import config
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for the npz format
+    np = None
+
+# ===== Export Configuration =====
+DEFAULT_CHUNK_SIZE = 10000        # Rows fetched (and written) per page
+COLUMNS = ("id", "slot", "entry_time", "exit_time", "duration", "charge")
+UNPRICED = -1                     # charge written to npz for stays never priced (NULL)
+
+PAGE_QUERY = """
+    SELECT id, slot, entry_time, exit_time, duration, charge
+    FROM parking_records WHERE id > ? ORDER BY id LIMIT ?
+"""
+# int64 arrays cannot hold NULL, so unpriced legacy rows get UNPRICED
+NPZ_PAGE_QUERY = f"""
+    SELECT id, slot, entry_time, exit_time, duration, COALESCE(charge, {UNPRICED})
+    FROM parking_records WHERE id > ? ORDER BY id LIMIT ?
+"""
+
+
+def iter_pages(conn, after_id=0, chunk_size=DEFAULT_CHUNK_SIZE, query=PAGE_QUERY):
+    """
+    Yields parking_records rows one page at a time, ordered by id.
+    Uses keyset pagination (id > last seen id) so each page is an index
+    range scan and memory use is bounded by chunk_size.
+    """
+    last_id = after_id
+    while True:
+        rows = conn.execute(query, (last_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def load_state(state_path):
+    """Returns the last exported id recorded in a state file, or 0"""
+    try:
+        with open(state_path) as f:
+            return int(json.load(f)["last_id"])
+    except FileNotFoundError:
+        return 0
+
+
+def save_state(state_path, last_id):
+    """Atomically records the last exported id"""
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"last_id": last_id}, f)
+    os.replace(tmp_path, state_path)
+
+
+def export_csv(conn, output_path, after_id=0, chunk_size=DEFAULT_CHUNK_SIZE,
+               state_path=None):
+    """
+    Streams parking_records to a CSV file.
+    When resuming (after_id > 0) rows are appended without a new header.
+    Returns (rows_written, last_id).
+    """
+    written = 0
+    last_id = after_id
+    mode = "a" if after_id else "w"
+    with open(output_path, mode, newline="") as f:
+        writer = csv.writer(f)
+        if not after_id:
+            writer.writerow(COLUMNS)
+        for rows in iter_pages(conn, after_id, chunk_size):
+            writer.writerows(rows)
+            written += len(rows)
+            last_id = rows[-1][0]
+            if state_path:
+                f.flush()
+                save_state(state_path, last_id)
+    return written, last_id
+
+
+def export_npz(conn, output_dir, after_id=0, chunk_size=DEFAULT_CHUNK_SIZE,
+               state_path=None):
+    """
+    Streams parking_records to column-chunked NumPy .npz files.
+    Each page becomes records_<first id>_<last id>.npz holding one int64
+    array per column; charge is UNPRICED for stays that were never
+    priced. Returns (rows_written, last_id).
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for the npz export format")
+    os.makedirs(output_dir, exist_ok=True)
+    written = 0
+    last_id = after_id
+    for rows in iter_pages(conn, after_id, chunk_size, NPZ_PAGE_QUERY):
+        table = np.array(rows, dtype=np.int64)
+        first_id, last_id = int(table[0, 0]), int(table[-1, 0])
+        path = os.path.join(output_dir, f"records_{first_id:012d}_{last_id:012d}.npz")
+        np.savez(path, **{name: table[:, i] for i, name in enumerate(COLUMNS)})
+        written += len(rows)
+        if state_path:
+            save_state(state_path, last_id)
+    return written, last_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export parking history")
+    parser.add_argument("--db", default=config.database_path, help="SQLite database path")
+    parser.add_argument("--format", choices=("csv", "npz"), default="csv")
+    parser.add_argument("--output", required=True,
+                        help="CSV file, or directory for npz chunks")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--resume", action="store_true",
+                        help="continue after the last id of a previous run")
+    args = parser.parse_args()
+
+    state_path = args.output.rstrip(os.sep) + ".state"
+    after_id = load_state(state_path) if args.resume else 0
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        if args.format == "csv":
+            written, last_id = export_csv(
+                conn, args.output, after_id, args.chunk_size, state_path
+            )
+        else:
+            written, last_id = export_npz(
+                conn, args.output, after_id, args.chunk_size, state_path
+            )
+    finally:
+        conn.close()
+    print(f"Exported {written} records (last id {last_id})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import struct
+
+# ===== Binary Frame Format =====
+# A frame reports many slots of one controller in a single MQTT message:
+#
+#   version     uint8   FRAME_VERSION
+#   flags       uint8   FLAG_DISTANCES | FLAG_TIMESTAMP
+#   first_slot  uint16  slot number of bit 0
+#   count       uint16  number of slots in the frame
+#   seq         uint32  per-controller sequence number
+#   [timestamp  uint32] controller epoch seconds, if FLAG_TIMESTAMP
+#   bitfield    ceil(count / 8) bytes, bit i (LSB first) = slot first_slot + i occupied
+#   [distances  count bytes] ultrasonic reading in cm per slot, if FLAG_DISTANCES
+#
+# All integers are little-endian.
+FRAME_VERSION = 1
+FLAG_DISTANCES = 0x01
+FLAG_TIMESTAMP = 0x02
+KNOWN_FLAGS = FLAG_DISTANCES | FLAG_TIMESTAMP
+HEADER = struct.Struct("<BBHHI")
+TIMESTAMP = struct.Struct("<I")
+FRAME_TOPIC_LEVEL = "frames"      # parking/<lot>/frames/<controller>
+
+
+class FrameError(ValueError):
+    """Raised for payloads that are not a valid slot-status frame"""
+
+
+class SlotFrame:
+    """
+    Decoded view over a frame payload.
+    Holds memoryview slices into the original buffer; nothing is copied
+    until a caller asks for individual values.
+    """
+    __slots__ = ("first_slot", "count", "seq", "timestamp", "bits", "distances")
+
+    def __init__(self, first_slot, count, seq, timestamp, bits, distances):
+        self.first_slot = first_slot
+        self.count = count
+        self.seq = seq
+        self.timestamp = timestamp
+        self.bits = bits              # memoryview of the bitfield bytes
+        self.distances = distances    # memoryview of the distance bytes, or None
+
+    def occupancy_bits(self):
+        """Returns the bitfield as an int, bit i for slot first_slot + i"""
+        return int.from_bytes(self.bits, "little")
+
+    def states(self):
+        """Yields (slot, status) for every slot in the frame"""
+        value = self.occupancy_bits()
+        for i in range(self.count):
+            yield self.first_slot + i, (value >> i) & 1
+
+
+def decode_frame(payload):
+    """
+    Parses a binary frame without copying the payload.
+    Raises FrameError for truncated, over-long or unknown frames.
+    """
+    view = memoryview(payload)
+    if len(view) < HEADER.size:
+        raise FrameError("frame shorter than header")
+    version, flags, first_slot, count, seq = HEADER.unpack_from(view)
+    if version != FRAME_VERSION:
+        raise FrameError(f"unsupported frame version {version}")
+    if flags & ~KNOWN_FLAGS:
+        raise FrameError(f"unknown frame flags {flags:#04x}")
+
+    offset = HEADER.size
+    timestamp = None
+    if flags & FLAG_TIMESTAMP:
+        if len(view) < offset + TIMESTAMP.size:
+            raise FrameError("frame truncated in timestamp")
+        timestamp = TIMESTAMP.unpack_from(view, offset)[0]
+        offset += TIMESTAMP.size
+
+    bit_bytes = (count + 7) // 8
+    bits = view[offset:offset + bit_bytes]
+    offset += bit_bytes
+    if len(bits) != bit_bytes:
+        raise FrameError("frame truncated in bitfield")
+
+    distances = None
+    if flags & FLAG_DISTANCES:
+        distances = view[offset:offset + count]
+        if len(distances) != count:
+            raise FrameError("frame truncated in distances")
+        offset += count
+    if len(view) != offset:
+        raise FrameError(f"{len(view) - offset} bytes after the end of the frame")
+    return SlotFrame(first_slot, count, seq, timestamp, bits, distances)
+
+
+def encode_frame(first_slot, states, seq, timestamp=None, distances=None):
+    """
+    Builds a frame from a sequence of 0/1 slot states.
+    Used by simulators and tests; controllers build the same layout in C.
+    """
+    count = len(states)
+    flags = 0
+    parts = []
+    if timestamp is not None:
+        flags |= FLAG_TIMESTAMP
+        parts.append(TIMESTAMP.pack(int(timestamp)))
+    value = 0
+    for i, state in enumerate(states):
+        if state:
+            value |= 1 << i
+    parts.append(value.to_bytes((count + 7) // 8, "little"))
+    if distances is not None:
+        flags |= FLAG_DISTANCES
+        parts.append(bytes(distances))
+    return HEADER.pack(FRAME_VERSION, flags, first_slot, count, seq) + b"".join(parts)
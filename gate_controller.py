@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+
+import metrics
+
+# ===== Gate Configuration =====
+GATE_OPEN_DUTY = 7                # Duty cycle for 90-degree (open) position
+GATE_CLOSED_DUTY = 2.5            # Duty cycle for 0-degree (closed) position
+GATE_MOVE_SECONDS = 1.0           # Time the servo needs to finish a move
+
+# Gate states
+GATE_OPEN = "open"
+GATE_CLOSED = "closed"
+GATE_UNKNOWN = "unknown"
+
+MOVE_ERRORS = metrics.counter("parking_gate_errors_total", "Gate servo moves that failed")
+
+
+class GateController:
+    """
+    Drives the gate servo from a dedicated worker thread.
+    Callers only post open/close intents; the worker serialises the moves,
+    skips requests for the position the gate is already in and keeps the
+    servo sleep off the Tk event loop.
+    """
+    def __init__(self, servo, move_seconds=GATE_MOVE_SECONDS):
+        self.servo = servo
+        self.move_seconds = move_seconds
+        self.commands = queue.Queue()
+        self.state = GATE_UNKNOWN      # Last position reached by the servo
+        self.target = GATE_UNKNOWN     # Last position requested by a caller
+        self.lock = threading.Lock()
+        self.running = True
+        self.worker = threading.Thread(
+            target=self._run, name="gate-controller", daemon=True
+        )
+        self.worker.start()
+
+    def request_open(self):
+        """Posts an intent to open the gate"""
+        self._post(GATE_OPEN)
+
+    def request_close(self):
+        """Posts an intent to close the gate"""
+        self._post(GATE_CLOSED)
+
+    def _post(self, target):
+        """
+        Queues a move unless the gate is already heading to that position.
+        Safe to call from any thread, returns immediately.
+        """
+        with self.lock:
+            if not self.running or self.target == target:
+                return
+            self.target = target
+        self.commands.put(target)
+
+    def is_moving(self):
+        """Returns True while the servo is travelling to the requested position"""
+        with self.lock:
+            return self.state != self.target
+
+    def _run(self):
+        """
+        Worker loop applying queued moves.
+        Collapses any backlog to the newest intent before moving.
+        """
+        while True:
+            target = self.commands.get()
+            if target is None:
+                break
+
+            # Only the most recent intent matters once the servo is free
+            try:
+                while True:
+                    newer = self.commands.get_nowait()
+                    if newer is None:
+                        self.running = False
+                        break
+                    target = newer
+            except queue.Empty:
+                pass
+
+            if target != self.state:
+                self._move(target)
+
+            if not self.running:
+                break
+
+    def _move(self, target):
+        """Applies a single servo move and records the new position"""
+        duty = GATE_OPEN_DUTY if target == GATE_OPEN else GATE_CLOSED_DUTY
+        started = time.perf_counter()
+        try:
+            self.servo.ChangeDutyCycle(duty)
+            time.sleep(self.move_seconds)
+            self.servo.ChangeDutyCycle(0)  # Stop servo jitter
+        except Exception as e:
+            MOVE_ERRORS.inc()
+            print(f"Error moving gate: {e}")
+            with self.lock:
+                self.target = self.state  # Allow the move to be retried
+            return
+        metrics.histogram(
+            "parking_gate_move_seconds", "Time taken by one gate servo move",
+            labels={"target": target}
+        ).since(started)
+        with self.lock:
+            self.state = target
+
+    def stop(self, timeout=None):
+        """
+        Stops the worker after any in-progress move completes.
+        Further intents are ignored.
+        """
+        with self.lock:
+            self.running = False
+        self.commands.put(None)
+        self.worker.join(timeout)
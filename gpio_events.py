@@ -0,0 +1,205 @@
+import collections
+import threading
+import time
+
+# ===== Sensor Event Configuration =====
+DEFAULT_BOUNCE_MS = 50            # Debounce handed to the GPIO driver
+DEFAULT_HOLDOFF_MS = 200          # Minimum spacing between accepted edges
+DEFAULT_QUEUE_SIZE = 256          # Edges kept before the oldest are dropped
+
+# Edge directions reported in sensor events
+RISING = "rising"
+FALLING = "falling"
+
+SensorEvent = collections.namedtuple("SensorEvent", "pin level edge timestamp")
+
+
+class FakeGPIO:
+    """
+    In-process stand-in for the RPi.GPIO module.
+    Mirrors the subset of the API used by the parking system so sensors,
+    the gate and the GUI can run off-Pi. Tests drive inputs with set_input().
+    """
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    class PWM:
+        """Records duty-cycle changes instead of driving a pin"""
+        def __init__(self, pin, frequency):
+            self.pin = pin
+            self.frequency = frequency
+            self.duty_cycles = []
+
+        def start(self, duty):
+            self.duty_cycles.append(duty)
+
+        def ChangeDutyCycle(self, duty):
+            self.duty_cycles.append(duty)
+
+        def stop(self):
+            pass
+
+    def __init__(self):
+        self.levels = {}
+        self.detectors = {}           # pin -> (edge, callback, bouncetime)
+        self.last_edge = {}           # pin -> monotonic time of last callback
+        self.lock = threading.Lock()
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, *args, **kwargs):
+        self.levels.setdefault(pin, self.LOW)
+
+    def input(self, pin):
+        return self.levels.get(pin, self.LOW)
+
+    def output(self, pin, value):
+        self.levels[pin] = value
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.detectors[pin] = (edge, callback, bouncetime or 0)
+
+    def remove_event_detect(self, pin):
+        self.detectors.pop(pin, None)
+
+    def cleanup(self, *args):
+        self.detectors.clear()
+
+    def set_input(self, pin, level):
+        """
+        Changes an input level and fires any matching edge callback.
+        Applies the driver bouncetime the same way the real library does.
+        """
+        with self.lock:
+            previous = self.levels.get(pin, self.LOW)
+            self.levels[pin] = level
+            detector = self.detectors.get(pin)
+            if previous == level or detector is None:
+                return
+            edge, callback, bouncetime = detector
+            if edge == self.RISING and not level:
+                return
+            if edge == self.FALLING and level:
+                return
+            now = time.monotonic()
+            last = self.last_edge.get(pin)
+            if last is not None and (now - last) * 1000 < bouncetime:
+                return
+            self.last_edge[pin] = now
+        if callback:
+            callback(pin)
+
+
+class EdgeSensor:
+    """
+    Edge-triggered digital input.
+    Registers an event-detect callback with the GPIO backend, filters out
+    bounces and repeated levels, enforces a hold-off between accepted edges
+    and pushes the result into a bounded queue for the GUI to drain.
+    """
+    def __init__(self, gpio, pin, bounce_ms=DEFAULT_BOUNCE_MS,
+                 holdoff_ms=DEFAULT_HOLDOFF_MS, queue_size=DEFAULT_QUEUE_SIZE,
+                 notify=None):
+        self.gpio = gpio
+        self.pin = pin
+        self.bounce_ms = bounce_ms
+        self.holdoff = holdoff_ms / 1000.0
+        self.events = collections.deque(maxlen=queue_size)
+        self.notify = notify          # Called from the GPIO thread on new events
+        self.lock = threading.Lock()
+        self.level = None
+        self.last_accepted = None
+        self.resample_timer = None    # Re-reads the pin once a hold-off expires
+        self.dropped = 0              # Events overwritten because the queue was full
+        self.filtered = 0             # Edges rejected by hold-off or repeats
+
+    def start(self):
+        """
+        Arms edge detection and queues the current level as the first event.
+        The initial event lets consumers sync state without a separate read.
+        """
+        self.gpio.setup(self.pin, self.gpio.IN)
+        self._accept(self.gpio.input(self.pin), time.monotonic(), force=True)
+        self.gpio.add_event_detect(
+            self.pin, self.gpio.BOTH,
+            callback=self._on_edge, bouncetime=self.bounce_ms
+        )
+
+    def stop(self):
+        """Disarms edge detection"""
+        with self.lock:
+            if self.resample_timer:
+                self.resample_timer.cancel()
+                self.resample_timer = None
+        try:
+            self.gpio.remove_event_detect(self.pin)
+        except Exception as e:
+            print(f"Error stopping sensor on pin {self.pin}: {e}")
+
+    def _on_edge(self, pin):
+        """GPIO driver callback, runs on the backend's event thread"""
+        self._accept(self.gpio.input(pin), time.monotonic())
+
+    def _resample(self):
+        """Picks up a level change that arrived during the hold-off"""
+        with self.lock:
+            self.resample_timer = None
+        self._accept(self.gpio.input(self.pin), time.monotonic())
+
+    def _accept(self, level, now, force=False):
+        """
+        Queues an edge if it changes the level and is outside the hold-off.
+        Edges inside the hold-off arm a single re-read so the final level is
+        never lost. Returns True when an event was queued.
+        """
+        level = 1 if level else 0
+        with self.lock:
+            if not force:
+                if level == self.level:
+                    self.filtered += 1
+                    return False
+                if (self.last_accepted is not None
+                        and now - self.last_accepted < self.holdoff):
+                    self.filtered += 1
+                    if self.resample_timer is None:
+                        delay = self.holdoff - (now - self.last_accepted)
+                        self.resample_timer = threading.Timer(delay, self._resample)
+                        self.resample_timer.daemon = True
+                        self.resample_timer.start()
+                    return False
+            was_empty = not self.events
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.level = level
+            self.last_accepted = now
+            edge = RISING if level else FALLING
+            self.events.append(SensorEvent(self.pin, level, edge, time.time()))
+        if was_empty and self.notify:
+            self.notify()
+        return True
+
+    def drain(self, max_items=None):
+        """
+        Removes and returns queued events, oldest first.
+        At most max_items are returned when a limit is given.
+        """
+        batch = []
+        with self.lock:
+            while self.events and (max_items is None or len(batch) < max_items):
+                batch.append(self.events.popleft())
+        return batch
+
+    def pending(self):
+        """Returns the number of queued events"""
+        return len(self.events)
@@ -0,0 +1,49 @@
+import config
+from gpio_events import FakeGPIO
+
+# Lazily initialised GPIO backend and servo; nothing touches pins at import
+_gpio = None
+_servo = None
+
+
+def get_gpio():
+    """
+    Returns the GPIO backend, initialising it on first use.
+    Uses RPi.GPIO on a Pi and FakeGPIO elsewhere or when forced by config.
+    """
+    global _gpio
+    if _gpio is None:
+        if config.use_fake_gpio:
+            gpio = FakeGPIO()
+        else:
+            try:
+                import RPi.GPIO as gpio
+            except (ImportError, RuntimeError) as e:
+                print(f"RPi.GPIO unavailable ({e}), using simulated GPIO")
+                gpio = FakeGPIO()
+        gpio.setwarnings(False)            # Disable GPIO warnings
+        gpio.setmode(gpio.BCM)             # Use Broadcom pin-numbering scheme
+        _gpio = gpio
+    return _gpio
+
+
+def get_servo():
+    """Returns the gate servo PWM channel, starting it on first use"""
+    global _servo
+    if _servo is None:
+        gpio = get_gpio()
+        gpio.setup(config.SERVO_PIN, gpio.OUT)  # Set servo pin as output
+        _servo = gpio.PWM(config.SERVO_PIN, config.SERVO_FREQUENCY)
+        _servo.start(0)                         # Start PWM with 0% duty cycle
+    return _servo
+
+
+def cleanup():
+    """Releases the servo and GPIO pins if they were ever initialised"""
+    global _gpio, _servo
+    if _servo is not None:
+        _servo.stop()
+        _servo = None
+    if _gpio is not None:
+        _gpio.cleanup()
+        _gpio = None
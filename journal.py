@@ -0,0 +1,213 @@
+import mmap
+import os
+import struct
+import zlib
+
+# ===== Journal Format =====
+# <path>       header, then fixed-size event records appended through mmap
+# <path>.snap  slot state checkpoint: SNAPSHOT_HEADER + SlotStateStore.snapshot()
+#
+# A checkpoint writes the snapshot for generation g+1 together with the
+# journal offset it covers, then moves the events logged after that
+# offset to the front of the journal and stamps it with g+1. On recovery
+# a journal of generation g is replayed from the covered offset, one of
+# generation g+1 from the start, and an older one is skipped.
+JOURNAL_MAGIC = b"PSJ1"
+SNAPSHOT_MAGIC = b"PSC2"
+LEGACY_SNAPSHOT_MAGIC = b"PSC1"   # Snapshots without a covered offset
+HEADER = struct.Struct("<4sIQ")   # magic, record size, generation
+SNAPSHOT_HEADER = struct.Struct("<4sQQ")  # magic, generation, covered journal offset
+LEGACY_SNAPSHOT_HEADER = struct.Struct("<4sQ")  # magic, generation
+RECORD = struct.Struct("<BxxxIdI")  # kind, slot, timestamp, crc32 of the preceding bytes
+CHECKED = RECORD.size - 4         # Bytes covered by the record checksum
+ENTRY = 1
+EXIT = 2
+DEFAULT_SIZE = 1 << 20            # Initial file size, ~52k events; doubled when full
+
+
+class SessionJournal:
+    """
+    Append-only, memory-mapped log of slot entries and exits.
+    Appends are a struct pack and a CRC into the mapped file, so they
+    survive a process crash without a syscall; checkpoint() folds the log
+    into a snapshot of the slot state and starts it over, and
+    checkpoint_at() does the same for a snapshot taken earlier, keeping
+    the events logged since. recover() rebuilds the state from the latest
+    snapshot plus the events logged after it. Appends must come from a
+    single thread.
+    """
+    def __init__(self, path, size=DEFAULT_SIZE):
+        self.path = path
+        self.snapshot_path = path + ".snap"
+        self.size = size
+        self.file = None
+        self.map = None
+        self.position = HEADER.size   # Offset of the next record
+        self.generation = 0
+        self.events = 0               # Records appended since the last checkpoint
+
+    def recover(self, slots):
+        """
+        Loads the last checkpoint into slots (a SlotStateStore, updated in
+        place) and replays the journal on top of it.
+        Returns the stays that were closed by replayed exits as a list of
+        (slot, entry_time, exit_time), so the caller can make sure each one
+        was recorded.
+        """
+        snapshot_generation, covered = self._load_snapshot(slots)
+        self._open()
+
+        magic, record_size, generation = HEADER.unpack_from(self.map)
+        if magic != JOURNAL_MAGIC or record_size != RECORD.size:
+            self._reset(snapshot_generation, len(self.map))
+            return []
+        position = HEADER.size
+        if generation == snapshot_generation - 1 and covered:
+            # The snapshot holds the events before covered; the rest are newer
+            position = covered
+        elif generation < snapshot_generation:
+            # Crashed between writing a snapshot and clearing the journal
+            self._reset(snapshot_generation, len(self.map))
+            return []
+        self.generation = generation
+
+        finished = []
+        end = len(self.map) - RECORD.size
+        while position <= end:
+            kind, slot_num, timestamp, crc = RECORD.unpack_from(self.map, position)
+            if kind == 0 or crc != zlib.crc32(self.map[position:position + CHECKED]):
+                break  # End of the log, or a record torn by the crash
+            if 0 < slot_num <= slots.slot_count:
+                if kind == ENTRY:
+                    slots.set_occupied(slot_num, timestamp)
+                else:
+                    entry = slots.set_empty(slot_num, timestamp)
+                    if entry is not None:
+                        finished.append((slot_num, entry, timestamp))
+            position += RECORD.size
+            self.events += 1
+        if position <= end:
+            self.map[position:position + RECORD.size] = bytes(RECORD.size)
+        self.position = position
+        return finished
+
+    def _load_snapshot(self, slots):
+        """
+        Restores slots from the snapshot file.
+        Returns its generation and the journal offset it covers (None when
+        the snapshot does not record one).
+        """
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0, None
+        try:
+            magic = data[:len(SNAPSHOT_MAGIC)]
+            if magic == SNAPSHOT_MAGIC:
+                _, generation, covered = SNAPSHOT_HEADER.unpack_from(data)
+                header_size = SNAPSHOT_HEADER.size
+            elif magic == LEGACY_SNAPSHOT_MAGIC:
+                _, generation = LEGACY_SNAPSHOT_HEADER.unpack_from(data)
+                covered = None
+                header_size = LEGACY_SNAPSHOT_HEADER.size
+            else:
+                raise ValueError("not a slot state checkpoint")
+            slots.load_snapshot(memoryview(data)[header_size:])
+        except (ValueError, struct.error) as e:
+            print(f"Ignoring slot checkpoint {self.snapshot_path}: {e}")
+            return 0, None
+        return generation, covered
+
+    def _open(self):
+        """Maps the journal file, creating it if needed"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.file = os.fdopen(fd, "r+b")
+        size = os.fstat(fd).st_size
+        if size < self.size:
+            os.ftruncate(fd, self.size)
+            size = self.size
+        self.map = mmap.mmap(fd, size)
+
+    def _reset(self, generation, end=None):
+        """Clears the logged events up to end, then stamps the new generation"""
+        end = end or self.position
+        self.map[HEADER.size:end] = bytes(end - HEADER.size)
+        HEADER.pack_into(self.map, 0, JOURNAL_MAGIC, RECORD.size, generation)
+        self.generation = generation
+        self.position = HEADER.size
+        self.events = 0
+
+    def _grow(self):
+        """Doubles the file when it runs out of room before a checkpoint"""
+        size = len(self.map) * 2
+        self.map.flush()
+        os.ftruncate(self.file.fileno(), size)
+        self.map.resize(size)
+
+    def _append(self, kind, slot_num, timestamp):
+        if self.position + RECORD.size > len(self.map):
+            self._grow()
+        position = self.position
+        RECORD.pack_into(self.map, position, kind, slot_num, timestamp, 0)
+        crc = zlib.crc32(self.map[position:position + CHECKED])
+        struct.pack_into("<I", self.map, position + CHECKED, crc)
+        self.position = position + RECORD.size
+        self.events += 1
+
+    def log_entry(self, slot_num, timestamp):
+        self._append(ENTRY, slot_num, timestamp)
+
+    def log_exit(self, slot_num, timestamp):
+        self._append(EXIT, slot_num, timestamp)
+
+    def checkpoint(self, slots):
+        """Writes the slot state as a new snapshot and clears the journal"""
+        self.checkpoint_at(slots.snapshot(), self.position)
+
+    def checkpoint_at(self, snapshot, position):
+        """
+        Makes snapshot (SlotStateStore.snapshot() bytes, taken when the
+        journal ended at position) the new checkpoint and drops the events
+        it contains. Events logged after position stay in the journal.
+        The snapshot is fsynced and renamed into place before the journal
+        is touched, and the journal is only rewritten in an order that
+        recover() can follow, so a crash at any point leaves a
+        recoverable pair.
+        """
+        generation = self.generation + 1
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation, position))
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+        end = self.position
+        tail = end - position
+        if not tail:
+            self._reset(generation)
+        elif tail < position - HEADER.size:
+            # The tail fits in front of position with a zeroed record
+            # between them, so the old copy stays intact until the header
+            # says the journal starts over
+            self.map[HEADER.size:HEADER.size + tail] = self.map[position:end]
+            self.map[HEADER.size + tail:position] = bytes(position - HEADER.size - tail)
+            HEADER.pack_into(self.map, 0, JOURNAL_MAGIC, RECORD.size, generation)
+            self.map[position:end] = bytes(tail)
+            self.generation = generation
+            self.position = HEADER.size + tail
+            self.events = tail // RECORD.size
+        else:
+            # No room to move the tail yet; recover() replays it from
+            # position until a later checkpoint compacts the journal
+            self.events = tail // RECORD.size
+
+    def close(self):
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.file.close()
+            self.map = None
+            self.file = None
@@ -0,0 +1,319 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ===== Metrics Configuration =====
+SUB_BUCKET_BITS = 3               # 8 sub-buckets per power of two: ~12% relative error
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_MICROS = 1 << 27              # Observations are clamped to ~134 s
+EXPORT_BOUNDS = (                 # Prometheus "le" buckets in seconds
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _bucket_index(micros):
+    """Log-linear bucket for a value in microseconds"""
+    if micros < 2 * SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (micros >> shift)
+
+
+def _bucket_upper(index):
+    """Exclusive upper bound of a bucket, in microseconds"""
+    if index < 2 * SUB_BUCKETS:
+        return index + 1
+    shift = index // SUB_BUCKETS - 1
+    return (index - shift * SUB_BUCKETS + 1) << shift
+
+
+BUCKET_COUNT = _bucket_index(MAX_MICROS) + 1
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Counter:
+    """
+    Monotonic count, e.g. messages handled or errors seen.
+    Either inc()'d or backed by a callable that returns a running total
+    kept elsewhere, read at export time like a callable gauge.
+    """
+    kind = "counter"
+
+    def __init__(self, labels, fn=None):
+        self.labels = labels
+        self.fn = fn
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def get(self):
+        return self.fn() if self.fn is not None else self.value
+
+    def samples(self, name):
+        yield f"{name}{_label_text(self.labels)} {self.get()}"
+
+
+class Gauge:
+    """
+    Point-in-time value.
+    Either set() explicitly or backed by a callable read at export time,
+    which keeps queue depths and similar values off the hot path entirely.
+    """
+    kind = "gauge"
+
+    def __init__(self, labels, fn=None):
+        self.labels = labels
+        self.fn = fn
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.fn() if self.fn is not None else self.value
+
+    def samples(self, name):
+        yield f"{name}{_label_text(self.labels)} {self.get()}"
+
+
+class Histogram:
+    """
+    HDR-style latency histogram.
+    Values are recorded in microseconds into log-linear buckets (eight per
+    power of two), so an observation is one bit_length and one list
+    increment, and quantiles keep ~12% relative precision from 1 us up to
+    minutes without any configuration.
+    """
+    kind = "histogram"
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        """Records one duration in seconds"""
+        micros = int(seconds * 1e6)
+        if micros < 0:
+            micros = 0
+        elif micros >= MAX_MICROS:
+            micros = MAX_MICROS - 1
+        index = _bucket_index(micros)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def since(self, started):
+        """Records the time elapsed since a time.perf_counter() value"""
+        self.observe(time.perf_counter() - started)
+
+    def quantile(self, q):
+        """Returns the q-quantile in seconds (bucket upper bound)"""
+        with self.lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if count and seen >= rank:
+                return _bucket_upper(index) / 1e6
+        return self.max
+
+    def samples(self, name):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.count
+            total_sum = self.sum
+        labels = list(self.labels)
+        cumulative = 0
+        index = 0
+        for bound in EXPORT_BOUNDS:
+            limit = bound * 1e6
+            while index < BUCKET_COUNT and _bucket_upper(index) <= limit:
+                cumulative += counts[index]
+                index += 1
+            yield f"{name}_bucket{_label_text(labels + [('le', bound)])} {cumulative}"
+        yield f"{name}_bucket{_label_text(labels + [('le', '+Inf')])} {total}"
+        yield f"{name}_sum{_label_text(self.labels)} {total_sum}"
+        yield f"{name}_count{_label_text(self.labels)} {total}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of named metrics.
+    Asking for a metric that already exists returns the same instance, so
+    modules declare what they record at import time.
+    """
+    def __init__(self):
+        self.families = {}            # name -> (kind, help, {labels: metric})
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        key = tuple(sorted((labels or {}).items()))
+        with self.lock:
+            family = self.families.setdefault(name, (cls.kind, help_text, {}))
+            if family[0] != cls.kind:
+                raise ValueError(f"metric {name} already registered as {family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = cls(key, **kwargs)
+        return metric
+
+    def counter(self, name, help_text, labels=None, fn=None):
+        counter = self._get(Counter, name, help_text, labels)
+        if fn is not None:
+            counter.fn = fn
+        return counter
+
+    def gauge(self, name, help_text, labels=None, fn=None):
+        gauge = self._get(Gauge, name, help_text, labels)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, help_text, labels=None):
+        return self._get(Histogram, name, help_text, labels)
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format"""
+        with self.lock:
+            families = [(name, kind, help_text, list(metrics.values()))
+                        for name, (kind, help_text, metrics) in sorted(self.families.items())]
+        lines = []
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in metrics:
+                try:
+                    lines.extend(metric.samples(name))
+                except Exception as e:
+                    lines.append(f"# {name} unavailable: {e}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One-line digest: counters, gauges, and p50/p99 of histograms"""
+        with self.lock:
+            families = [(name, list(metrics.values()))
+                        for name, (_, _, metrics) in sorted(self.families.items())]
+        parts = []
+        for name, metrics in families:
+            short = name[len("parking_"):] if name.startswith("parking_") else name
+            for metric in metrics:
+                label = ",".join(str(value) for _, value in metric.labels)
+                key = f"{short}[{label}]" if label else short
+                if isinstance(metric, Histogram):
+                    if metric.count:
+                        parts.append(
+                            f"{key} n={metric.count} "
+                            f"p50={metric.quantile(0.5) * 1000:.2f}ms "
+                            f"p99={metric.quantile(0.99) * 1000:.2f}ms"
+                        )
+                else:
+                    try:
+                        value = metric.get()
+                    except Exception:
+                        continue
+                    if value:
+                        parts.append(f"{key}={value:g}")
+        return "; ".join(parts)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name, help_text, labels=None, fn=None):
+    return REGISTRY.counter(name, help_text, labels, fn)
+
+
+def gauge(name, help_text, labels=None, fn=None):
+    return REGISTRY.gauge(name, help_text, labels, fn)
+
+
+def histogram(name, help_text, labels=None):
+    return REGISTRY.histogram(name, help_text, labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a log line each
+
+
+class MetricsServer:
+    """
+    Serves /metrics over HTTP and prints a summary line periodically.
+    Both run on daemon threads; port 0 disables the endpoint and
+    log_seconds 0 disables the log line.
+    """
+    def __init__(self, host, port, log_seconds, registry=REGISTRY):
+        self.registry = registry
+        self.log_seconds = log_seconds
+        self.httpd = None
+        self.serving = False
+        self.stopped = threading.Event()
+        self.threads = []
+        if port:
+            handler = type("Handler", (_MetricsHandler,), {"registry": registry})
+            try:
+                self.httpd = ThreadingHTTPServer((host, port), handler)
+                self.httpd.daemon_threads = True
+            except OSError as e:
+                print(f"Metrics endpoint unavailable on {host}:{port}: {e}")
+
+    def start(self):
+        if self.httpd is not None:
+            self.serving = True
+            self.threads.append(threading.Thread(
+                target=self.httpd.serve_forever, name="metrics-http", daemon=True
+            ))
+        if self.log_seconds:
+            self.threads.append(threading.Thread(
+                target=self._log_loop, name="metrics-log", daemon=True
+            ))
+        for thread in self.threads:
+            thread.start()
+
+    def _log_loop(self):
+        while not self.stopped.wait(self.log_seconds):
+            line = self.registry.summary()
+            if line:
+                print(f"metrics: {line}")
+
+    def stop(self):
+        self.stopped.set()
+        if self.serving:
+            self.httpd.shutdown()
+        if self.httpd is not None:
+            self.httpd.server_close()
+        for thread in self.threads:
+            thread.join(timeout=2)
@@ -0,0 +1,284 @@
+import re
+import sqlite3
+from datetime import datetime
+
+from reports import (
+    REVENUE_TABLE, SLOT_DAILY_TABLE, create_rollup_tables, update_rollups,
+    update_slot_rollups
+)
+
+# ===== Migration Configuration =====
+BACKFILL_CHUNK = 5000             # Rows copied per backfill transaction
+LEGACY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+LEGACY_DURATION = re.compile(r"(\d+) min (\d+) sec")
+LEGACY_COLUMNS = ("id", "slot", "entry_time", "exit_time", "duration")
+
+PROGRESS_TABLE = """
+    CREATE TABLE IF NOT EXISTS migration_progress (
+        version INTEGER PRIMARY KEY,       -- migration being backfilled
+        last_id INTEGER NOT NULL           -- last parking_records id folded in
+    )
+"""
+
+
+def schema_version(conn):
+    """Returns the schema version stored in PRAGMA user_version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _set_version(conn, version):
+    conn.execute(f"PRAGMA user_version={int(version)}")
+
+
+def _create_base_tables(conn):
+    """
+    Version 1: the original users and parking_records tables.
+    Existing databases created before versioning already match this.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parking_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            slot INTEGER,
+            entry_time TEXT,
+            exit_time TEXT,
+            duration TEXT
+        )
+    """)
+
+
+def _legacy_epoch(text):
+    """Converts a legacy 'YYYY-MM-DD HH:MM:SS' local time to epoch seconds"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return int(text)
+    return int(datetime.strptime(text, LEGACY_TIME_FORMAT).timestamp())
+
+
+def _legacy_seconds(text, entry, exit_):
+    """Converts a legacy 'X min Y sec' duration to whole seconds"""
+    if entry is not None and exit_ is not None:
+        return exit_ - entry
+    match = LEGACY_DURATION.fullmatch(text or "")
+    if match:
+        return int(match.group(1)) * 60 + int(match.group(2))
+    return None
+
+
+def _convert_row(row):
+    """
+    Maps one legacy parking_records row to the typed layout.
+    Returns (converted_row, None), or (None, reason) when it cannot be
+    converted.
+    """
+    record_id, slot, entry_text, exit_text, duration_text = row
+    try:
+        entry = _legacy_epoch(entry_text)
+        exit_ = _legacy_epoch(exit_text)
+        duration = _legacy_seconds(duration_text, entry, exit_)
+    except ValueError as e:
+        return None, f"unreadable time: {e}"
+    converted = (record_id, slot, entry, exit_, duration)
+    if None in converted:
+        missing = [name for name, value in zip(LEGACY_COLUMNS, converted) if value is None]
+        return None, f"missing {', '.join(missing)}"
+    return converted, None
+
+
+def _typed_records(conn):
+    """
+    Version 2: integer epoch timestamps and duration seconds, plus indexes.
+    Rows are copied into a new table in short chunked transactions, so the
+    write lock is only held briefly; an interrupted backfill resumes from
+    the last copied id. Rows that cannot be converted are kept verbatim in
+    parking_records_legacy with the reason, never dropped. The final swap
+    copies any stragglers and renames.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parking_records_typed (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            slot INTEGER NOT NULL,
+            entry_time INTEGER NOT NULL,
+            exit_time INTEGER NOT NULL,
+            duration INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parking_records_legacy (
+            id INTEGER PRIMARY KEY,
+            slot INTEGER,
+            entry_time TEXT,
+            exit_time TEXT,
+            duration TEXT,
+            reason TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+    select = """
+        SELECT id, slot, entry_time, exit_time, duration
+        FROM parking_records WHERE id > ? ORDER BY id LIMIT ?
+    """
+    insert = """
+        INSERT INTO parking_records_typed (id, slot, entry_time, exit_time, duration)
+        VALUES (?, ?, ?, ?, ?)
+    """
+    quarantine = """
+        INSERT INTO parking_records_legacy (id, slot, entry_time, exit_time, duration, reason)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+
+    def copy_chunk(after_id):
+        rows = conn.execute(select, (after_id, BACKFILL_CHUNK)).fetchall()
+        converted = []
+        rejected = []
+        for row in rows:
+            typed, reason = _convert_row(row)
+            if typed is None:
+                rejected.append((*row, reason))
+            else:
+                converted.append(typed)
+        conn.executemany(insert, converted)
+        conn.executemany(quarantine, rejected)
+        return rows[-1][0] if rows else None
+
+    # Resume after the last id copied to either table
+    last_id = conn.execute("""
+        SELECT MAX(COALESCE((SELECT MAX(id) FROM parking_records_typed), 0),
+                   COALESCE((SELECT MAX(id) FROM parking_records_legacy), 0))
+    """).fetchone()[0]
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        chunk_last = copy_chunk(last_id)
+        conn.commit()
+        if chunk_last is None:
+            break
+        last_id = chunk_last
+
+    # Swap tables under one short lock, picking up rows added meanwhile
+    conn.execute("BEGIN IMMEDIATE")
+    while True:
+        chunk_last = copy_chunk(last_id)
+        if chunk_last is None:
+            break
+        last_id = chunk_last
+    kept = conn.execute("SELECT COUNT(*) FROM parking_records_legacy").fetchone()[0]
+    if kept:
+        print(f"Kept {kept} parking records that could not be converted "
+              f"in parking_records_legacy")
+    conn.execute("DROP TABLE parking_records")
+    conn.execute("ALTER TABLE parking_records_typed RENAME TO parking_records")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parking_records_slot_entry
+        ON parking_records (slot, entry_time)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parking_records_exit
+        ON parking_records (exit_time)
+    """)
+
+
+def _backfill(conn, version, fold):
+    """
+    Folds existing parking records into new rollup tables with
+    fold(conn, rows), in id chunks of one short transaction each. Every
+    chunk stores its last id in migration_progress, so an interrupted
+    backfill resumes where it stopped without double counting. Returns
+    with the final check for new rows still in its transaction, which
+    migrate() commits together with the version bump.
+    """
+    conn.execute(PROGRESS_TABLE)
+    conn.commit()
+    select = """
+        SELECT id, slot, entry_time, exit_time, duration
+        FROM parking_records WHERE id > ? ORDER BY id LIMIT ?
+    """
+    row = conn.execute(
+        "SELECT last_id FROM migration_progress WHERE version=?", (version,)
+    ).fetchone()
+    last_id = row[0] if row else 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(select, (last_id, BACKFILL_CHUNK)).fetchall()
+        if not rows:
+            conn.execute("DELETE FROM migration_progress WHERE version=?", (version,))
+            return
+        fold(conn, [row[1:] for row in rows])
+        last_id = rows[-1][0]
+        conn.execute("""
+            INSERT INTO migration_progress (version, last_id) VALUES (?, ?)
+            ON CONFLICT (version) DO UPDATE SET last_id = excluded.last_id
+        """, (version, last_id))
+        conn.commit()
+
+
+def _rollups(conn):
+    """Version 3: hourly/daily rollup tables for reporting, backfilled from history"""
+    create_rollup_tables(conn)
+    conn.commit()
+    _backfill(conn, 3, update_rollups)
+
+
+def _charges(conn):
+    """
+    Version 4: a charge column (cents) on parking_records and the daily
+    revenue rollup. Existing history stays unpriced (NULL) until it is
+    re-priced with billing.py.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("ALTER TABLE parking_records ADD COLUMN charge INTEGER")
+    conn.execute(REVENUE_TABLE)
+
+
+def _slot_daily(conn):
+    """
+    Version 5: per-slot turnover by UTC day, replacing the monthly
+    per-slot rollup, which could not answer ranges shorter than a month.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("DROP TABLE IF EXISTS rollup_slot_monthly")
+    conn.execute(SLOT_DAILY_TABLE)
+    conn.commit()
+    _backfill(conn, 5, update_slot_rollups)
+
+
+# Ordered (version, description, function) steps; never reorder or edit
+MIGRATIONS = [
+    (1, "base users and parking_records tables", _create_base_tables),
+    (2, "typed parking_records with indexes", _typed_records),
+    (3, "reporting rollup tables", _rollups),
+    (4, "parking charges and revenue rollup", _charges),
+    (5, "per-slot daily rollup", _slot_daily),
+]
+
+
+def migrate(conn):
+    """
+    Brings a database up to the latest schema version.
+    Each step commits together with its version bump, so a failed step
+    leaves the database at the previous version and is retried next start.
+    """
+    current = schema_version(conn)
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            step(conn)
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            _set_version(conn, version)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error applying migration {version} ({description}): {e}")
+            raise
+        current = version
+    return current
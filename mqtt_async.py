@@ -0,0 +1,415 @@
+import asyncio
+import collections
+import re
+import threading
+import time
+import zlib
+
+import metrics
+from frames import FRAME_TOPIC_LEVEL, FrameError, decode_frame
+
+# ===== Async Ingestion Configuration =====
+BACKOFF_INITIAL = 0.5             # First reconnect delay in seconds
+BACKOFF_MAX = 30.0                # Upper bound for the reconnect delay
+ROUTE_TABLE_LIMIT = 200000        # Max topics precomputed into the exact-match table
+LEGACY_LOT = None                 # Lot that also receives parking/slots/<n>
+LAG_PROBE_S = 0.5                 # Interval of the event-loop lag probe
+
+PAYLOAD_STATUS = {b"occupied": 1, b"empty": 0}
+
+MESSAGES = metrics.counter("parking_mqtt_messages_total", "MQTT messages routed")
+UNROUTED = metrics.counter("parking_mqtt_unrouted_total", "MQTT messages dropped as unroutable")
+BATCH_SECONDS = metrics.histogram(
+    "parking_mqtt_batch_seconds", "Time spent routing one batch of MQTT messages"
+)
+QUEUE_DELAY = metrics.histogram(
+    "parking_mqtt_queue_delay_seconds", "Age of the oldest message when its batch was routed"
+)
+LOOP_LAG = metrics.histogram(
+    "parking_event_loop_lag_seconds", "Delay of timer callbacks past their due time",
+    labels={"loop": "asyncio"}
+)
+
+
+def parse_status_payload(payload):
+    """
+    Parses a text status payload into (status, seq).
+    Accepts "occupied"/"empty" and the sequenced "occupied:<seq>" form
+    published by current controllers. Returns None for anything else.
+    """
+    payload = bytes(payload)
+    status = PAYLOAD_STATUS.get(payload)
+    if status is not None:
+        return status, None
+    state, _, seq = payload.partition(b":")
+    status = PAYLOAD_STATUS.get(state)
+    if status is None or not seq.isdigit():
+        return None
+    return status, int(seq)
+
+
+def lot_topic_prefix(lot):
+    """Returns the topic prefix for a lot, e.g. parking/<lot>/slots/"""
+    return f"parking/{lot}/slots/"
+
+
+def lot_frame_prefix(lot):
+    """Returns the binary frame topic prefix for a lot"""
+    return f"parking/{lot}/{FRAME_TOPIC_LEVEL}/"
+
+
+def shard_for(lot, shard_count):
+    """Assigns a lot to a shard with a stable hash"""
+    return zlib.crc32(lot.encode()) % shard_count
+
+
+class TopicRouter:
+    """
+    Maps MQTT topics to (sink, slot) without splitting strings per message.
+    For lots small enough to enumerate, every valid topic is precomputed
+    into a dict; larger deployments fall back to one rpartition plus a
+    prefix lookup. Unknown topics and out-of-range slots return None.
+    Frame topics (parking/<lot>/frames/<controller>) resolve to their
+    lot's sink through route_frame().
+    """
+    def __init__(self, lots, sinks, legacy_lot=LEGACY_LOT):
+        self.exact = {}
+        self.prefixes = {}            # prefix -> (sink, slot_count)
+        self.frame_prefixes = {lot_frame_prefix(lot): sinks[lot] for lot in lots}
+        total = sum(lots.values())
+        for lot, slot_count in lots.items():
+            prefixes = [lot_topic_prefix(lot)]
+            if lot == legacy_lot:
+                prefixes.append("parking/slots/")
+            for prefix in prefixes:
+                self.prefixes[prefix] = (sinks[lot], slot_count)
+                if total <= ROUTE_TABLE_LIMIT:
+                    for slot_num in range(1, slot_count + 1):
+                        self.exact[f"{prefix}{slot_num}"] = (sinks[lot], slot_num)
+
+    def route(self, topic):
+        target = self.exact.get(topic)
+        if target is not None or self.exact:
+            return target
+        prefix, _, slot_text = topic.rpartition("/")
+        entry = self.prefixes.get(prefix + "/")
+        if entry is None or not slot_text.isdigit():
+            return None
+        slot_num = int(slot_text)
+        if not 1 <= slot_num <= entry[1]:
+            return None
+        return entry[0], slot_num
+
+    def route_frame(self, topic):
+        """Returns the sink for a frame topic, or None"""
+        prefix, _, controller = topic.rpartition("/")
+        if not controller:
+            return None
+        return self.frame_prefixes.get(prefix + "/")
+
+    def deliver(self, topic, payload, timestamp):
+        """
+        Routes and parses one message into its sink, the same way a shard
+        does. Returns False when it could not be routed or parsed.
+        """
+        target = self.route(topic)
+        if target is None:
+            sink = self.route_frame(topic)
+            if sink is None:
+                return False
+            try:
+                frame = decode_frame(payload)
+            except FrameError as e:
+                print(f"Dropping frame on {topic}: {e}")
+                return False
+            sink.put_frame(topic, frame, timestamp)
+            return True
+        parsed = parse_status_payload(payload)
+        if parsed is None:
+            return False
+        sink, slot_num = target
+        sink.put(slot_num, parsed[0], timestamp, parsed[1])
+        return True
+
+
+class FakeBroker:
+    """
+    In-process MQTT broker for tests and benchmarks.
+    Supports + and # wildcards and delivers messages synchronously on the
+    publishing thread, like a network thread would.
+    """
+    def __init__(self):
+        self.subscriptions = []       # (compiled pattern, callback)
+        self.lock = threading.Lock()
+        self.published = 0
+
+    @staticmethod
+    def compile_pattern(pattern):
+        parts = []
+        for level in pattern.split("/"):
+            if level == "+":
+                parts.append("[^/]+")
+            elif level == "#":
+                parts.append(".*")
+            else:
+                parts.append(re.escape(level))
+        return re.compile("/".join(parts) + "$")
+
+    def subscribe(self, pattern, callback):
+        with self.lock:
+            self.subscriptions.append((self.compile_pattern(pattern), callback))
+
+    def unsubscribe_all(self, callback):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s[1] is not callback]
+
+    def publish(self, topic, payload):
+        self.published += 1
+        for pattern, callback in self.subscriptions:
+            if pattern.match(topic):
+                callback(topic, payload)
+
+    def client(self):
+        return FakeTransport(self)
+
+
+class FakeTransport:
+    """Transport that talks to a FakeBroker"""
+    def __init__(self, broker):
+        self.broker = broker
+        self.on_message = None
+
+    def connect(self):
+        pass
+
+    def start(self, patterns, on_message):
+        self.on_message = on_message
+        for pattern in patterns:
+            self.broker.subscribe(pattern, on_message)
+
+    def close(self):
+        if self.on_message is not None:
+            self.broker.unsubscribe_all(self.on_message)
+
+
+class PahoTransport:
+    """
+    Transport backed by a paho client.
+    connect() blocks and is therefore run in an executor; once connected
+    paho's own thread handles reconnects and resubscribes in on_connect.
+    """
+    def __init__(self, host, port, keepalive=60):
+        from paho.mqtt.client import Client as MqttClient
+
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.patterns = []
+        self.client = MqttClient()
+        self.client.reconnect_delay_set(int(BACKOFF_INITIAL) or 1, int(BACKOFF_MAX))
+        self.client.on_connect = self._on_connect
+
+    def connect(self):
+        self.client.connect(self.host, self.port, self.keepalive)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        """Callback for when MQTT client connects to broker"""
+        for pattern in self.patterns:
+            client.subscribe(pattern)
+
+    def start(self, patterns, on_message):
+        self.patterns = list(patterns)
+        self.client.on_message = lambda client, userdata, message: on_message(
+            message.topic, message.payload
+        )
+        self._on_connect(self.client, None, None, 0)
+        self.client.loop_start()
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+class _Shard:
+    """One subscription group: a transport, its inbox and a worker task"""
+    def __init__(self, index, lots, transport):
+        self.index = index
+        self.lots = lots
+        self.transport = transport
+        self.inbox = collections.deque()
+        self.wake = None              # asyncio.Event, created on the loop
+        self.wake_pending = False
+        self.connected = False
+        self.received = 0
+        self.unrouted = 0
+
+
+class AsyncIngestRuntime:
+    """
+    Asyncio ingestion runtime for one or many lots.
+    Lots are spread over shard_count subscriptions, each with its own
+    transport and worker task. Connections are made with exponential
+    backoff without blocking the caller; the runtime lives on its own
+    event-loop thread. Network threads only append to a deque and wake the
+    shard worker, which routes messages in batches into per-lot sinks
+    (SlotUpdateQueue or DedupFilter instances). Binary multi-slot frames
+    are decoded in place and need a sink with put_frame (DedupFilter).
+    tap, if given, is called on the network thread with every message
+    and its arrival time (used to capture traffic for replay).
+    """
+    def __init__(self, lots, sinks, transport_factory, shard_count=1,
+                 legacy_lot=LEGACY_LOT, tap=None):
+        self.router = TopicRouter(lots, sinks, legacy_lot)
+        self.transport_factory = transport_factory
+        self.tap = tap
+        shard_count = max(1, min(shard_count, len(lots)))
+        grouped = [[] for _ in range(shard_count)]
+        for lot in lots:
+            grouped[shard_for(lot, shard_count)].append(lot)
+        self.legacy_lot = legacy_lot
+        self.shards = [
+            _Shard(i, shard_lots, None) for i, shard_lots in enumerate(grouped) if shard_lots
+        ]
+        self.loop = None
+        self.thread = None
+        self.tasks = []
+        self.ready = threading.Event()
+
+    def start(self):
+        """Starts the event-loop thread and returns immediately"""
+        self.thread = threading.Thread(
+            target=self._run_loop, name="mqtt-ingest", daemon=True
+        )
+        self.thread.start()
+        self.ready.wait()
+
+    def stop(self, timeout=5):
+        """Cancels the shard tasks, closes transports and joins the thread"""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._cancel_tasks)
+        self.thread.join(timeout)
+        for shard in self.shards:
+            if shard.transport is not None:
+                try:
+                    shard.transport.close()
+                except Exception as e:
+                    print(f"Error closing MQTT shard {shard.index}: {e}")
+
+    def connected(self):
+        """Returns True when every shard has a live connection"""
+        return all(shard.connected for shard in self.shards)
+
+    def stats(self):
+        return {
+            "received": sum(shard.received for shard in self.shards),
+            "unrouted": sum(shard.unrouted for shard in self.shards),
+        }
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        for shard in self.shards:
+            shard.wake = asyncio.Event()
+            self.tasks.append(self.loop.create_task(self._run_shard(shard)))
+        self.tasks.append(self.loop.create_task(self._probe_lag()))
+        self.ready.set()
+        try:
+            self.loop.run_until_complete(
+                asyncio.gather(*self.tasks, return_exceptions=True)
+            )
+        finally:
+            self.loop.close()
+
+    def _cancel_tasks(self):
+        for task in self.tasks:
+            task.cancel()
+
+    async def _probe_lag(self):
+        """Measures how late the loop wakes up from a fixed sleep"""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_S)
+            LOOP_LAG.observe(time.perf_counter() - started - LAG_PROBE_S)
+
+    async def _connect(self, shard):
+        """Connects a shard's transport, backing off between failures"""
+        delay = BACKOFF_INITIAL
+        while True:
+            transport = self.transport_factory()
+            try:
+                await self.loop.run_in_executor(None, transport.connect)
+                return transport
+            except Exception as e:
+                print(f"MQTT shard {shard.index} connect failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, BACKOFF_MAX)
+
+    def _patterns(self, shard):
+        patterns = [lot_topic_prefix(lot) + "+" for lot in shard.lots]
+        patterns += [lot_frame_prefix(lot) + "+" for lot in shard.lots]
+        if self.legacy_lot in shard.lots:
+            patterns.append("parking/slots/+")
+        return patterns
+
+    async def _run_shard(self, shard):
+        """Connects, subscribes and routes messages for one shard"""
+        shard.transport = await self._connect(shard)
+        loop = self.loop
+        inbox = shard.inbox
+        tap = self.tap
+
+        def on_message(topic, payload):
+            # Runs on the network thread: append and wake at most once
+            timestamp = time.time()
+            if tap is not None:
+                tap(topic, payload, timestamp)
+            inbox.append((topic, payload, timestamp))
+            if not shard.wake_pending:
+                shard.wake_pending = True
+                loop.call_soon_threadsafe(shard.wake.set)
+
+        shard.transport.start(self._patterns(shard), on_message)
+        shard.connected = True
+
+        route = self.router.route
+        route_frame = self.router.route_frame
+        parse = parse_status_payload
+        popleft = inbox.popleft
+        while True:
+            await shard.wake.wait()
+            shard.wake.clear()
+            shard.wake_pending = False
+            if not inbox:
+                continue
+            started = time.perf_counter()
+            QUEUE_DELAY.observe(time.time() - inbox[0][2])
+            received = shard.received
+            unrouted = shard.unrouted
+            while inbox:
+                topic, payload, timestamp = popleft()
+                shard.received += 1
+                target = route(topic)
+                if target is None:
+                    # Not a single-slot topic: try a multi-slot frame
+                    sink = route_frame(topic)
+                    if sink is None:
+                        shard.unrouted += 1
+                        continue
+                    try:
+                        frame = decode_frame(payload)
+                    except FrameError as e:
+                        shard.unrouted += 1
+                        print(f"Dropping frame on {topic}: {e}")
+                        continue
+                    sink.put_frame(topic, frame, timestamp)
+                    continue
+                parsed = parse(payload)
+                if parsed is None:
+                    shard.unrouted += 1
+                    continue
+                sink, slot_num = target
+                sink.put(slot_num, parsed[0], timestamp, parsed[1])
+            MESSAGES.inc(shard.received - received)
+            UNROUTED.inc(shard.unrouted - unrouted)
+            BATCH_SECONDS.since(started)
@@ -0,0 +1,61 @@
+import queue
+import time
+
+# ===== Ingestion Configuration =====
+DEFAULT_MAX_BATCH = 10000         # Messages pulled from the queue per drain
+
+
+class SlotUpdateQueue:
+    """
+    Hand-off between the MQTT network thread and the Tk main thread.
+    The producer side only appends to a SimpleQueue; the consumer drains it
+    in one go and coalesces bursts per slot so the GUI is touched once per
+    slot per tick, while every real status change is still reported.
+    """
+    def __init__(self, max_batch=DEFAULT_MAX_BATCH):
+        self.queue = queue.SimpleQueue()
+        self.max_batch = max_batch
+        self.received = 0             # Messages handed over by the producer
+        self.coalesced = 0            # Messages folded into a neighbouring update
+
+    def put(self, slot_num, status, timestamp=None, seq=None):
+        """
+        Queues a slot status (1 occupied, 0 empty) reported by the broker.
+        Called from the MQTT thread, never blocks. Sequence numbers are
+        handled upstream by DedupFilter and ignored here.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self.queue.put((slot_num, status, timestamp))
+        self.received += 1
+
+    def empty(self):
+        """Returns True when no updates are waiting"""
+        return self.queue.empty()
+
+    def drain(self, last_status):
+        """
+        Pulls waiting updates and groups them per slot.
+        Returns {slot: [(status, timestamp), ...]} holding only the status
+        changes relative to last_status (indexable by slot number, such as
+        SlotStateStore.occupied), in arrival order. Repeats of the same
+        status are dropped, keeping the time of the first message that
+        reported the change.
+        """
+        changes = {}
+        current = {}
+        get = self.queue.get_nowait
+        for _ in range(self.max_batch):
+            try:
+                slot_num, status, timestamp = get()
+            except queue.Empty:
+                break
+            previous = current.get(slot_num)
+            if previous is None:
+                previous = last_status[slot_num]
+            if status == previous:
+                self.coalesced += 1
+                continue
+            current[slot_num] = status
+            changes.setdefault(slot_num, []).append((status, timestamp))
+        return changes
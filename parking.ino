@@ -12,6 +12,13 @@ const char* mqtt_broker = "broker.hivemq.com";
 const int mqtt_port = 1883;
 const char* topic_slot1 = "parking/slots/1";
 const char* topic_slot2 = "parking/slots/2";
+const char* topic_frame = "parking/main/frames/controller1";
+
+// Set to 1 to report both slots in one binary frame instead of text topics
+#define USE_BINARY_FRAMES 0
+#define SLOT_COUNT 2
+#define FRAME_VERSION 1
+#define FRAME_FLAG_DISTANCES 0x01
 
 // Hardware pins
 #define TRIGGER_PIN_1 2
@@ -37,6 +44,19 @@ LiquidCrystal_I2C lcd2(0x26, 16, 2);
 // Timing variables
 unsigned long buzzerStartTime = 0;
 const int BUZZER_DURATION = 3000; // Buzzer duration in milliseconds
+const unsigned long HEARTBEAT_INTERVAL = 30000; // Re-publish unchanged status every 30 s
+
+// Change-only publishing state per slot
+int lastStatus[SLOT_COUNT] = {-1, -1};          // -1 until the first publish
+unsigned long lastPublishTime[SLOT_COUNT] = {0, 0};
+unsigned long sequenceNumber[SLOT_COUNT] = {0, 0};
+
+// Binary frame state: latest reading per slot
+int currentStatus[SLOT_COUNT] = {0, 0};
+int currentDistance[SLOT_COUNT] = {0, 0};
+int lastFrameBits = -1;
+unsigned long lastFrameTime = 0;
+unsigned long frameSequence = 0;
 
 void setup() {
   Serial.begin(9600);
@@ -77,15 +97,72 @@ void connectMQTT() {
   Serial.println("\nConnected to MQTT broker");
 }
 
-void handleParking(NewPing &sonar, LiquidCrystal_I2C &lcd, int buzzerPin, const char* topic) {
+// Publishes "<status>:<seq>" only when the status changed or the heartbeat is due
+void publishStatus(int slotIndex, const char* topic, bool occupied) {
+  unsigned long now = millis();
+  int status = occupied ? 1 : 0;
+  currentStatus[slotIndex] = status;
+  if (USE_BINARY_FRAMES) {
+    return;  // Reported by publishFrame() once per loop
+  }
+  if (status == lastStatus[slotIndex] && now - lastPublishTime[slotIndex] < HEARTBEAT_INTERVAL) {
+    return;
+  }
+  sequenceNumber[slotIndex]++;
+  mqttClient.beginMessage(topic);
+  mqttClient.print(occupied ? "occupied:" : "empty:");
+  mqttClient.print(sequenceNumber[slotIndex]);
+  mqttClient.endMessage();
+  lastStatus[slotIndex] = status;
+  lastPublishTime[slotIndex] = now;
+}
+
+// Publishes all slots in one binary frame (see frames.py) on change or heartbeat
+void publishFrame() {
+  unsigned long now = millis();
+  int bits = 0;
+  for (int i = 0; i < SLOT_COUNT; i++) {
+    bits |= currentStatus[i] << i;
+  }
+  if (bits == lastFrameBits && now - lastFrameTime < HEARTBEAT_INTERVAL) {
+    return;
+  }
+  frameSequence++;
+
+  // Header: version, flags, first slot (u16), count (u16), seq (u32), little-endian
+  uint8_t frame[10 + (SLOT_COUNT + 7) / 8 + SLOT_COUNT];
+  int n = 0;
+  frame[n++] = FRAME_VERSION;
+  frame[n++] = FRAME_FLAG_DISTANCES;
+  frame[n++] = 1;
+  frame[n++] = 0;
+  frame[n++] = SLOT_COUNT & 0xFF;
+  frame[n++] = SLOT_COUNT >> 8;
+  for (int i = 0; i < 4; i++) {
+    frame[n++] = (frameSequence >> (8 * i)) & 0xFF;
+  }
+  for (int i = 0; i < (SLOT_COUNT + 7) / 8; i++) {
+    frame[n++] = (bits >> (8 * i)) & 0xFF;
+  }
+  for (int i = 0; i < SLOT_COUNT; i++) {
+    frame[n++] = currentDistance[i];
+  }
+
+  mqttClient.beginMessage(topic_frame);
+  mqttClient.write(frame, n);
+  mqttClient.endMessage();
+  lastFrameBits = bits;
+  lastFrameTime = now;
+}
+
+void handleParking(NewPing &sonar, LiquidCrystal_I2C &lcd, int buzzerPin, const char* topic, int slotIndex) {
   int distance = sonar.ping_cm();
+  currentDistance[slotIndex] = distance;
 
   if (distance == 0) {
     lcd.clear();
     lcd.print("No car detected");
-    mqttClient.beginMessage(topic);
-    mqttClient.print("empty");
-    mqttClient.endMessage();
+    publishStatus(slotIndex, topic, false);
     
     // Turn off the buzzer if no car is detected
     digitalWrite(buzzerPin, LOW);
@@ -100,9 +177,7 @@ void handleParking(NewPing &sonar, LiquidCrystal_I2C &lcd, int buzzerPin, const
       buzzerStartTime = millis();  // Start timer
     }
 
-    mqttClient.beginMessage(topic);
-    mqttClient.print("occupied");
-    mqttClient.endMessage();
+    publishStatus(slotIndex, topic, true);
   }
   else if (distance <= SAFE_DISTANCE) {
     lcd.clear();
@@ -110,9 +185,7 @@ void handleParking(NewPing &sonar, LiquidCrystal_I2C &lcd, int buzzerPin, const
 
     // Turn off the buzzer if the car is at a safe distance
     digitalWrite(buzzerPin, LOW);
-    mqttClient.beginMessage(topic);
-    mqttClient.print("occupied");
-    mqttClient.endMessage();
+    publishStatus(slotIndex, topic, true);
   }
   else {
     lcd.clear();
@@ -120,9 +193,7 @@ void handleParking(NewPing &sonar, LiquidCrystal_I2C &lcd, int buzzerPin, const
 
     // Turn off the buzzer if the car is not in the "too close" range
     digitalWrite(buzzerPin, LOW);
-    mqttClient.beginMessage(topic);
-    mqttClient.print("occupied");
-    mqttClient.endMessage();
+    publishStatus(slotIndex, topic, true);
   }
 
   // Automatically turn off the buzzer after BUZZER_DURATION
@@ -135,10 +206,14 @@ void loop() {
   mqttClient.poll();
 
   // Handle parking slot 1
-  handleParking(sonar1, lcd1, BUZZER_1, topic_slot1);
+  handleParking(sonar1, lcd1, BUZZER_1, topic_slot1, 0);
 
   // Handle parking slot 2
-  handleParking(sonar2, lcd2, BUZZER_2, topic_slot2);
+  handleParking(sonar2, lcd2, BUZZER_2, topic_slot2, 1);
+
+  if (USE_BINARY_FRAMES) {
+    publishFrame();
+  }
 
   delay(1000);
 }
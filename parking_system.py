@@ -1,85 +1,71 @@
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox
-from paho.mqtt.client import Client as MqttClient
-from datetime import datetime
 import sqlite3
-import RPi.GPIO as GPIO
 import time
-import hashlib
-
-# ===== Global Configuration =====
-# MQTT broker settings for communication
-mqtt_broker = "broker.hivemq.com"  # Public MQTT broker
-mqtt_port = 1883                   # Default MQTT port
-topic_prefix = "parking/slots/"    # Topic prefix for parking slots
-
-# ===== GPIO Configuration =====
-GPIO.setwarnings(False)            # Disable GPIO warnings
-GPIO.setmode(GPIO.BCM)            # Use Broadcom pin-numbering scheme
-
-# Pin definitions for hardware components
-SERVO_PIN = 17                    # GPIO pin for servo motor control
-IR_PIN = 4                        # GPIO pin for IR sensor input
-
-# Configure GPIO pins
-GPIO.setup(SERVO_PIN, GPIO.OUT)   # Set servo pin as output
-GPIO.setup(IR_PIN, GPIO.IN)       # Set IR sensor pin as input
-
-# Initialize servo motor
-servo = GPIO.PWM(SERVO_PIN, 50)   # PWM frequency: 50Hz
-servo.start(0)                    # Start PWM with 0% duty cycle
+import config
+import hardware
+import metrics
+from auth import Authenticator
+from database import UserStore
+from engine import ParkingEngine
+from slot_view import SlotGridView, SummaryHeader, format_slot_row
+from reports import ParkingReports
+
+# ===== GUI Configuration =====
+DURATION_TICK_MS = 1000            # Refresh interval for visible durations
+RENDER_FPS = 10                    # Most slot grid redraws per second
+AUTH_POLL_MS = 25                  # Interval for checking a pending login/registration
+REPORT_RANGES = {                  # Report period choices, in seconds
+    "Last 24 hours": 86400,
+    "Last 7 days": 7 * 86400,
+    "Last 30 days": 30 * 86400,
+    "Last 365 days": 365 * 86400,
+}
+
+TK_LOOP_LAG = metrics.histogram(
+    "parking_event_loop_lag_seconds", "Delay of timer callbacks past their due time",
+    labels={"loop": "tk"}
+)
+APPLY_CALLBACK = metrics.histogram(
+    "parking_tk_callback_seconds", "Time spent in a Tk callback", labels={"callback": "apply"}
+)
+TICK_CALLBACK = metrics.histogram(
+    "parking_tk_callback_seconds", "Time spent in a Tk callback", labels={"callback": "tick"}
+)
+IR_CALLBACK = metrics.histogram(
+    "parking_tk_callback_seconds", "Time spent in a Tk callback", labels={"callback": "ir"}
+)
+RENDER_CALLBACK = metrics.histogram(
+    "parking_tk_callback_seconds", "Time spent in a Tk callback", labels={"callback": "render"}
+)
 
 class LoginSystem:
     """
     Handles user authentication and database management for the parking system.
     Provides login interface and user registration functionality.
     """
-    def __init__(self, root):
+    def __init__(self, root, engine):
         self.root = root
+        self.engine = engine
         self.root.title("Smart Parking System - Login")
+        self.session = None
         self.setup_database()
         self.create_login_gui()
         
     def setup_database(self):
         """
-        Initializes SQLite database and creates necessary tables.
-        Sets up default admin user if not exists.
+        Opens the engine's database for user authentication.
+        The engine migrates the schema and creates the default admin.
         """
-        self.conn = sqlite3.connect("parking_system.db")
-        self.cursor = self.conn.cursor()
-        
-        # Create users table for authentication
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL
-            )
-        """)
-        
-        # Create table for parking records
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS parking_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                slot INTEGER,
-                entry_time TEXT,
-                exit_time TEXT,
-                duration TEXT
-            )
-        """)
-        
-        # Create default admin account
-        default_password = hashlib.sha256("admin123".encode()).hexdigest()
-        try:
-            self.cursor.execute(
-                "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                ("admin", default_password, "admin")
-            )
-            self.conn.commit()
-        except sqlite3.IntegrityError:
-            # Skip if admin user already exists
-            pass
+        self.db = self.engine.open_database()
+        # Password hashing runs on worker threads; sessions are cached in memory
+        self.auth = Authenticator(
+            UserStore(self.db),
+            workers=config.AUTH_WORKERS,
+            session_ttl=config.SESSION_TTL_S,
+            session_limit=config.SESSION_CACHE_SIZE
+        )
 
     def create_login_gui(self):
         """
@@ -141,7 +127,7 @@ class LoginSystem:
         self.password_entry.pack(pady=(5, 20))
 
         # Login button
-        login_button = tk.Button(
+        self.login_button = login_button = tk.Button(
             login_frame,
             text="Login",
             command=self.login,
@@ -171,25 +157,46 @@ class LoginSystem:
     def login(self):
         """
         Handles user login authentication.
-        Verifies credentials against database and opens parking management window if successful.
+        The password check runs on the auth worker pool; the window stays
+        responsive and the result is picked up by finish_login.
         """
         username = self.username_entry.get()
-        # Hash password for security
-        password = hashlib.sha256(self.password_entry.get().encode()).hexdigest()
-        
-        # Check credentials
-        self.cursor.execute(
-            "SELECT * FROM users WHERE username=? AND password=?",
-            (username, password)
-        )
-        user = self.cursor.fetchone()
-        
-        if user:
-            self.root.withdraw()  # Hide login window
-            parking_window = tk.Toplevel()
-            app = ParkingSlotGUI(parking_window, self)
+        password = self.password_entry.get()
+        self.login_button.configure(state="disabled")
+        future = self.auth.login(username, password)
+        self.wait_for(future, self.finish_login)
+
+    def wait_for(self, future, callback, window=None):
+        """Polls a worker Future from the Tk loop and calls back on the GUI thread"""
+        window = window or self.root
+        if future.done():
+            callback(future)
         else:
+            window.after(AUTH_POLL_MS, self.wait_for, future, callback, window)
+
+    def finish_login(self, future):
+        """Opens the parking management window if the login succeeded"""
+        self.login_button.configure(state="normal")
+        try:
+            session = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Login failed: {e}")
+            return
+        if session is None:
             messagebox.showerror("Error", "Invalid username or password")
+            return
+
+        self.session = session
+        self.password_entry.delete(0, "end")
+        self.root.withdraw()  # Hide login window
+        parking_window = tk.Toplevel()
+        app = ParkingSlotGUI(parking_window, self, self.engine)
+
+    def end_session(self):
+        """Forgets the cached session of the operator logging out"""
+        if self.session is not None:
+            self.auth.logout(self.session.token)
+            self.session = None
 
     def show_register(self):
         """
@@ -276,18 +283,25 @@ class LoginSystem:
                 messagebox.showerror("Error", "Passwords do not match")
                 return
 
+            # Hash password and store user on the auth worker pool
+            register_btn.configure(state="disabled")
+            future = self.auth.register(username, password)
+            self.wait_for(future, finish_register, register_window)
+
+        def finish_register(future):
+            """Reports the outcome of a registration"""
             try:
-                # Hash password and store user
-                hashed_password = hashlib.sha256(password.encode()).hexdigest()
-                self.cursor.execute(
-                    "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                    (username, hashed_password, "user")
-                )
-                self.conn.commit()
-                messagebox.showinfo("Success", "Registration successful!")
-                register_window.destroy()
+                future.result()
             except sqlite3.IntegrityError:
+                register_btn.configure(state="normal")
                 messagebox.showerror("Error", "Username already exists")
+                return
+            except Exception as e:
+                register_btn.configure(state="normal")
+                messagebox.showerror("Error", f"Registration failed: {e}")
+                return
+            messagebox.showinfo("Success", "Registration successful!")
+            register_window.destroy()
 
         # Register button
         register_btn = tk.Button(
@@ -306,11 +320,13 @@ class LoginSystem:
 class ParkingSlotGUI:
     """
     Main parking management interface.
-    Handles parking slot status, timing, and MQTT communication.
+    Displays slot status and timing from a ParkingEngine, which does the
+    MQTT, persistence and gate work.
     """
-    def __init__(self, root, login_system):
+    def __init__(self, root, login_system, engine):
         self.root = root
         self.login_system = login_system
+        self.engine = engine
         self.root.title("Smart Parking Management System")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -324,22 +340,36 @@ class ParkingSlotGUI:
         self.root.geometry(f"{window_width}x{window_height}+{x}+{y}")
         self.root.configure(bg="#2C3E50")
 
-        # Initialize tracking dictionaries
-        self.slots_labels = {}         # Status labels for each slot
-        self.entry_time_labels = {}    # Entry time labels
-        self.exit_time_labels = {}     # Exit time labels
-        self.duration_labels = {}      # Duration labels
-        self.entry_times = {}          # Track entry times
-        self.occupancy_status = {}     # Track slot occupancy
+        # Occupancy and timing for every slot
+        self.slot_count = engine.slot_count
+        self.slots = engine.slots
+        self.timer_job = None             # Tk after() id driving the engine's timer wheel
+        self.timer_due = None             # perf_counter time the next wheel tick is due
+        self.timer_handles = []
 
         # Setup GUI components
         self.setup_gui()
-        
-        # Initialize MQTT client
-        self.setup_mqtt()
-        
-        # Start IR sensor monitoring
-        self.check_ir_sensor()
+
+        # Start the engine; the GPIO thread queues IR sensor edges and wakes
+        # the Tk loop, which drains them
+        self.ir_wake_pending = False
+        self.ir_pipe = None               # (read fd, write fd) waking Tk on IR edges
+        self.setup_ir_wakeup()
+        self.engine.start(ir_notify=self.wake_ir_drain)
+        self.slots = engine.slots     # Shared memory when ingesting in worker processes
+        self.summary.reset(self.slots.occupied)
+
+        # Periodic GUI work shares the engine's timer wheel with its services
+        timers = self.engine.timers
+        self.timer_handles = [
+            timers.call_every(config.MQTT_APPLY_MS / 1000.0, self.apply_slot_updates),
+            # One shared ticker refreshes the durations of all visible slots
+            timers.call_every(DURATION_TICK_MS / 1000.0, self.update_elapsed_time),
+            # Changes only mark slots dirty; frames redraw them at a capped rate
+            timers.call_every(1.0 / RENDER_FPS, self.render_frame),
+        ]
+        timers.on_earlier = self.reschedule_timers
+        self.run_timers()
 
     def setup_gui(self):
         """
@@ -379,230 +409,328 @@ class ParkingSlotGUI:
         content_frame = tk.Frame(self.root, bg="#2C3E50")
         content_frame.pack(fill="both", expand=True, padx=20, pady=20)
 
-        # Create parking slot displays
-        for slot_num in range(1, 3):
-            # Slot container
-            slot_frame = tk.Frame(
-                content_frame,
-                bg="#34495E",
-                padx=30,
-                pady=20,
-                relief="raised",
-                bd=1
-            )
-            slot_frame.pack(fill="x", pady=10)
-
-            # Slot number header
-            slot_label = tk.Label(
-                slot_frame,
-                text=f"Parking Slot {slot_num}",
-                font=("Helvetica", 18, "bold"),
-                fg="#ECF0F1",
-                bg="#34495E"
-            )
-            slot_label.pack()
-
-            # Status indicator
-            status_label = tk.Label(
-                slot_frame,
-                text="Status: Empty",
-                font=("Helvetica", 14),
-                fg="#2ECC71",
-                bg="#34495E"
-            )
-            status_label.pack(pady=10)
-            self.slots_labels[slot_num] = status_label
-
-            # Time information container
-            time_frame = tk.Frame(slot_frame, bg="#34495E")
-            time_frame.pack(fill="x", pady=5)
-
-            # Entry time display
-            entry_time_label = tk.Label(
-                time_frame,
-                text="Entry: N/A",
-                font=("Helvetica", 12),
-                fg="#ECF0F1",
-                bg="#34495E"
-            )
-            entry_time_label.pack(pady=5)
-            self.entry_time_labels[slot_num] = entry_time_label
-
-            # Exit time display
-            exit_time_label = tk.Label(
-                time_frame,
-                text="Exit: N/A",
-                font=("Helvetica", 12),
-                fg="#ECF0F1",
-                bg="#34495E"
-            )
-            exit_time_label.pack(pady=5)
-            self.exit_time_labels[slot_num] = exit_time_label
-
-            # Duration display
-            duration_label = tk.Label(
-                time_frame,
-                text="Duration: 0 min 0 sec",
-                font=("Helvetica", 12),
-                fg="#ECF0F1",
-                bg="#34495E"
-            )
-            duration_label.pack(pady=5)
-            self.duration_labels[slot_num] = duration_label
-
-            # Initialize tracking variables
-            self.entry_times[slot_num] = None
-            self.occupancy_status[slot_num] = "Empty"
+        # Tabs for the live slot view and historical reports
+        notebook = ttk.Notebook(content_frame)
+        notebook.pack(fill="both", expand=True)
+        slots_tab = tk.Frame(notebook, bg="#2C3E50")
+        reports_tab = tk.Frame(notebook, bg="#2C3E50")
+        notebook.add(slots_tab, text="Slots")
+        notebook.add(reports_tab, text="Reports")
+
+        # Lot-wide counts, kept up to date from slot changes
+        self.summary = SummaryHeader(slots_tab, self.slot_count)
+        self.summary.pack(fill="x", pady=(10, 0))
+        self.setup_finder(slots_tab)
+
+        # Parking slot displays; only slots scrolled into view are drawn
+        self.slot_grid = SlotGridView(slots_tab, self.slot_count, self.slot_row)
+        self.slot_grid.pack(fill="both", expand=True)
+
+        self.setup_reports_tab(reports_tab)
+
+    def setup_finder(self, parent):
+        """Creates the nearest-free-slot search bar above the slot grid"""
+        finder = tk.Frame(parent, bg="#2C3E50")
+        finder.pack(fill="x", pady=(10, 0))
+        entrances = list(self.engine.layout.entrances)
+        self.finder_entrance = ttk.Combobox(
+            finder, values=entrances, state="readonly", width=15
+        )
+        self.finder_entrance.current(0)
+        self.finder_entrance.pack(side="left", padx=(0, 10))
+        self.finder_ev = tk.BooleanVar()
+        self.finder_accessible = tk.BooleanVar()
+        for text, variable in (("EV", self.finder_ev), ("Accessible", self.finder_accessible)):
+            tk.Checkbutton(
+                finder, text=text, variable=variable,
+                bg="#2C3E50", fg="#ECF0F1", selectcolor="#34495E"
+            ).pack(side="left", padx=(0, 10))
+        find_btn = tk.Button(
+            finder,
+            text="Find Nearest Free Slot",
+            command=self.find_slot,
+            font=("Helvetica", 12),
+            bg="#3498DB",
+            fg="white",
+            padx=15,
+            relief="flat"
+        )
+        find_btn.pack(side="left", padx=(0, 10))
+        self.finder_result = tk.Label(
+            finder, text="", font=("Helvetica", 12), fg="#ECF0F1", bg="#2C3E50"
+        )
+        self.finder_result.pack(side="left")
+
+    def find_slot(self):
+        """Shows the nearest free slot for the chosen entrance and needs"""
+        flags = [name for name, variable in (
+            ("ev", self.finder_ev), ("accessible", self.finder_accessible)
+        ) if variable.get()]
+        slot_num = self.engine.nearest_free_slot(self.finder_entrance.get(), flags)
+        if slot_num is None:
+            self.finder_result.config(text="No matching free slot")
+        else:
+            self.finder_result.config(text=self.engine.layout.describe(slot_num))
+
+    def setup_reports_tab(self, parent):
+        """
+        Creates the reports tab with dwell statistics, peak hours and
+        per-slot turnover. All figures come from the rollup tables.
+        """
+        self.reports = ParkingReports(self.engine.db.reader(), self.slot_count)
+
+        # Period selection
+        controls = tk.Frame(parent, bg="#2C3E50")
+        controls.pack(fill="x", pady=10)
+        self.report_range = ttk.Combobox(
+            controls,
+            values=list(REPORT_RANGES),
+            state="readonly",
+            width=20
+        )
+        self.report_range.current(1)
+        self.report_range.pack(side="left", padx=(0, 10))
+        self.report_range.bind("<<ComboboxSelected>>", lambda event: self.refresh_reports())
+        refresh_btn = tk.Button(
+            controls,
+            text="Refresh",
+            command=self.refresh_reports,
+            font=("Helvetica", 12),
+            bg="#3498DB",
+            fg="white",
+            padx=15,
+            relief="flat"
+        )
+        refresh_btn.pack(side="left")
+
+        # Summary figures
+        self.report_summary = tk.Label(
+            parent,
+            text="",
+            font=("Helvetica", 12),
+            fg="#ECF0F1",
+            bg="#2C3E50",
+            justify="left",
+            anchor="w"
+        )
+        self.report_summary.pack(fill="x", pady=10)
+
+        # Per-slot turnover table
+        self.turnover_tree = ttk.Treeview(
+            parent,
+            columns=("slot", "stays", "per_day", "avg_dwell"),
+            show="headings",
+            height=12
+        )
+        for column, heading in (
+            ("slot", "Slot"),
+            ("stays", "Stays"),
+            ("per_day", "Stays / day"),
+            ("avg_dwell", "Avg dwell (min)"),
+        ):
+            self.turnover_tree.heading(column, text=heading)
+            self.turnover_tree.column(column, anchor="center", width=120)
+        self.turnover_tree.pack(fill="both", expand=True)
+
+        self.refresh_reports()
+
+    def refresh_reports(self):
+        """Reloads the reports tab for the selected period"""
+        end = int(time.time())
+        start = end - REPORT_RANGES[self.report_range.get()]
+        try:
+            stays, avg_dwell, p95_dwell = self.reports.dwell_stats(start, end)
+            peaks = self.reports.peak_hours(start, end)
+            turnover = self.reports.turnover_by_slot(start, end)
+            charged, revenue = self.reports.revenue(start, end)
+        except sqlite3.Error as e:
+            print(f"Error loading reports: {e}")
+            return
+
+        peak_text = ", ".join(
+            f"{hour:02d}:00 ({ratio:.0%})" for hour, ratio in peaks
+        ) or "N/A"
+        self.report_summary.config(text=(
+            f"Completed stays: {stays}\n"
+            f"Average dwell: {avg_dwell / 60:.1f} min\n"
+            f"95th percentile dwell: {p95_dwell / 60:.1f} min\n"
+            f"Peak hours: {peak_text}\n"
+            f"Revenue: {revenue / 100:.2f} from {charged} charged stays"
+        ))
+
+        self.turnover_tree.delete(*self.turnover_tree.get_children())
+        for slot, slot_stays, per_day, slot_dwell in turnover:
+            self.turnover_tree.insert("", "end", values=(
+                slot, slot_stays, f"{per_day:.2f}", f"{slot_dwell / 60:.1f}"
+            ))
+
+    def slot_row(self, slot_num):
+        """
+        Returns the display strings for a slot card.
+        Called by the grid only for slots that are on screen.
+        """
+        return format_slot_row(self.slots, slot_num)
+
+    def setup_ir_wakeup(self):
+        """
+        Lets the GPIO thread wake the Tk loop without calling into Tk:
+        it writes a byte to a pipe whose read end Tk watches. Where Tk
+        cannot watch files (Windows), a virtual event is queued instead.
+        """
+        self.root.bind("<<SensorEdge>>", lambda event: self.check_ir_sensor())
+        if not hasattr(self.root.tk, "createfilehandler"):
+            return
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        os.set_blocking(write_fd, False)
+        self.ir_pipe = (read_fd, write_fd)
+        self.root.tk.createfilehandler(read_fd, tk.READABLE, self.on_ir_wakeup)
+
+    def close_ir_wakeup(self):
+        """Closes the wakeup pipe once the sensor has stopped"""
+        if self.ir_pipe is None:
+            return
+        read_fd, write_fd = self.ir_pipe
+        self.ir_pipe = None
+        self.root.tk.deletefilehandler(read_fd)
+        os.close(read_fd)
+        os.close(write_fd)
+
+    def wake_ir_drain(self):
+        """
+        Wakes the Tk loop when the IR sensor queues a new edge.
+        Called from the GPIO thread; one wakeup covers a whole burst.
+        """
+        if self.ir_wake_pending:
+            return
+        self.ir_wake_pending = True
+        pipe = self.ir_pipe
+        try:
+            if pipe is not None:
+                os.write(pipe[1], b"\0")
+            else:
+                self.root.event_generate("<<SensorEdge>>", when="tail")
+        except BlockingIOError:
+            pass  # The pipe is full, so a wakeup is already pending
+        except (OSError, tk.TclError):
+            pass  # Window already destroyed
+
+    def on_ir_wakeup(self, read_fd, mask):
+        """Tk file handler for the wakeup pipe"""
+        try:
+            os.read(read_fd, 4096)
+        except BlockingIOError:
+            pass
+        self.check_ir_sensor()
 
     def check_ir_sensor(self):
         """
-        Monitors IR sensor status and controls gate accordingly.
-        Runs every 100ms.
+        Drains queued IR sensor edges and controls gate accordingly.
+        Runs on the Tk thread when the sensor wakes it; reschedules
+        itself while a burst is still queued.
         """
-        if GPIO.input(IR_PIN):
-            self.open_gate()
-        else:
-            self.close_gate()
-        self.root.after(100, self.check_ir_sensor)
+        started = time.perf_counter()
+        self.ir_wake_pending = False
+        if self.engine.handle_ir_events():
+            self.root.after_idle(self.check_ir_sensor)
+        IR_CALLBACK.since(started)
 
     def open_gate(self):
-        """Controls servo to open the parking gate"""
-        servo.ChangeDutyCycle(7)  # 90-degree position
-        time.sleep(1)
-        servo.ChangeDutyCycle(0)  # Stop servo jitter
+        """Posts an intent to open the parking gate"""
+        self.engine.open_gate()
 
     def close_gate(self):
-        """Controls servo to close the parking gate"""
-        servo.ChangeDutyCycle(2.5)  # 0-degree position
-        time.sleep(1)
-        servo.ChangeDutyCycle(0)  # Stop servo jitter
+        """Posts an intent to close the parking gate"""
+        self.engine.close_gate()
+
+    def cancel_timers(self):
+        """Cancels the periodic callbacks before the window is destroyed"""
+        for handle in self.timer_handles:
+            handle.cancel()
+        self.timer_handles = []
+        self.engine.timers.on_earlier = None
+        if self.timer_job is not None:
+            self.root.after_cancel(self.timer_job)
+            self.timer_job = None
+
+    def run_timers(self):
+        """
+        Advances the engine's timer wheel from the Tk loop.
+        This is the only after() chain; how late it fires is recorded as
+        the Tk event-loop lag.
+        """
+        started = time.perf_counter()
+        if self.timer_due is not None:
+            TK_LOOP_LAG.observe(max(0.0, started - self.timer_due))
+        self.engine.timers.advance()
+        self.schedule_timers()
+
+    def schedule_timers(self):
+        """Sleeps the after() chain until the wheel's next due timer"""
+        delay = self.engine.timers.time_until_next()
+        self.timer_due = time.perf_counter() + delay
+        self.timer_job = self.root.after(int(delay * 1000) + 1, self.run_timers)
+
+    def reschedule_timers(self):
+        """Wakes the after() chain sooner for a timer scheduled outside it"""
+        if self.timer_job is not None:
+            self.root.after_cancel(self.timer_job)
+            self.schedule_timers()
 
     def logout(self):
         """Handles user logout and returns to login screen"""
+        self.login_system.end_session()
+        self.cancel_timers()
+        self.engine.stop()
+        self.close_ir_wakeup()
         self.root.destroy()
         self.login_system.root.deiconify()
 
     def on_closing(self):
         """Cleanup on window close"""
+        self.cancel_timers()
+        self.engine.stop()
+        self.close_ir_wakeup()
         self.root.destroy()
         self.login_system.root.destroy()
 
-    def setup_mqtt(self):
-        """
-        Initializes MQTT client and connects to broker.
-        Sets up message handling for parking slot status updates.
-        """
-        self.mqtt_client = MqttClient()
-        self.mqtt_client.on_connect = self.on_connect
-        self.mqtt_client.on_message = self.on_message
-        self.mqtt_client.connect(mqtt_broker, mqtt_port, 60)
-        self.mqtt_client.loop_start()
-
-    def on_connect(self, client, userdata, flags, rc):
-        """Callback for when MQTT client connects to broker"""
-        client.subscribe(topic_prefix + "#")
-
-    def on_message(self, client, userdata, message):
-        """
-        Handles incoming MQTT messages.
-        Updates parking slot status and timing information.
-        """
-        try:
-            topic = message.topic
-            payload = message.payload.decode()
-            slot_num = int(topic.split('/')[-1])
-
-            if slot_num in self.slots_labels and payload in ["occupied", "empty"]:
-                new_status = "Occupied" if payload == "occupied" else "Empty"
-                
-                # Update slot status if changed
-                if self.occupancy_status[slot_num] != new_status:
-                    self.occupancy_status[slot_num] = new_status
-                    if new_status == "Occupied":
-                        self.start_timer(slot_num)
-                    else:
-                        self.stop_timer(slot_num)
-                    
-                    # Update display
-                    color = "#E74C3C" if new_status == "Occupied" else "#2ECC71"
-                    self.slots_labels[slot_num].config(
-                        text=f"Status: {new_status}",
-                        fg=color
-                    )
-
-        except Exception as e:
-            print(f"Error processing message: {e}")
-
-    def start_timer(self, slot_num):
+    def apply_slot_updates(self):
         """
-        Starts timing for an occupied parking slot.
-        Records entry time and begins duration updates.
+        Applies queued slot updates through the engine on the GUI thread.
+        Changed slots are marked dirty for the next frame.
         """
-        entry_time = datetime.now()
-        self.entry_times[slot_num] = entry_time
-        self.entry_time_labels[slot_num].config(
-            text=f"Entry: {entry_time.strftime('%Y-%m-%d %H:%M:%S')}"
-        )
-        self.update_elapsed_time(slot_num)
-
-    def stop_timer(self, slot_num):
-        """
-        Stops timing for a parking slot.
-        Records exit time and calculates total duration.
-        """
-        entry_time = self.entry_times.get(slot_num)
-        if entry_time:
-            exit_time = datetime.now()
-            elapsed_time = exit_time - entry_time
-            duration_text = f"{int(elapsed_time.total_seconds() // 60)} min {int(elapsed_time.total_seconds() % 60)} sec"
-            
-            # Update display
-            self.exit_time_labels[slot_num].config(
-                text=f"Exit: {exit_time.strftime('%Y-%m-%d %H:%M:%S')}"
-            )
-            self.duration_labels[slot_num].config(
-                text=f"Duration: {duration_text}"
-            )
-
-            # Save parking record
-            self.save_record(slot_num, entry_time, exit_time, duration_text)
-            self.entry_times[slot_num] = None
-
-    def save_record(self, slot, entry_time, exit_time, duration):
-        """
-        Saves parking record to database.
-        Records slot number, entry/exit times, and duration.
-        """
-        try:
-            self.login_system.cursor.execute("""
-                INSERT INTO parking_records (slot, entry_time, exit_time, duration)
-                VALUES (?, ?, ?, ?)
-            """, (
-                slot,
-                entry_time.strftime("%Y-%m-%d %H:%M:%S"),
-                exit_time.strftime("%Y-%m-%d %H:%M:%S"),
-                duration
-            ))
-            self.login_system.conn.commit()
-        except sqlite3.Error as e:
-            print(f"Error saving record: {e}")
-
-    def update_elapsed_time(self, slot_num):
+        started = time.perf_counter()
+        occupied = self.slots.occupied
+        for slot_num in self.engine.apply_updates():
+            self.slot_grid.mark_dirty(slot_num)
+            self.summary.slot_changed(slot_num, occupied[slot_num])
+        APPLY_CALLBACK.since(started)
+
+    def update_elapsed_time(self):
         """
-        Updates the displayed duration for an occupied parking slot.
-        Updates every second while slot is occupied.
+        Updates the displayed durations of visible parking slots.
+        One 1 Hz timer serves every slot; only occupied slots have a
+        running duration, so only they are marked dirty.
         """
-        if slot_num in self.entry_times and self.entry_times[slot_num]:
-            elapsed = datetime.now() - self.entry_times[slot_num]
-            minutes, seconds = divmod(elapsed.total_seconds(), 60)
-            time_text = f"Duration: {int(minutes)} min {int(seconds)} sec"
-            self.duration_labels[slot_num].config(text=time_text)
-            self.root.after(1000, lambda: self.update_elapsed_time(slot_num))
+        started = time.perf_counter()
+        self.slot_grid.mark_visible_dirty(self.slots.occupied)
+        TICK_CALLBACK.since(started)
+
+    def render_frame(self):
+        """Redraws dirty slots on screen and the summary, at most RENDER_FPS times a second"""
+        started = time.perf_counter()
+        drawn = self.slot_grid.flush()
+        self.summary.render()
+        if drawn:
+            RENDER_CALLBACK.since(started)
 
 if __name__ == "__main__":
+    engine = ParkingEngine()
     try:
         root = tk.Tk()
-        login_system = LoginSystem(root)
+        login_system = LoginSystem(root, engine)
         root.mainloop()
+        login_system.auth.close()
     finally:
-        GPIO.cleanup()  # Ensure proper GPIO cleanup on exit
+        engine.close()
+        hardware.cleanup()  # Ensure proper GPIO cleanup on exit
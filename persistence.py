@@ -0,0 +1,272 @@
+import queue
+import sqlite3
+import threading
+import time
+
+import metrics
+from reports import update_revenue, update_rollups, update_slot_rollups
+
+# ===== Write-Behind Configuration =====
+DEFAULT_BATCH_SIZE = 200          # Records per transaction before forcing a flush
+DEFAULT_FLUSH_MS = 500            # Longest time a record waits in the buffer
+SYNCHRONOUS_MODE = "NORMAL"       # WAL + NORMAL: fsync on checkpoint, not per commit
+BUSY_TIMEOUT_MS = 5000            # Wait this long for a competing writer instead of failing
+STATEMENT_CACHE = 128             # Prepared statements kept per connection
+RETRY_S = 5.0                     # Delay before rows that failed to commit are retried
+
+INSERT_RECORD = """
+    INSERT INTO parking_records (slot, entry_time, exit_time, duration, charge)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+COMMIT_SECONDS = metrics.histogram(
+    "parking_record_commit_seconds", "Time to commit one batch of parking records"
+)
+RECORDS_WRITTEN = metrics.counter("parking_records_written_total", "Parking records committed")
+WRITE_ERRORS = metrics.counter(
+    "parking_record_errors_total", "Parking record batches that failed to commit"
+)
+
+_FLUSH = object()                 # Queue marker asking the writer to flush now
+_STOP = object()                  # Queue marker asking the writer to exit
+
+
+def configure_connection(conn):
+    """
+    Switches a connection to WAL journaling with relaxed syncing, and
+    makes it wait out short write locks held by other connections.
+    """
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS_MODE}")
+
+
+def connect(path, read_only=False):
+    """
+    Opens a configured connection.
+    The connection may be handed to another thread, but must only be used
+    by one thread at a time. Read-only connections refuse writes.
+    """
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000.0,
+        cached_statements=STATEMENT_CACHE,
+        check_same_thread=False
+    )
+    configure_connection(conn)
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def submit_stay(writer, tariffs, slot, entry_time, exit_time):
+    """
+    Prices a finished stay with a TariffTable and queues its record:
+    slot number, entry/exit epoch seconds, duration seconds and the
+    charge in cents.
+    """
+    entry = int(entry_time)
+    exit_ = int(exit_time)
+    writer.submit((slot, entry, exit_, exit_ - entry, tariffs.charge(slot, entry, exit_)))
+
+
+def recover_sessions(journal, slots, conn, save):
+    """
+    Restores slots from a SessionJournal.
+    Stays closed by replayed exits are passed to save(slot, entry, exit)
+    unless conn's database already has them, since the process may have
+    died before the record writer committed them. Returns the number of
+    finished stays replayed.
+    """
+    started = time.perf_counter()
+    finished = journal.recover(slots)
+    for slot_num, entry_time, exit_time in finished:
+        exists = conn.execute(
+            "SELECT 1 FROM parking_records WHERE slot=? AND entry_time=?",
+            (slot_num, int(entry_time))
+        ).fetchone()
+        if exists is None:
+            save(slot_num, entry_time, exit_time)
+    if slots.occupied_count or finished:
+        print(
+            f"Recovered {slots.occupied_count} parked cars and "
+            f"{len(finished)} finished stays in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+    return len(finished)
+
+
+class FlushRequest:
+    """
+    Completion of a RecordWriter flush.
+    done() turns true once the writer has handled every record submitted
+    before the request; ok then tells whether all of them are committed.
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.ok = False
+
+    def done(self):
+        return self.event.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until done; returns True only if everything was committed"""
+        return self.event.wait(timeout) and self.ok
+
+    def _finish(self, ok):
+        self.ok = ok
+        self.event.set()
+
+
+class RecordWriter:
+    """
+    Write-behind persistence for parking records.
+    Callers hand records to submit() and return immediately; a background
+    thread owns its own SQLite connection and writes buffered records with
+    executemany in a single transaction every batch_size records or every
+    flush_ms milliseconds, whichever comes first. Rows whose transaction
+    fails are kept and retried every RETRY_S, and flushes report failure
+    until they are committed.
+    """
+    def __init__(self, db_path, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_ms=DEFAULT_FLUSH_MS, on_commit=None):
+        self.db_path = db_path
+        self.on_commit = on_commit    # Called on the writer thread with each committed batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self.queue = queue.SimpleQueue()
+        self.written = 0              # Records committed so far
+        self.batches = 0              # Transactions committed so far
+        self.errors = 0               # Batches that failed to commit
+        self.failed = []              # Rows awaiting a retry; only touched by the writer thread
+        self.ready = threading.Event()
+        self.worker = threading.Thread(
+            target=self._run, name="record-writer", daemon=True
+        )
+        self.worker.start()
+        self.ready.wait()
+
+    def submit(self, record):
+        """
+        Queues a (slot, entry_time, exit_time, duration, charge) row for
+        writing. Times are integer epoch seconds, duration is whole seconds
+        and charge is cents (None when the stay was not priced).
+        Safe to call from any thread.
+        """
+        self.queue.put(record)
+
+    def pending(self):
+        """Returns the approximate number of records not committed yet"""
+        return self.queue.qsize() + len(self.failed)
+
+    def request_flush(self):
+        """
+        Asks the writer to commit everything submitted so far without
+        waiting for it; returns a FlushRequest to check later.
+        """
+        request = FlushRequest()
+        self.queue.put((_FLUSH, request))
+        return request
+
+    def flush(self, timeout=None):
+        """
+        Blocks until everything submitted so far has been written.
+        Returns False if the timeout expired first or some rows failed to
+        commit.
+        """
+        return self.request_flush().wait(timeout)
+
+    def close(self, timeout=None):
+        """
+        Flushes outstanding records and stops the writer thread.
+        Returns True only if every submitted record was committed.
+        """
+        if self.worker.is_alive():
+            self.queue.put((_STOP, None))
+            self.worker.join(timeout)
+        return not self.worker.is_alive() and not self.failed
+
+    def _run(self):
+        """
+        Writer loop.
+        Blocks until the first record of a batch arrives, then keeps
+        collecting until the batch is full or the flush deadline passes.
+        """
+        try:
+            conn = connect(self.db_path)
+        except sqlite3.Error as e:
+            print(f"Error configuring record writer: {e}")
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000.0)
+        self.ready.set()
+
+        buffer = []
+        deadline = None
+        retry_at = 0.0                # When rows that failed may be tried again
+        running = True
+        while running:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            waiter = None
+            if item is None:
+                pass  # Deadline reached
+            elif item[0] is _FLUSH:
+                waiter = item[1]
+            elif item[0] is _STOP:
+                running = False
+            else:
+                buffer.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(buffer) < self.batch_size:
+                    continue
+
+            now = time.monotonic()
+            if self.failed and (now >= retry_at or waiter is not None or not running):
+                if self._write(conn, self.failed):
+                    self.failed = []
+            if buffer:
+                if not self._write(conn, buffer):
+                    self.failed.extend(buffer)
+                buffer = []
+            if self.failed:
+                if now >= retry_at:
+                    retry_at = now + RETRY_S
+                deadline = retry_at
+            else:
+                deadline = None
+            if waiter is not None:
+                waiter._finish(not self.failed)
+
+        conn.close()
+
+    def _write(self, conn, rows):
+        """
+        Commits a batch of rows and their rollup updates in one transaction.
+        Returns False if it failed.
+        """
+        started = time.perf_counter()
+        try:
+            with conn:
+                # Take the write lock up front so a concurrent writer makes
+                # this wait on busy_timeout rather than fail mid-transaction
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(INSERT_RECORD, rows)
+                update_rollups(conn, rows)
+                update_slot_rollups(conn, rows)
+                update_revenue(conn, rows)
+            self.written += len(rows)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            WRITE_ERRORS.inc()
+            print(f"Error saving {len(rows)} records, will retry: {e}")
+            return False
+        COMMIT_SECONDS.since(started)
+        RECORDS_WRITTEN.inc(len(rows))
+        if self.on_commit is not None:
+            self.on_commit(rows)
+        return True
@@ -0,0 +1,277 @@
+import argparse
+import csv
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+import config
+from mqtt_async import TopicRouter
+
+# ===== Capture Format =====
+# MAGIC, then records of RECORD followed by `length` payload bytes:
+#   TOPIC  key = new topic id, payload = topic text (ids are assigned in order)
+#   MQTT   key = topic id, payload = raw message payload
+#   IR     key = sensor level, no payload
+# Topics are interned, so a status message costs about 30 bytes.
+MAGIC = b"PSR1"
+RECORD = struct.Struct("<BdIH")   # kind, epoch timestamp, key, payload length
+TOPIC = 1
+MQTT = 2
+IR = 3
+READ_CHUNK = 1 << 20              # Bytes read from the log at a time
+WRITE_BUFFER = 1 << 16            # Bytes buffered before the capture file is written
+
+
+def rotated_path(path, started=None):
+    """
+    Returns path with the local start time inserted before its extension
+    (capture.bin -> capture-20261017-093000.bin), plus a counter if that
+    file already exists, so each engine start records a capture of its own.
+    """
+    root, ext = os.path.splitext(path)
+    stamped = f"{root}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}"
+    candidate = stamped + ext
+    counter = 1
+    while os.path.exists(candidate):
+        candidate = f"{stamped}-{counter}{ext}"
+        counter += 1
+    return candidate
+
+
+class CaptureLog:
+    """
+    Compact, append-only capture of the raw inputs the engine receives:
+    MQTT messages with the arrival time stamped by the ingestion runtime,
+    and IR sensor edges as they are drained. Safe to call from the MQTT
+    network thread and the consumer thread at once.
+    An existing file is never overwritten; see rotated_path().
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "xb", buffering=WRITE_BUFFER)
+        self.file.write(MAGIC)
+        self.topics = {}              # topic -> id
+        self.lock = threading.Lock()
+        self.records = 0
+
+    def record_message(self, topic, payload, timestamp):
+        payload = bytes(payload)
+        with self.lock:
+            topic_id = self.topics.get(topic)
+            if topic_id is None:
+                topic_id = self.topics[topic] = len(self.topics)
+                text = topic.encode()
+                self.file.write(RECORD.pack(TOPIC, timestamp, topic_id, len(text)) + text)
+            self.file.write(RECORD.pack(MQTT, timestamp, topic_id, len(payload)) + payload)
+            self.records += 1
+
+    def record_edge(self, level, timestamp):
+        with self.lock:
+            self.file.write(RECORD.pack(IR, timestamp, level, 0))
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+
+def read_capture(path):
+    """
+    Yields (kind, timestamp, key, payload) for each MQTT and IR record of
+    a capture, oldest first. For MQTT records key is the topic text.
+    A record cut short by a crash ends the log.
+    """
+    topics = []
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a parking capture")
+        buffer = b""                  # Unread tail of the previous chunk
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                return
+            buffer += chunk
+            position = 0
+            end = len(buffer)
+            while position + RECORD.size <= end:
+                kind, timestamp, key, length = RECORD.unpack_from(buffer, position)
+                start = position + RECORD.size
+                if start + length > end:
+                    break  # Payload continues in the next chunk
+                payload = buffer[start:start + length]
+                position = start + length
+                if kind == TOPIC:
+                    topics.append(payload.decode())
+                elif kind == MQTT:
+                    yield MQTT, timestamp, topics[key], payload
+                else:
+                    yield kind, timestamp, key, payload
+            buffer = buffer[position:]
+
+
+def first_timestamp(path):
+    """Returns the timestamp of a capture's first record, or None"""
+    for _, timestamp, _, _ in read_capture(path):
+        return timestamp
+    return None
+
+
+class VirtualClock:
+    """
+    Stand-in for the time module during replays (time, monotonic, sleep).
+    Time only moves when sleep() is called. With a speed the sleeps also
+    wait on the real clock, scaled and anchored to the first sleep so
+    the replay does not drift; without one they return at once.
+    """
+    def __init__(self, start, speed=None):
+        self.start = start
+        self.now = start
+        self.speed = speed
+        self.real_start = None
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+        if self.speed:
+            if self.real_start is None:
+                self.real_start = time.perf_counter()
+            delay = (self.real_start + (self.now - self.start) / self.speed
+                     - time.perf_counter())
+            if delay > 0:
+                time.sleep(delay)
+
+
+def replay(path, engine):
+    """
+    Feeds a capture through a started engine whose clock is a
+    VirtualClock: messages go through the engine's topic routing and
+    dedup exactly as live, its timer wheel applies updates and runs its
+    periodic checks on virtual time, and IR edges post gate intents.
+    Returns counts of what was replayed.
+    """
+    clock = engine.clock
+    timers = engine.timers
+    router = TopicRouter(
+        {engine.lot_name: engine.slot_count}, {engine.lot_name: engine.dedup},
+        engine.lot_name if config.accept_legacy_topics else None
+    )
+    deliver = router.deliver
+    apply_timer = timers.call_every(config.MQTT_APPLY_MS / 1000.0, engine.apply_updates)
+    next_tick = timers.next_deadline()
+    messages = unrouted = edges = 0
+    try:
+        for kind, timestamp, key, payload in read_capture(path):
+            if timestamp > clock.now:
+                clock.sleep(timestamp - clock.now)
+                if clock.now >= next_tick:
+                    timers.advance()
+                    next_tick = timers.next_deadline()
+            if kind == MQTT:
+                messages += 1
+                if not deliver(key, payload, timestamp):
+                    unrouted += 1
+            elif kind == IR:
+                edges += 1
+                if key:
+                    engine.open_gate()
+                else:
+                    engine.close_gate()
+        # Let the last updates reach the apply timer
+        clock.sleep(config.MQTT_APPLY_MS / 1000.0 + timers.tick)
+        timers.advance()
+    finally:
+        apply_timer.cancel()
+    return {"messages": messages, "unrouted": unrouted, "ir_edges": edges}
+
+
+def dump_records(db_path, output_path, start=None, end=None):
+    """
+    Writes the parking records of a database as CSV, ordered by entry,
+    so the output of a replay can be diffed against the live run's.
+    Only stays that began at or after start and ended before end are
+    included when given; a capture's window excludes cars that were
+    already parked when it started. (The replay sees those cars arrive
+    with their first message, so their rows are expected to differ.)
+    Returns the number of rows written.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT slot, entry_time, exit_time, duration, charge FROM parking_records
+            WHERE entry_time >= ? AND exit_time < ?
+            ORDER BY entry_time, slot, exit_time
+        """, (int(start or 0), int(end) if end is not None else 2 ** 62))
+        written = 0
+        with open(output_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("slot", "entry_time", "exit_time", "duration", "charge"))
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+    finally:
+        conn.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured parking traffic")
+    parser.add_argument("capture", help="capture file recorded with PARKING_CAPTURE "
+                        "(one per engine start, named after its start time)")
+    parser.add_argument("--db", required=True, help="new database for the replayed records")
+    parser.add_argument("--slots", type=int, default=config.slot_count)
+    parser.add_argument("--lot", default=config.lot_name)
+    parser.add_argument("--speed", type=float,
+                        help="replay at this multiple of real time (default: as fast as possible)")
+    parser.add_argument("--dump", help="also write the replayed records to this CSV")
+    parser.add_argument("--live-db", help="with --dump, also dump this database's records "
+                        "for the captured window to <dump>.live.csv")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists; replays write to a new database")
+    start = first_timestamp(args.capture)
+    if start is None:
+        parser.error(f"{args.capture} holds no records")
+
+    from engine import ParkingEngine
+
+    # A replay never exports metrics or captures itself
+    config.METRICS_PORT = 0
+    config.METRICS_LOG_S = 0
+    config.capture_path = None
+    engine = ParkingEngine(
+        slot_count=args.slots, db_path=args.db, use_mqtt=False, use_hardware=False,
+        lot_name=args.lot, processes=0, clock=VirtualClock(start, args.speed)
+    )
+    started = time.perf_counter()
+    try:
+        engine.start()
+        counts = replay(args.capture, engine)
+    finally:
+        engine.close()
+    elapsed = time.perf_counter() - started
+    print(
+        f"Replayed {counts['messages']} messages and {counts['ir_edges']} IR edges "
+        f"({engine.clock.now - start:.0f} s of traffic) in {elapsed:.1f} s"
+    )
+    if args.dump:
+        end = int(engine.clock.now) + 1
+        written = dump_records(args.db, args.dump, start, end)
+        print(f"Wrote {written} records to {args.dump}")
+        if args.live_db:
+            live_path = args.dump + ".live.csv"
+            written = dump_records(args.live_db, live_path, start, end)
+            print(f"Wrote {written} live records to {live_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import math
+from collections import defaultdict
+
+# ===== Rollup Configuration =====
+HOUR = 3600
+DAY = 86400
+DWELL_BUCKET_GROWTH = 1.1         # Each dwell histogram bucket is 10% wider
+_LOG_GROWTH = math.log(DWELL_BUCKET_GROWTH)
+
+ROLLUP_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS rollup_hourly (
+        hour INTEGER PRIMARY KEY,          -- epoch seconds at the start of the hour
+        occupied_seconds INTEGER NOT NULL, -- slot-seconds occupied within the hour
+        arrivals INTEGER NOT NULL,
+        departures INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_daily (
+        day INTEGER PRIMARY KEY,           -- epoch seconds at the start of the UTC day
+        stays INTEGER NOT NULL,            -- stays that ended on this day
+        dwell_seconds INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_dwell_histogram (
+        day INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        stays INTEGER NOT NULL,
+        PRIMARY KEY (day, bucket)
+    )
+    """,
+]
+
+SLOT_DAILY_TABLE = """
+    CREATE TABLE IF NOT EXISTS rollup_slot_daily (
+        day INTEGER NOT NULL,              -- epoch seconds at the start of the UTC day
+        slot INTEGER NOT NULL,
+        stays INTEGER NOT NULL,            -- stays in the slot that ended on this day
+        dwell_seconds INTEGER NOT NULL,
+        PRIMARY KEY (day, slot)
+    )
+"""
+
+REVENUE_TABLE = """
+    CREATE TABLE IF NOT EXISTS rollup_revenue_daily (
+        day INTEGER PRIMARY KEY,           -- epoch seconds at the start of the UTC day
+        charged_stays INTEGER NOT NULL,    -- stays that ended on this day and were priced
+        revenue INTEGER NOT NULL           -- cents
+    )
+"""
+
+
+def create_rollup_tables(conn):
+    """Creates the rollup tables if they do not exist"""
+    for statement in ROLLUP_TABLES:
+        conn.execute(statement)
+
+
+def dwell_bucket(seconds):
+    """Maps a dwell time to its logarithmic histogram bucket"""
+    if seconds < 1:
+        return 0
+    return int(math.log(seconds) / _LOG_GROWTH) + 1
+
+
+def bucket_upper_seconds(bucket):
+    """Returns the largest dwell time that falls into a bucket"""
+    if bucket <= 0:
+        return 0
+    return DWELL_BUCKET_GROWTH ** bucket
+
+
+def update_rollups(conn, rows):
+    """
+    Folds finished stays into the rollup tables.
+    rows are (slot, entry_time, exit_time, duration[, charge]) tuples in
+    epoch seconds. Callers run this inside the transaction that inserts
+    the raw records, so rollups and history always agree.
+    """
+    hourly = defaultdict(lambda: [0, 0, 0])
+    daily = defaultdict(lambda: [0, 0])
+    histogram = defaultdict(int)
+
+    for slot, entry, exit_, duration, *_ in rows:
+        # Spread the occupied time over every hour the stay touched
+        hour = entry - entry % HOUR
+        while hour < exit_:
+            overlap = min(exit_, hour + HOUR) - max(entry, hour)
+            hourly[hour][0] += overlap
+            hour += HOUR
+        hourly[entry - entry % HOUR][1] += 1
+        hourly[exit_ - exit_ % HOUR][2] += 1
+
+        day = exit_ - exit_ % DAY
+        daily[day][0] += 1
+        daily[day][1] += duration
+        histogram[(day, dwell_bucket(duration))] += 1
+
+    conn.executemany("""
+        INSERT INTO rollup_hourly (hour, occupied_seconds, arrivals, departures)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (hour) DO UPDATE SET
+            occupied_seconds = occupied_seconds + excluded.occupied_seconds,
+            arrivals = arrivals + excluded.arrivals,
+            departures = departures + excluded.departures
+    """, [(hour, *values) for hour, values in hourly.items()])
+    conn.executemany("""
+        INSERT INTO rollup_daily (day, stays, dwell_seconds) VALUES (?, ?, ?)
+        ON CONFLICT (day) DO UPDATE SET
+            stays = stays + excluded.stays,
+            dwell_seconds = dwell_seconds + excluded.dwell_seconds
+    """, [(day, *values) for day, values in daily.items()])
+    conn.executemany("""
+        INSERT INTO rollup_dwell_histogram (day, bucket, stays) VALUES (?, ?, ?)
+        ON CONFLICT (day, bucket) DO UPDATE SET stays = stays + excluded.stays
+    """, [(day, bucket, stays) for (day, bucket), stays in histogram.items()])
+
+
+def update_slot_rollups(conn, rows):
+    """
+    Folds finished stays into rollup_slot_daily, per slot and UTC day of
+    exit. rows are the same tuples as for update_rollups().
+    """
+    per_slot = defaultdict(lambda: [0, 0])
+    for slot, entry, exit_, duration, *_ in rows:
+        totals = per_slot[(exit_ - exit_ % DAY, slot)]
+        totals[0] += 1
+        totals[1] += duration
+    conn.executemany("""
+        INSERT INTO rollup_slot_daily (day, slot, stays, dwell_seconds) VALUES (?, ?, ?, ?)
+        ON CONFLICT (day, slot) DO UPDATE SET
+            stays = stays + excluded.stays,
+            dwell_seconds = dwell_seconds + excluded.dwell_seconds
+    """, [(day, slot, *values) for (day, slot), values in per_slot.items()])
+
+
+def update_revenue(conn, rows):
+    """
+    Folds the charges of finished stays into rollup_revenue_daily.
+    rows are (slot, entry_time, exit_time, duration, charge) tuples;
+    unpriced stays (charge None) are skipped.
+    """
+    revenue = defaultdict(lambda: [0, 0])
+    for slot, entry, exit_, duration, charge in rows:
+        if charge is None:
+            continue
+        totals = revenue[exit_ - exit_ % DAY]
+        totals[0] += 1
+        totals[1] += charge
+    add_revenue(conn, revenue)
+
+
+def add_revenue(conn, revenue):
+    """
+    Adds {day: (charged_stays, revenue_cents)} to rollup_revenue_daily;
+    re-pricing passes the differences to what was counted before.
+    """
+    conn.executemany("""
+        INSERT INTO rollup_revenue_daily (day, charged_stays, revenue) VALUES (?, ?, ?)
+        ON CONFLICT (day) DO UPDATE SET
+            charged_stays = charged_stays + excluded.charged_stays,
+            revenue = revenue + excluded.revenue
+    """, [(day, *totals) for day, totals in revenue.items()])
+
+
+class ParkingReports:
+    """
+    Read-only reporting over parking history.
+    Every query is answered from the rollup tables, so the cost depends on
+    the number of hours/days in the range rather than on the number of
+    parking records.
+    """
+    def __init__(self, conn, slot_count):
+        self.conn = conn
+        self.slot_count = slot_count
+
+    def occupancy_by_hour(self, start, end):
+        """
+        Returns [(hour_epoch, occupancy_ratio, arrivals, departures), ...]
+        for hours with activity between start and end (epoch seconds).
+        """
+        capacity = HOUR * max(self.slot_count, 1)
+        rows = self.conn.execute("""
+            SELECT hour, occupied_seconds, arrivals, departures
+            FROM rollup_hourly WHERE hour >= ? AND hour < ? ORDER BY hour
+        """, (start - start % HOUR, end)).fetchall()
+        return [
+            (hour, occupied / capacity, arrivals, departures)
+            for hour, occupied, arrivals, departures in rows
+        ]
+
+    def turnover_by_slot(self, start, end):
+        """
+        Returns [(slot, stays, stays_per_day, avg_dwell_seconds), ...].
+        Per-slot totals are kept per UTC day, so the range is widened to
+        whole days and stays_per_day is the rate over those days.
+        """
+        first_day = start - start % DAY
+        days = max(1, -(-(end - first_day) // DAY))
+        rows = self.conn.execute("""
+            SELECT slot, SUM(stays), SUM(dwell_seconds)
+            FROM rollup_slot_daily WHERE day >= ? AND day < ?
+            GROUP BY slot ORDER BY slot
+        """, (first_day, end)).fetchall()
+        return [
+            (slot, stays, stays / days, dwell / stays if stays else 0.0)
+            for slot, stays, dwell in rows
+        ]
+
+    def dwell_stats(self, start, end, percentile=95):
+        """
+        Returns (stays, average_seconds, percentile_seconds) for stays that
+        ended between start and end. The percentile comes from the
+        histogram and is accurate to one bucket (about 10%).
+        """
+        first_day = start - start % DAY
+        stays, dwell = self.conn.execute("""
+            SELECT COALESCE(SUM(stays), 0), COALESCE(SUM(dwell_seconds), 0)
+            FROM rollup_daily WHERE day >= ? AND day < ?
+        """, (first_day, end)).fetchone()
+        if not stays:
+            return 0, 0.0, 0.0
+
+        buckets = self.conn.execute("""
+            SELECT bucket, SUM(stays) FROM rollup_dwell_histogram
+            WHERE day >= ? AND day < ? GROUP BY bucket ORDER BY bucket
+        """, (first_day, end)).fetchall()
+        threshold = math.ceil(stays * percentile / 100)
+        seen = 0
+        value = 0.0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= threshold:
+                value = bucket_upper_seconds(bucket)
+                break
+        return stays, dwell / stays, value
+
+    def peak_hours(self, start, end, top=3):
+        """
+        Returns [(hour_of_day, average_occupancy_ratio), ...] for the
+        busiest local hours of the day in the range, busiest first.
+        """
+        days = max(1.0, (end - start) / DAY)
+        capacity = HOUR * max(self.slot_count, 1) * days
+        rows = self.conn.execute("""
+            SELECT CAST(strftime('%H', hour, 'unixepoch', 'localtime') AS INTEGER) AS hod,
+                   SUM(occupied_seconds) AS occupied
+            FROM rollup_hourly WHERE hour >= ? AND hour < ?
+            GROUP BY hod ORDER BY occupied DESC LIMIT ?
+        """, (start - start % HOUR, end, top)).fetchall()
+        return [(hour_of_day, occupied / capacity) for hour_of_day, occupied in rows]
+
+    def revenue(self, start, end):
+        """
+        Returns (charged_stays, revenue_cents) for stays that ended
+        between start and end, widened to whole UTC days.
+        """
+        return self.conn.execute("""
+            SELECT COALESCE(SUM(charged_stays), 0), COALESCE(SUM(revenue), 0)
+            FROM rollup_revenue_daily WHERE day >= ? AND day < ?
+        """, (start - start % DAY, end)).fetchone()
@@ -0,0 +1,459 @@
+import argparse
+import collections
+import functools
+import multiprocessing
+import queue
+import signal
+import time
+from array import array
+from multiprocessing import shared_memory
+
+import config
+from billing import load_tariffs
+from dedup import DedupFilter
+from journal import SessionJournal
+from mqtt_async import AsyncIngestRuntime, PahoTransport, shard_for
+from persistence import RecordWriter, connect, recover_sessions, submit_stay
+from slot_store import NO_EXIT, NOT_PARKED, SlotStateStore
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, change detection falls back to block compares
+    np = None
+
+# ===== Multi-Process Ingestion Configuration =====
+EVENT_FLUSH_S = 0.05              # Worker interval for shipping events to the writer
+WRITER_READY_TIMEOUT = 30         # Seconds to wait for the writer to recover state
+MAX_WORKERS = 64                  # Size of the shared per-worker counter table
+WORKER_COUNTERS = ("received", "delivered", "suppressed", "stale")  # Per-worker totals
+COMPARE_BLOCK = 4096              # Bytes compared at once when looking for changed slots
+ENTRY = 1
+EXIT = 2
+_STOP = None                      # Event queue marker asking the writer to exit
+
+
+class SharedSlotState:
+    """
+    Slot state in a multiprocessing.shared_memory block.
+    Same layout and read API as SlotStateStore (occupied, entry/exit
+    times, last durations), so format_slot_row and the GUI read it in
+    place without copies. Each slot has exactly one writing process; a
+    per-slot version counter (odd while a write is in progress) lets
+    readers take a consistent view with read_slot() and find changed
+    slots with changed_slots(). last_seen holds the sensors' last message
+    times for dead-sensor checks across processes, and counters each
+    worker's WORKER_COUNTERS totals.
+    """
+    def __init__(self, slot_count, name=None):
+        size = slot_count + 1
+        self.slot_count = slot_count
+        layout = (
+            ("entry_times", "d"), ("exit_times", "d"), ("last_durations", "d"),
+            ("last_seen", "d"), ("versions", "I"), ("occupied", "B"),
+        )
+        counter_bytes = 8 * len(WORKER_COUNTERS) * MAX_WORKERS
+        total = counter_bytes + sum(array(code).itemsize * size for _, code in layout)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=total)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+        buf = self.shm.buf
+        self.counters = buf[:counter_bytes].cast("Q")  # [worker * len(WORKER_COUNTERS) + field]
+        offset = counter_bytes
+        for field, code in layout:
+            nbytes = array(code).itemsize * size
+            setattr(self, field, buf[offset:offset + nbytes].cast(code))
+            offset += nbytes
+        if self.owner:
+            self.entry_times[:] = array("d", [NOT_PARKED]) * size
+            self.exit_times[:] = array("d", [NO_EXIT]) * size
+        self.seen_versions = bytes(self.versions.nbytes)
+
+    def __len__(self):
+        return self.slot_count
+
+    def close(self):
+        """Releases this process's mapping; the creator also frees the block"""
+        for field in ("counters", "entry_times", "exit_times", "last_durations",
+                      "last_seen", "versions", "occupied"):
+            getattr(self, field).release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    @property
+    def occupied_count(self):
+        return self.occupied.tobytes().count(1)
+
+    def is_occupied(self, slot_num):
+        return self.occupied[slot_num] == 1
+
+    def entry_time(self, slot_num):
+        """Returns the entry timestamp of a parked car, or None"""
+        entry = self.entry_times[slot_num]
+        return None if entry == NOT_PARKED else entry
+
+    def exit_time(self, slot_num):
+        """Returns the last exit timestamp of a slot, or None"""
+        exit_time = self.exit_times[slot_num]
+        return None if exit_time == NO_EXIT else exit_time
+
+    def set_counters(self, worker, values):
+        """Publishes one worker's totals, a dict keyed by WORKER_COUNTERS"""
+        base = worker * len(WORKER_COUNTERS)
+        for field_index, field in enumerate(WORKER_COUNTERS):
+            self.counters[base + field_index] = values.get(field, 0)
+
+    def counter_total(self, field, workers):
+        """Sums a WORKER_COUNTERS field over the first workers workers"""
+        field_index = WORKER_COUNTERS.index(field)
+        step = len(WORKER_COUNTERS)
+        return sum(self.counters[field_index:workers * step:step])
+
+    def read_slot(self, slot_num):
+        """Returns a consistent (occupied, entry, exit, last_duration)"""
+        versions = self.versions
+        while True:
+            before = versions[slot_num]
+            if before & 1:
+                continue  # Writer in progress
+            values = (
+                self.occupied[slot_num] == 1, self.entry_time(slot_num),
+                self.exit_time(slot_num), self.last_durations[slot_num],
+            )
+            if versions[slot_num] == before:
+                return values
+
+    def set_occupied(self, slot_num, timestamp):
+        """Writer side of SlotStateStore.set_occupied"""
+        if self.occupied[slot_num]:
+            return False
+        version = self.versions[slot_num]
+        self.versions[slot_num] = (version + 1) & 0xFFFFFFFF
+        self.entry_times[slot_num] = timestamp
+        self.occupied[slot_num] = 1
+        self.versions[slot_num] = (version + 2) & 0xFFFFFFFF
+        return True
+
+    def set_empty(self, slot_num, timestamp):
+        """Writer side of SlotStateStore.set_empty; returns the entry time"""
+        if not self.occupied[slot_num]:
+            return None
+        version = self.versions[slot_num]
+        self.versions[slot_num] = (version + 1) & 0xFFFFFFFF
+        entry = self.entry_times[slot_num]
+        self.occupied[slot_num] = 0
+        self.entry_times[slot_num] = NOT_PARKED
+        self.exit_times[slot_num] = timestamp
+        self.last_durations[slot_num] = timestamp - entry
+        self.versions[slot_num] = (version + 2) & 0xFFFFFFFF
+        return entry
+
+    def load_store(self, store):
+        """Copies a SlotStateStore of the same size into shared memory"""
+        self.occupied[:] = store.occupied
+        self.entry_times[:] = store.entry_times
+        self.exit_times[:] = store.exit_times
+        self.last_durations[:] = store.last_durations
+
+    def changed_slots(self):
+        """Returns slots written since the previous call, from the versions"""
+        current = self.versions.tobytes()
+        seen, self.seen_versions = self.seen_versions, current
+        if current == seen:
+            return []
+        if np is not None:
+            diff = np.frombuffer(current, np.uint32) != np.frombuffer(seen, np.uint32)
+            return np.flatnonzero(diff).tolist()
+        changed = []
+        for start in range(0, len(current), COMPARE_BLOCK):
+            end = start + COMPARE_BLOCK
+            if current[start:end] == seen[start:end]:
+                continue
+            new = array("I", current[start:end])
+            old = array("I", seen[start:end])
+            base = start // 4
+            changed.extend(base + i for i, (a, b) in enumerate(zip(new, old)) if a != b)
+        return changed
+
+    def dead_sensors(self, now, ttl):
+        """Slots that reported before but have been silent for over ttl"""
+        cutoff = now - ttl
+        last_seen = self.last_seen
+        return [
+            slot_num for slot_num in range(1, self.slot_count + 1)
+            if 0.0 < last_seen[slot_num] < cutoff
+        ]
+
+
+def lot_offsets(lots):
+    """Maps each lot to the global number of its slot 0 (lots laid out in order)"""
+    offsets = {}
+    total = 0
+    for lot, slot_count in lots.items():
+        offsets[lot] = total
+        total += slot_count
+    return offsets, total
+
+
+class _SharedApplier:
+    """
+    Downstream of a lot's DedupFilter inside a worker.
+    Applies changes to the lot's range of the shared state and queues
+    the resulting entry/exit events for the writer process.
+    """
+    def __init__(self, state, offset, events):
+        self.state = state
+        self.offset = offset
+        self.events = events          # deque shared with the worker's main thread
+
+    def put(self, slot_num, status, timestamp=None, seq=None):
+        if timestamp is None:
+            timestamp = time.time()
+        slot_num += self.offset
+        if status:
+            if self.state.set_occupied(slot_num, timestamp):
+                self.events.append((ENTRY, slot_num, timestamp))
+        elif self.state.set_empty(slot_num, timestamp) is not None:
+            self.events.append((EXIT, slot_num, timestamp))
+
+
+def _worker_main(index, shm_name, slot_count, lots, offsets, legacy_lot,
+                 transport_factory, events_queue, stop_event):
+    """
+    Ingestion worker: MQTT parsing, dedup and state updates for its lots.
+    Events reach the writer in batches every EVENT_FLUSH_S.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent coordinates shutdown
+    state = SharedSlotState(slot_count, shm_name)
+    events = collections.deque()
+    sinks = {}
+    for lot, count in lots.items():
+        offset = offsets[lot]
+        sinks[lot] = DedupFilter(
+            count, _SharedApplier(state, offset, events), config.SENSOR_TTL,
+            last_seen=state.last_seen[offset:offset + count + 1]
+        )
+    runtime = AsyncIngestRuntime(
+        lots, sinks, transport_factory,
+        legacy_lot=legacy_lot if legacy_lot in lots else None
+    )
+    runtime.start()
+
+    def ship():
+        batch = []
+        while events:
+            batch.append(events.popleft())
+        if batch:
+            events_queue.put(batch)
+        totals = collections.Counter(runtime.stats())
+        for sink in sinks.values():
+            totals.update(sink.stats())
+        state.set_counters(index, totals)
+
+    try:
+        while not stop_event.wait(EVENT_FLUSH_S):
+            ship()
+    finally:
+        runtime.stop()
+        ship()
+        for sink in sinks.values():
+            sink.last_seen.release()
+        state.close()
+
+
+def _writer_main(shm_name, slot_count, zones, db_path, journal_path, events_queue, ready):
+    """
+    Single writer process: journals every entry/exit, keeps a replica of
+    the slot state in journal order and writes finished stays to SQLite.
+    On start it recovers the journal and seeds the shared state.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    state = SharedSlotState(slot_count, shm_name)
+    replica = SlotStateStore(slot_count, zones)
+    journal = SessionJournal(journal_path)
+    writer = RecordWriter(db_path, config.RECORD_BATCH_SIZE, config.RECORD_FLUSH_MS)
+    save = functools.partial(
+        submit_stay, writer, load_tariffs(config.tariff_path, replica.zones)
+    )
+
+    # Re-queue replayed stays the database does not have yet
+    conn = connect(db_path, read_only=True)
+    recover_sessions(journal, replica, conn, save)
+    conn.close()
+    state.load_store(replica)
+    ready.set()
+
+    next_checkpoint = time.monotonic() + config.JOURNAL_CHECKPOINT_S
+    running = True
+    while running:
+        try:
+            batch = events_queue.get(timeout=max(0.0, next_checkpoint - time.monotonic()))
+        except queue.Empty:
+            batch = ()
+        if batch is _STOP:
+            running = False
+            batch = ()
+        for kind, slot_num, timestamp in batch:
+            if kind == ENTRY:
+                if replica.set_occupied(slot_num, timestamp):
+                    journal.log_entry(slot_num, timestamp)
+            else:
+                entry = replica.set_empty(slot_num, timestamp)
+                if entry is not None:
+                    journal.log_exit(slot_num, timestamp)
+                    save(slot_num, entry, timestamp)
+        if time.monotonic() >= next_checkpoint:
+            next_checkpoint = time.monotonic() + config.JOURNAL_CHECKPOINT_S
+            if journal.events and writer.flush(timeout=1.0):
+                journal.checkpoint(replica)
+
+    if writer.close():
+        journal.checkpoint(replica)
+    else:
+        print("Some parking records were not saved; the next start recovers them "
+              "from the session journal")
+    journal.close()
+    state.close()
+
+
+class IngestCluster:
+    """
+    Multi-process ingestion over shared-memory slot state.
+    Lots are spread over worker processes with the same stable hash as
+    MQTT shards; each worker owns its lots' slot ranges, so every slot has
+    exactly one writer and no locks are needed. One writer process owns
+    the journal and SQLite. The creating process (GUI or reporting) reads
+    self.slots in place. Global slot numbers follow the order of lots.
+    """
+    def __init__(self, lots, db_path, journal_path, workers, transport_factory,
+                 legacy_lot=None, zones=None):
+        self.lots = dict(lots)
+        self.offsets, self.slot_count = lot_offsets(self.lots)
+        self.db_path = db_path
+        self.journal_path = journal_path
+        self.worker_count = max(1, min(workers, len(self.lots), MAX_WORKERS))
+        self.transport_factory = transport_factory  # Must be picklable
+        self.legacy_lot = legacy_lot
+        self.zones = zones            # Zone of every slot, for pricing in the writer
+        self.context = multiprocessing.get_context("spawn")  # Safe with Tk and threads
+        self.slots = None
+        self.events = None
+        self.stop_event = None
+        self.writer = None
+        self.workers = []
+
+    def start(self):
+        """Starts the writer, waits for its recovery, then the workers"""
+        ctx = self.context
+        self.slots = SharedSlotState(self.slot_count)
+        self.events = ctx.Queue()
+        self.stop_event = ctx.Event()
+        ready = ctx.Event()
+        self.writer = ctx.Process(
+            target=_writer_main, name="parking-writer",
+            args=(self.slots.name, self.slot_count, self.zones, self.db_path,
+                  self.journal_path, self.events, ready)
+        )
+        self.writer.start()
+        if not ready.wait(WRITER_READY_TIMEOUT):
+            self.stop()
+            raise RuntimeError("record writer process did not start")
+
+        grouped = [{} for _ in range(self.worker_count)]
+        for lot, count in self.lots.items():
+            grouped[shard_for(lot, self.worker_count)][lot] = count
+        for index, worker_lots in enumerate(grouped):
+            if not worker_lots:
+                continue
+            process = ctx.Process(
+                target=_worker_main, name=f"parking-ingest-{index}",
+                args=(index, self.slots.name, self.slot_count, worker_lots,
+                      self.offsets, self.legacy_lot, self.transport_factory,
+                      self.events, self.stop_event)
+            )
+            process.start()
+            self.workers.append(process)
+
+    def received(self):
+        """Returns the MQTT messages seen by all workers so far"""
+        return self.slots.counter_total("received", self.worker_count)
+
+    def dedup_stats(self):
+        """Returns the workers' combined DedupFilter.stats()"""
+        return {
+            field: self.slots.counter_total(field, self.worker_count)
+            for field in ("delivered", "suppressed", "stale")
+        }
+
+    @staticmethod
+    def _join(process, timeout):
+        """Waits for a process to exit; terminates it if it hangs past timeout"""
+        process.join(timeout)
+        if process.is_alive():
+            print(f"{process.name} did not stop within {timeout}s; terminating it")
+            process.terminate()
+            process.join(timeout)
+
+    def stop(self, timeout=10):
+        """
+        Stops the workers, lets the writer drain and checkpoint, frees memory.
+        A process that hangs is terminated; the writer then leaves its
+        journal for the next start to recover.
+        """
+        if self.slots is None:
+            return
+        self.stop_event.set()
+        for process in self.workers:
+            self._join(process, timeout)
+        self.workers = []
+        if self.writer is not None:
+            self.events.put(_STOP)
+            self._join(self.writer, timeout)
+            self.writer = None
+        self.slots.close()
+        self.slots = None
+
+
+def parse_lots(text):
+    """Parses "north:500,south:800" into {"north": 500, "south": 800}"""
+    lots = {}
+    for item in text.split(","):
+        lot, _, count = item.partition(":")
+        lots[lot.strip()] = int(count)
+    return lots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run multi-process lot ingestion")
+    parser.add_argument("--lots", required=True, help='e.g. "north:500,south:800"')
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--db", default=config.database_path)
+    args = parser.parse_args()
+
+    from database import open_database
+    open_database(args.db).close()  # Migrate before the writer process opens it
+
+    cluster = IngestCluster(
+        parse_lots(args.lots), args.db,
+        config.journal_path or args.db + ".journal",
+        args.workers,
+        functools.partial(PahoTransport, config.mqtt_broker, config.mqtt_port)
+    )
+    stopping = []
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    cluster.start()
+    print(f"Ingesting {cluster.slot_count} slots with {len(cluster.workers)} workers")
+    try:
+        while not stopping:
+            time.sleep(1)
+    finally:
+        cluster.stop()
+
+
+if __name__ == "__main__":
+    main()
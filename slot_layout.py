@@ -0,0 +1,152 @@
+import heapq
+import json
+import math
+from array import array
+
+# ===== Slot Layout Configuration =====
+EV = 1                            # Slot has a charger
+ACCESSIBLE = 2                    # Slot is wide/accessible
+FLAG_NAMES = {"ev": EV, "accessible": ACCESSIBLE}
+DEFAULT_SPACING = 2.5             # Metres between slots in the default single-row layout
+LEVEL_DISTANCE = 60.0             # Metres of driving counted per level between floors
+DEFAULT_ENTRANCE = "main"
+
+
+class SlotLayout:
+    """
+    Physical metadata for every slot: level, zone, x/y position in metres
+    and EV/accessible flags, in arrays indexed by slot number like
+    SlotStateStore. Entrances are named (level, x, y) points.
+    Without a layout file, slots stand in one row starting next to a
+    single "main" entrance.
+    """
+    def __init__(self, slot_count, entrances=None):
+        size = slot_count + 1
+        self.slot_count = slot_count
+        self.levels = array("H", [0]) * size
+        self.zones = array("H", [0]) * size
+        self.xs = array("d", (slot_num * DEFAULT_SPACING for slot_num in range(size)))
+        self.ys = array("d", [0.0]) * size
+        self.flags = bytearray(size)
+        self.entrances = dict(entrances or {DEFAULT_ENTRANCE: (0, 0.0, 0.0)})
+
+    def set_slot(self, slot_num, level=0, zone=0, x=0.0, y=0.0, flags=0):
+        if not 1 <= slot_num <= self.slot_count:
+            raise ValueError(f"slot {slot_num} is outside 1..{self.slot_count}")
+        self.levels[slot_num] = level
+        self.zones[slot_num] = zone
+        self.xs[slot_num] = x
+        self.ys[slot_num] = y
+        self.flags[slot_num] = flags
+
+    def distance(self, slot_num, entrance):
+        """Driving distance estimate from an entrance to a slot, in metres"""
+        level, x, y = self.entrances[entrance]
+        return (math.hypot(self.xs[slot_num] - x, self.ys[slot_num] - y)
+                + abs(self.levels[slot_num] - level) * LEVEL_DISTANCE)
+
+    def describe(self, slot_num):
+        """Returns a short human-readable location for a slot"""
+        names = [name for name, bit in FLAG_NAMES.items() if self.flags[slot_num] & bit]
+        extra = f" ({', '.join(names)})" if names else ""
+        return f"Slot {slot_num}: level {self.levels[slot_num]}, zone {self.zones[slot_num]}{extra}"
+
+
+def parse_flags(names):
+    """Converts ["ev", "accessible"] (or "ev,accessible") to a flag mask"""
+    if isinstance(names, str):
+        names = [name for name in names.split(",") if name]
+    mask = 0
+    for name in names:
+        mask |= FLAG_NAMES[name.strip().lower()]
+    return mask
+
+
+def load_layout(path, slot_count):
+    """
+    Builds a SlotLayout from a JSON file, or the default row when path is
+    None. The file holds {"entrances": {"<name>": [level, x, y]}, "slots":
+    [[slot, level, zone, x, y, ["ev", "accessible"]], ...]}; slots that are
+    not listed keep their default position in zone 0.
+    """
+    if not path:
+        return SlotLayout(slot_count)
+    with open(path) as f:
+        data = json.load(f)
+    entrances = {
+        name: (int(level), float(x), float(y))
+        for name, (level, x, y) in data.get("entrances", {}).items()
+    }
+    layout = SlotLayout(slot_count, entrances or None)
+    for slot_num, level, zone, x, y, *flags in data.get("slots", []):
+        layout.set_slot(slot_num, level, zone, x, y, parse_flags(flags[0] if flags else []))
+    return layout
+
+
+class NearestSlotAllocator:
+    """
+    Answers "nearest free slot to this entrance" with constraints.
+    For every entrance, free slots sit in one min-heap per (zone, flags)
+    group keyed by distance, so a query only peeks at the top of the
+    groups that match and never scans the lot. Heaps are maintained
+    lazily: a slot that gets occupied is dropped when it reaches the top
+    of its heap, and release() pushes a slot back when it frees up, so
+    each state change costs O(log n). occupied is read in place
+    (SlotStateStore.occupied or the shared-memory equivalent).
+    Use from one thread, the one applying slot updates.
+    """
+    def __init__(self, layout, occupied):
+        self.layout = layout
+        self.occupied = occupied
+        self.groups = {}              # entrance -> [(zone, flags, heap), ...]
+        self.queued = {}              # entrance -> bytearray, 1 while a slot is in a heap
+        self.distances = {}           # entrance -> distance of every slot, reused by release()
+        self.group_of = {}            # (zone, flags) -> index into each entrance's groups
+        slot_range = range(1, layout.slot_count + 1)
+        for slot_num in slot_range:
+            key = (layout.zones[slot_num], layout.flags[slot_num])
+            self.group_of.setdefault(key, len(self.group_of))
+        for entrance in layout.entrances:
+            distances = array("d", [0.0]) * (layout.slot_count + 1)
+            heaps = [[] for _ in self.group_of]
+            queued = bytearray(layout.slot_count + 1)
+            for slot_num in slot_range:
+                distances[slot_num] = distance = layout.distance(slot_num, entrance)
+                if occupied[slot_num]:
+                    continue
+                key = (layout.zones[slot_num], layout.flags[slot_num])
+                heaps[self.group_of[key]].append((distance, slot_num))
+                queued[slot_num] = 1
+            for heap in heaps:
+                heapq.heapify(heap)
+            self.groups[entrance] = [
+                (zone, flags, heaps[index]) for (zone, flags), index in self.group_of.items()
+            ]
+            self.queued[entrance] = queued
+            self.distances[entrance] = distances
+
+    def release(self, slot_num):
+        """Makes a slot that just became free available again"""
+        group = self.group_of[(self.layout.zones[slot_num], self.layout.flags[slot_num])]
+        for entrance, groups in self.groups.items():
+            queued = self.queued[entrance]
+            if not queued[slot_num]:
+                queued[slot_num] = 1
+                heapq.heappush(groups[group][2], (self.distances[entrance][slot_num], slot_num))
+
+    def nearest_free(self, entrance=DEFAULT_ENTRANCE, flags=0, zone=None):
+        """
+        Returns the free slot closest to an entrance that has at least the
+        given flags (and is in zone, if given), or None.
+        """
+        occupied = self.occupied
+        queued = self.queued[entrance]
+        best = None
+        for group_zone, group_flags, heap in self.groups[entrance]:
+            if group_flags & flags != flags or (zone is not None and group_zone != zone):
+                continue
+            while heap and occupied[heap[0][1]]:
+                queued[heapq.heappop(heap)[1]] = 0
+            if heap and (best is None or heap[0] < best):
+                best = heap[0]
+        return None if best is None else best[1]
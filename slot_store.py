@@ -0,0 +1,201 @@
+import struct
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, queries fall back to C-level builtins
+    np = None
+
+# ===== Slot State Layout =====
+NOT_PARKED = float("inf")         # Entry time stored for empty slots
+NO_EXIT = 0.0                     # Exit time stored before the first exit
+SNAPSHOT_MAGIC = b"PSS1"          # Identifies a SlotStateStore snapshot
+SNAPSHOT_HEADER = struct.Struct("<4sII")  # magic, slot count, zone count
+
+
+class SlotStateStore:
+    """
+    Array-backed state for every parking slot, indexed by slot number.
+    Occupancy is a bytearray (one byte per slot), times are float64 epoch
+    seconds and zones are uint16, so tens of thousands of slots take a few
+    hundred KB. Updates are O(1); aggregate queries run inside C loops and
+    per-zone counts are maintained incrementally.
+    Index 0 is unused so slot numbers can be used directly.
+    """
+    def __init__(self, slot_count, zones=None):
+        size = slot_count + 1
+        self.slot_count = slot_count
+        self.occupied = bytearray(size)
+        self.entry_times = array("d", [NOT_PARKED]) * size
+        self.exit_times = array("d", [NO_EXIT]) * size
+        self.last_durations = array("d", [0.0]) * size  # Seconds of the last finished stay
+        if zones is None:
+            self.zones = array("H", [0]) * size
+        else:
+            self.zones = array("H", [0]) + array("H", zones)
+            if len(self.zones) != size:
+                raise ValueError("zones must list one zone per slot")
+        self.zone_count = max(self.zones[1:], default=0) + 1
+        self.zone_sizes = array("l", [0]) * self.zone_count
+        for zone in self.zones[1:]:
+            self.zone_sizes[zone] += 1
+        self.zone_occupied = array("l", [0]) * self.zone_count
+        self.occupied_count = 0
+
+    def __len__(self):
+        return self.slot_count
+
+    def is_occupied(self, slot_num):
+        return self.occupied[slot_num] == 1
+
+    def entry_time(self, slot_num):
+        """Returns the entry timestamp of a parked car, or None"""
+        entry = self.entry_times[slot_num]
+        return None if entry == NOT_PARKED else entry
+
+    def exit_time(self, slot_num):
+        """Returns the last exit timestamp of a slot, or None"""
+        exit_time = self.exit_times[slot_num]
+        return None if exit_time == NO_EXIT else exit_time
+
+    def read_slot(self, slot_num):
+        """Returns (occupied, entry, exit, last_duration); same call as SharedSlotState"""
+        return (self.occupied[slot_num] == 1, self.entry_time(slot_num),
+                self.exit_time(slot_num), self.last_durations[slot_num])
+
+    def set_occupied(self, slot_num, timestamp):
+        """
+        Marks a slot occupied from the given entry time.
+        Returns False if the slot was already occupied.
+        """
+        if self.occupied[slot_num]:
+            return False
+        self.occupied[slot_num] = 1
+        self.entry_times[slot_num] = timestamp
+        self.occupied_count += 1
+        self.zone_occupied[self.zones[slot_num]] += 1
+        return True
+
+    def set_empty(self, slot_num, timestamp):
+        """
+        Marks a slot empty at the given exit time.
+        Returns the entry time of the finished stay, or None if the slot
+        was already empty.
+        """
+        if not self.occupied[slot_num]:
+            return None
+        entry = self.entry_times[slot_num]
+        self.occupied[slot_num] = 0
+        self.entry_times[slot_num] = NOT_PARKED
+        self.exit_times[slot_num] = timestamp
+        self.last_durations[slot_num] = timestamp - entry
+        self.occupied_count -= 1
+        self.zone_occupied[self.zones[slot_num]] -= 1
+        return entry
+
+    def free_count(self):
+        return self.slot_count - self.occupied_count
+
+    def occupied_slots(self):
+        """Returns the numbers of all occupied slots in ascending order"""
+        if np is not None:
+            flags = np.frombuffer(self.occupied, dtype=np.uint8)
+            return np.flatnonzero(flags).tolist()
+        found = []
+        start = self.occupied.find(1, 1)
+        while start != -1:
+            found.append(start)
+            start = self.occupied.find(1, start + 1)
+        return found
+
+    def first_free(self):
+        """Returns the lowest-numbered free slot, or None when the lot is full"""
+        slot_num = self.occupied.find(0, 1)
+        return None if slot_num == -1 else slot_num
+
+    def longest_parked(self):
+        """
+        Returns (slot, entry_time) of the car parked the longest.
+        Returns None when every slot is empty.
+        """
+        if not self.occupied_count:
+            return None
+        if np is not None:
+            entries = np.frombuffer(self.entry_times, dtype=np.float64)
+            slot_num = int(entries.argmin())
+            return slot_num, float(entries[slot_num])
+        earliest = min(self.entry_times)
+        return self.entry_times.index(earliest), earliest
+
+    def zone_occupancy(self, zone):
+        """Returns (occupied, total) slot counts for a zone"""
+        return self.zone_occupied[zone], self.zone_sizes[zone]
+
+    def snapshot(self):
+        """
+        Serialises the full state to bytes.
+        The layout is a fixed header followed by the raw arrays.
+        """
+        return b"".join((
+            SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.slot_count, self.zone_count),
+            bytes(self.occupied),
+            self.entry_times.tobytes(),
+            self.exit_times.tobytes(),
+            self.last_durations.tobytes(),
+            self.zones.tobytes(),
+        ))
+
+    @classmethod
+    def restore(cls, data):
+        """Rebuilds a store from bytes produced by snapshot()"""
+        magic, slot_count, _ = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("not a slot state snapshot")
+        store = cls(slot_count)
+        store.load_snapshot(data, zones=True)
+        return store
+
+    def load_snapshot(self, data, zones=False):
+        """
+        Replaces this store's state with a snapshot() of the same size.
+        Updates in place, so existing references to the store stay valid.
+        Zones are configuration rather than state: the store keeps its own
+        unless zones is True.
+        """
+        magic, slot_count, _ = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("not a slot state snapshot")
+        if slot_count != self.slot_count:
+            raise ValueError(f"snapshot has {slot_count} slots, expected {self.slot_count}")
+        size = slot_count + 1
+        view = memoryview(data)[SNAPSHOT_HEADER.size:]
+
+        def take(typecode, length):
+            nonlocal view
+            values = array(typecode)
+            nbytes = values.itemsize * length
+            values.frombytes(view[:nbytes])
+            view = view[nbytes:]
+            return values
+
+        occupied = bytearray(view[:size])
+        view = view[size:]
+        entry_times = take("d", size)
+        exit_times = take("d", size)
+        last_durations = take("d", size)
+        snapshot_zones = take("H", size)
+
+        self.occupied[:] = occupied
+        self.entry_times = entry_times
+        self.exit_times = exit_times
+        self.last_durations = last_durations
+        if zones:
+            self.zones[:] = snapshot_zones
+        self.zone_count = max(self.zones[1:], default=0) + 1
+        self.zone_sizes = array("l", [0]) * self.zone_count
+        for zone in self.zones[1:]:
+            self.zone_sizes[zone] += 1
+        self.zone_occupied = array("l", [0]) * self.zone_count
+        self.occupied_count = occupied.count(1)
+        for slot_num in self.occupied_slots():
+            self.zone_occupied[self.zones[slot_num]] += 1
@@ -0,0 +1,262 @@
+import time
+import tkinter as tk
+from datetime import datetime
+from tkinter import ttk
+
+# ===== Slot Grid Appearance =====
+CELL_WIDTH = 240                  # Width of one slot card in pixels
+CELL_HEIGHT = 140                 # Height of one slot card in pixels
+CELL_PADDING = 8                  # Gap between slot cards
+BACKGROUND = "#2C3E50"
+CARD_COLOR = "#34495E"
+TEXT_COLOR = "#ECF0F1"
+OCCUPIED_COLOR = "#E74C3C"
+EMPTY_COLOR = "#2ECC71"
+
+
+def format_slot_row(slots, slot_num, now=None):
+    """
+    Returns the (status, entry, exit, duration) strings for a slot card.
+    slots is a SlotStateStore or SharedSlotState, read through read_slot()
+    so a card never mixes two states of a slot that another process is
+    writing. Kept free of Tk so it can be benchmarked.
+    """
+    if now is None:
+        now = time.time()
+    occupied, entry_time, exit_time, last_duration = slots.read_slot(slot_num)
+    status = "Occupied" if occupied else "Empty"
+    if entry_time is not None:
+        entry_text = f"Entry: {datetime.fromtimestamp(entry_time).strftime('%Y-%m-%d %H:%M:%S')}"
+        elapsed = now - entry_time
+    else:
+        entry_text = "Entry: N/A"
+        elapsed = last_duration
+    minutes, seconds = divmod(elapsed, 60)
+    duration_text = f"Duration: {int(minutes)} min {int(seconds)} sec"
+    if exit_time is not None:
+        exit_text = f"Exit: {datetime.fromtimestamp(exit_time).strftime('%Y-%m-%d %H:%M:%S')}"
+    else:
+        exit_text = "Exit: N/A"
+    return status, entry_text, exit_text, duration_text
+
+
+class SlotGridView:
+    """
+    Virtualized grid of parking slot cards drawn on a Canvas.
+    Only the cards that are currently scrolled into view exist as canvas
+    items; they are recycled as the user scrolls, so widget count and redraw
+    cost depend on the window size rather than on the number of slots.
+    State changes only mark slots dirty; flush() redraws the dirty cards
+    on screen once each, so any number of changes between two frames
+    costs at most one redraw per visible card.
+    """
+    def __init__(self, parent, slot_count, row_provider):
+        self.slot_count = slot_count
+        self.row_provider = row_provider  # slot -> (status, entry, exit, duration)
+        self.columns = 1
+        self.free_cells = []          # Pooled card item groups not on screen
+        self.visible = {}             # slot -> card currently showing it
+        self.dirty = set()            # Slots to redraw on the next flush()
+
+        self.frame = tk.Frame(parent, bg=BACKGROUND)
+        self.canvas = tk.Canvas(
+            self.frame,
+            bg=BACKGROUND,
+            highlightthickness=0,
+            yscrollcommand=self._on_yscroll
+        )
+        self.scrollbar = ttk.Scrollbar(
+            self.frame, orient="vertical", command=self.canvas.yview
+        )
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", lambda event: self._layout())
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda event: self.canvas.yview_scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.canvas.yview_scroll(1, "units"))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def _on_mousewheel(self, event):
+        self.canvas.yview_scroll(int(-event.delta / 120), "units")
+
+    def _on_yscroll(self, first, last):
+        """Keeps the scrollbar in sync and swaps in newly exposed cards"""
+        self.scrollbar.set(first, last)
+        self._update_visible()
+
+    def _layout(self):
+        """Recomputes the column count and scroll region after a resize"""
+        width = max(self.canvas.winfo_width(), CELL_WIDTH)
+        columns = max(1, width // CELL_WIDTH)
+        rows = -(-self.slot_count // columns)
+        self.canvas.configure(
+            scrollregion=(0, 0, columns * CELL_WIDTH, rows * CELL_HEIGHT),
+            yscrollincrement=CELL_HEIGHT // 4
+        )
+        if columns != self.columns:
+            self.columns = columns
+            self._release_all()
+        self._update_visible()
+
+    def visible_range(self):
+        """Returns the (first, last) slot numbers in view, inclusive"""
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top // CELL_HEIGHT))
+        last_row = int(bottom // CELL_HEIGHT)
+        first = first_row * self.columns + 1
+        last = min(self.slot_count, (last_row + 1) * self.columns)
+        return first, last
+
+    def visible_slots(self):
+        """Returns the slots that currently have a card on screen"""
+        return list(self.visible)
+
+    def _release_all(self):
+        for slot_num in list(self.visible):
+            self._release(slot_num)
+
+    def _release(self, slot_num):
+        """Hides a card and returns it to the pool"""
+        card = self.visible.pop(slot_num)
+        for item in card["items"]:
+            self.canvas.itemconfigure(item, state="hidden")
+        card["texts"] = {}
+        self.free_cells.append(card)
+
+    def _new_card(self):
+        """Creates the canvas items for one slot card"""
+        canvas = self.canvas
+        items = (
+            canvas.create_rectangle(0, 0, 0, 0, fill=CARD_COLOR, outline=""),
+            canvas.create_text(0, 0, fill=TEXT_COLOR, font=("Helvetica", 14, "bold")),
+            canvas.create_text(0, 0, fill=EMPTY_COLOR, font=("Helvetica", 12)),
+            canvas.create_text(0, 0, fill=TEXT_COLOR, font=("Helvetica", 10)),
+            canvas.create_text(0, 0, fill=TEXT_COLOR, font=("Helvetica", 10)),
+            canvas.create_text(0, 0, fill=TEXT_COLOR, font=("Helvetica", 10)),
+        )
+        return {"items": items, "texts": {}}
+
+    def _update_visible(self):
+        """Binds pooled cards to the slots that are now in view"""
+        first, last = self.visible_range()
+        for slot_num in list(self.visible):
+            if slot_num < first or slot_num > last:
+                self._release(slot_num)
+
+        for slot_num in range(first, last + 1):
+            if slot_num in self.visible:
+                continue
+            card = self.free_cells.pop() if self.free_cells else self._new_card()
+            self.visible[slot_num] = card
+            self._place(card, slot_num)
+            self._draw(slot_num, card)
+
+    def _place(self, card, slot_num):
+        """Moves a card's items to the grid position of a slot"""
+        row, column = divmod(slot_num - 1, self.columns)
+        x = column * CELL_WIDTH + CELL_PADDING
+        y = row * CELL_HEIGHT + CELL_PADDING
+        width = CELL_WIDTH - 2 * CELL_PADDING
+        height = CELL_HEIGHT - 2 * CELL_PADDING
+        center = x + width / 2
+        rect, title, status, entry, exit_, duration = card["items"]
+        self.canvas.coords(rect, x, y, x + width, y + height)
+        self.canvas.coords(title, center, y + 18)
+        self.canvas.coords(status, center, y + 44)
+        self.canvas.coords(entry, center, y + 68)
+        self.canvas.coords(exit_, center, y + 88)
+        self.canvas.coords(duration, center, y + 108)
+        for item in card["items"]:
+            self.canvas.itemconfigure(item, state="normal")
+        self.canvas.itemconfigure(title, text=f"Parking Slot {slot_num}")
+
+    def _draw(self, slot_num, card):
+        """Refreshes a card's text, touching only items whose text changed"""
+        status, entry_text, exit_text, duration_text = self.row_provider(slot_num)
+        _, _, status_item, entry_item, exit_item, duration_item = card["items"]
+        texts = card["texts"]
+        if texts.get("status") != status:
+            color = OCCUPIED_COLOR if status == "Occupied" else EMPTY_COLOR
+            self.canvas.itemconfigure(
+                status_item, text=f"Status: {status}", fill=color
+            )
+            texts["status"] = status
+        for key, item, text in (
+            ("entry", entry_item, entry_text),
+            ("exit", exit_item, exit_text),
+            ("duration", duration_item, duration_text),
+        ):
+            if texts.get(key) != text:
+                self.canvas.itemconfigure(item, text=text)
+                texts[key] = text
+
+    def mark_dirty(self, slot_num):
+        """Queues a slot for the next flush(); off-screen slots cost nothing"""
+        self.dirty.add(slot_num)
+
+    def mark_visible_dirty(self, occupied=None):
+        """
+        Queues every slot on screen, or only the occupied ones when
+        occupied (indexable by slot number) is given.
+        """
+        if occupied is None:
+            self.dirty.update(self.visible)
+        else:
+            self.dirty.update(slot_num for slot_num in self.visible if occupied[slot_num])
+
+    def flush(self):
+        """Redraws the dirty slots that are on screen; returns how many"""
+        if not self.dirty:
+            return 0
+        dirty, self.dirty = self.dirty, set()
+        visible = self.visible
+        if len(dirty) > len(visible):
+            slots = [slot_num for slot_num in visible if slot_num in dirty]
+        else:
+            slots = [slot_num for slot_num in dirty if slot_num in visible]
+        for slot_num in slots:
+            self._draw(slot_num, visible[slot_num])
+        return len(slots)
+
+
+class SummaryHeader:
+    """
+    Free/occupied counts and utilisation for the whole lot.
+    The counts follow slot_changed() calls against a private copy of the
+    occupancy, so a change costs O(1) and the lot is never recounted;
+    render() only touches the label when its text changed.
+    """
+    def __init__(self, parent, slot_count):
+        self.slot_count = slot_count
+        self.known = bytearray(slot_count + 1)
+        self.occupied = 0
+        self.text = None
+        self.label = tk.Label(
+            parent, text="", font=("Helvetica", 12, "bold"),
+            fg=TEXT_COLOR, bg=BACKGROUND, anchor="w"
+        )
+
+    def pack(self, **kwargs):
+        self.label.pack(**kwargs)
+
+    def reset(self, occupied):
+        """Takes the starting occupancy (indexable by slot number)"""
+        self.known[:] = bytes(occupied[:self.slot_count + 1])
+        self.occupied = self.known.count(1)
+
+    def slot_changed(self, slot_num, occupied):
+        if self.known[slot_num] != occupied:
+            self.known[slot_num] = occupied
+            self.occupied += 1 if occupied else -1
+
+    def render(self):
+        free = self.slot_count - self.occupied
+        utilisation = self.occupied / self.slot_count if self.slot_count else 0.0
+        text = f"Free: {free}    Occupied: {self.occupied}    Utilisation: {utilisation:.0%}"
+        if text != self.text:
+            self.label.config(text=text)
+            self.text = text
@@ -0,0 +1,114 @@
+import hashlib
+
+import pytest
+
+import auth
+from auth import Authenticator, Session, SessionCache, hash_password, verify_password
+from database import UserStore, open_database
+
+
+@pytest.fixture
+def authenticator(tmp_path):
+    pool = open_database(str(tmp_path / "parking.db"))
+    authenticator = Authenticator(UserStore(pool), session_ttl=60, session_limit=4)
+    yield authenticator
+    authenticator.close()
+    pool.close()
+
+
+def session(token, expires=100.0, user_id=1):
+    return Session(token, user_id, "user", "user", b"", expires)
+
+
+def test_hash_round_trip():
+    stored = hash_password("s3cret")
+    assert stored.startswith("scrypt$" if auth.HAS_SCRYPT else "pbkdf2_sha256$")
+    assert verify_password("s3cret", stored) == (True, False)
+    assert verify_password("s3cret!", stored) == (False, False)
+    # Salted: the same password never hashes the same way twice
+    assert hash_password("s3cret") != stored
+
+
+@pytest.mark.parametrize("stored", ["", "scrypt$x$8$1$00$00", "pbkdf2_sha256$1$zz$00", "md5$abc"])
+def test_malformed_hashes_never_match(stored):
+    assert verify_password("anything", stored) == (False, False)
+
+
+def test_weaker_hash_needs_upgrade(monkeypatch):
+    stored = hash_password("s3cret")
+    monkeypatch.setattr(auth, "SCRYPT_N", auth.SCRYPT_N * 2)
+    monkeypatch.setattr(auth, "PBKDF2_ITERATIONS", auth.PBKDF2_ITERATIONS * 2)
+    assert verify_password("s3cret", stored) == (True, True)
+    assert verify_password("wrong", stored) == (False, False)
+
+
+def test_login_and_wrong_password(authenticator):
+    authenticator.register("alice", "s3cret").result()
+    session = authenticator.login("alice", "s3cret").result()
+    assert session is not None and session.username == "alice"
+    assert authenticator.has_role(session.token, "user")
+    assert authenticator.reauthenticate(session.token, "s3cret")
+    assert not authenticator.reauthenticate(session.token, "wrong")
+    assert authenticator.login("alice", "wrong").result() is None
+    authenticator.logout(session.token)
+    assert authenticator.session(session.token) is None
+
+
+def test_legacy_hash_is_upgraded_on_login(authenticator):
+    legacy = hashlib.sha256(b"s3cret").hexdigest()
+    authenticator.users.add("bob", legacy, "user")
+    assert authenticator.login("bob", "wrong").result() is None
+    assert authenticator.users.find("bob")[1] == legacy
+
+    assert authenticator.login("bob", "s3cret").result() is not None
+    user_id, stored, _ = authenticator.users.find("bob")
+    assert stored != legacy and verify_password("s3cret", stored) == (True, False)
+    # The old hash is gone: it no longer matches, nor can it be swapped back in
+    assert authenticator.login("bob", legacy).result() is None
+    assert not authenticator.users.replace_password(user_id, legacy, legacy)
+    assert authenticator.login("bob", "s3cret").result() is not None
+
+
+def test_unknown_user_is_rejected_after_a_dummy_check(authenticator, monkeypatch):
+    checked = []
+    real_verify = auth.verify_password
+
+    def spy(password, stored):
+        checked.append(stored)
+        return real_verify(password, stored)
+
+    monkeypatch.setattr(auth, "verify_password", spy)
+    assert authenticator.login("nobody", "admin123").result() is None
+    assert checked == [authenticator.dummy_hash]
+    # The dummy hash is made once and reused
+    assert authenticator.login("nobody", "admin123").result() is None
+    assert checked == [authenticator.dummy_hash] * 2
+
+
+def test_sessions_expire_without_use():
+    cache = SessionCache(ttl=10)
+    cache.add(session("a", expires=10.0))
+    assert cache.get("a", now=5.0) is not None   # Use slides the expiry to 15
+    assert cache.get("a", now=14.0) is not None
+    assert cache.get("a", now=24.0) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_session_is_evicted():
+    cache = SessionCache(ttl=10, limit=2)
+    cache.add(session("a"))
+    cache.add(session("b"))
+    assert cache.get("a", now=0.0) is not None   # b is now the least recent
+    cache.add(session("c"))
+    assert cache.get("b", now=0.0) is None
+    assert cache.get("a", now=0.0) is not None
+    assert cache.get("c", now=0.0) is not None
+
+
+def test_remove_user_drops_all_sessions():
+    cache = SessionCache(ttl=10)
+    cache.add(session("a", user_id=1))
+    cache.add(session("b", user_id=2))
+    cache.add(session("c", user_id=1))
+    cache.remove_user(1)
+    assert [cache.get(token, now=0.0) is not None for token in "abc"] == [False, True, False]
@@ -0,0 +1,99 @@
+import random
+import sqlite3
+from array import array
+
+import pytest
+
+import billing
+from billing import DAY, Tariff, TariffTable, reprice
+from migrations import migrate
+from reports import ParkingReports, update_revenue
+
+DAY_START = 1_700_006_400         # A UTC midnight
+
+FLAT = {"bands": [["00:00", "24:00", 360]]}                 # 1 cent per 10 seconds
+BANDS = {
+    "bands": [["07:00", "19:00", 300], ["22:00", "06:00", 60]],
+    "grace_minutes": 15,
+    "daily_cap": 2000,
+}
+
+
+def test_grace_period_and_bands():
+    tariff = Tariff.from_dict(BANDS)
+    # Stays within the grace period are free, longer ones pay from entry
+    assert tariff.charge(DAY_START + 8 * 3600, DAY_START + 8 * 3600 + 900) == 0
+    assert tariff.charge(DAY_START + 8 * 3600, DAY_START + 8 * 3600 + 901) == 76
+    # Between 19:00 and 22:00 is not covered by any band
+    assert tariff.charge(DAY_START + 19 * 3600, DAY_START + 22 * 3600) == 0
+    # The night band wraps past midnight
+    assert tariff.charge(DAY_START + 23 * 3600, DAY_START + DAY + 3600) == 120
+
+
+def test_daily_cap_applies_per_24_hours():
+    tariff = Tariff.from_dict(BANDS)
+    # 12 hours at 300 plus 8 night hours at 60 would be 4080 cents a day
+    assert tariff.charge(DAY_START, DAY_START + DAY) == 2000
+    assert tariff.charge(DAY_START, DAY_START + 3 * DAY) == 6000
+    # Then six night hours, one free hour and one day hour
+    assert tariff.charge(DAY_START, DAY_START + 3 * DAY + 8 * 3600) == 6000 + 360 + 300
+
+
+def test_zone_tariffs():
+    zones = array("H", [0, 0, 1, 1])
+    table = TariffTable(Tariff.from_dict(BANDS), {1: Tariff.from_dict(FLAT)}, zones)
+    entry = DAY_START + 20 * 3600
+    assert table.charge(1, entry, entry + 3600) == 0
+    assert table.charge(2, entry, entry + 3600) == 360
+    # Slots outside the layout are priced as zone 0
+    assert table.charge(9, entry, entry + 3600) == 0
+
+
+def test_vectorised_charges_match_scalar():
+    pytest.importorskip("numpy")
+    rng = random.Random(21)
+    zones = array("H", [rng.randrange(3) for _ in range(101)])
+    table = TariffTable(
+        Tariff.from_dict(BANDS, utc_offset=3600),
+        {1: Tariff.from_dict(FLAT, utc_offset=3600)},
+        zones,
+    )
+    slots = [rng.randrange(110) for _ in range(20_000)]
+    entries = [DAY_START + rng.randrange(30 * DAY) for _ in slots]
+    exits = [entry + rng.choice((rng.randrange(1800), rng.randrange(4 * DAY)))
+             for entry in entries]
+    expected = [table.charge(*stay) for stay in zip(slots, entries, exits)]
+    assert table.charges(slots, entries, exits).tolist() == expected
+
+
+@pytest.mark.parametrize("vectorised", [True, False])
+def test_reprice_updates_charges_and_revenue(tmp_path, monkeypatch, vectorised):
+    if vectorised:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(billing, "np", None)
+    conn = sqlite3.connect(tmp_path / "parking.db")
+    migrate(conn)
+    records = [
+        (1, DAY_START + 3600, DAY_START + 7200, 3600, 100),
+        (2, DAY_START + 3600, DAY_START + 7200, 3600, None),    # Never priced
+        (1, DAY_START + DAY, DAY_START + DAY + 360, 360, 36),   # Already correct
+    ]
+    conn.executemany(
+        "INSERT INTO parking_records (slot, entry_time, exit_time, duration, charge) "
+        "VALUES (?, ?, ?, ?, ?)", records
+    )
+    update_revenue(conn, records)
+    conn.commit()
+    conn.isolation_level = None
+
+    table = TariffTable(Tariff.from_dict(FLAT))
+    assert reprice(conn, table, chunk_size=2) == (3, 2)
+    assert conn.execute("SELECT charge FROM parking_records ORDER BY id").fetchall() == [
+        (360,), (360,), (36,)
+    ]
+    reports = ParkingReports(conn, slot_count=2)
+    assert reports.revenue(DAY_START, DAY_START + DAY) == (2, 720)
+    assert reports.revenue(DAY_START, DAY_START + 2 * DAY) == (3, 756)
+    # Nothing changes the second time
+    assert reprice(conn, table) == (3, 0)
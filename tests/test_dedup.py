@@ -0,0 +1,88 @@
+import pytest
+
+from dedup import RESTART_GAP, SEQ_REORDER_WINDOW, DedupFilter
+from frames import decode_frame, encode_frame
+
+
+class Sink:
+    def __init__(self):
+        self.updates = []
+
+    def put(self, slot_num, status, timestamp):
+        self.updates.append((slot_num, status))
+
+
+@pytest.fixture
+def sink():
+    return Sink()
+
+
+def test_repeats_are_suppressed(sink):
+    dedup = DedupFilter(4, sink)
+    assert dedup.put(1, 1, timestamp=1.0)
+    assert not dedup.put(1, 1, timestamp=2.0)     # Heartbeat
+    assert dedup.put(1, 0, timestamp=3.0)
+    assert dedup.put(2, 0, timestamp=3.0)         # First report is always a change
+    assert sink.updates == [(1, 1), (1, 0), (2, 0)]
+    assert dedup.stats() == {"delivered": 3, "suppressed": 1, "stale": 0}
+
+
+def test_reordered_sequence_is_stale(sink):
+    dedup = DedupFilter(4, sink)
+    dedup.put(1, 1, timestamp=1.0, seq=40)
+    assert not dedup.put(1, 0, timestamp=1.1, seq=39)
+    assert not dedup.put(1, 0, timestamp=1.2, seq=40)
+    assert dedup.put(1, 0, timestamp=1.3, seq=41)
+    assert sink.updates == [(1, 1), (1, 0)]
+    assert dedup.stats()["stale"] == 2
+
+
+def test_restart_sequence_is_accepted(sink):
+    dedup = DedupFilter(4, sink)
+    dedup.put(1, 1, timestamp=1.0, seq=5)
+    assert dedup.put(1, 0, timestamp=1.1, seq=1)
+    # A sequence far below the last one is a restart whose first message was lost
+    dedup.put(1, 1, timestamp=1.2, seq=500)
+    assert dedup.put(1, 0, timestamp=1.3, seq=500 - SEQ_REORDER_WINDOW)
+
+
+def test_restart_after_lost_first_message_and_silence(sink):
+    dedup = DedupFilter(4, sink)
+    dedup.put(1, 1, timestamp=10.0, seq=9)
+    # The controller reboots, its seq=1 message is lost and seq=2 follows
+    # a gap; 9 - 2 is inside the reorder window, yet it must not be stale
+    assert dedup.put(1, 0, timestamp=10.0 + RESTART_GAP + 1, seq=2)
+    assert dedup.put(1, 1, timestamp=10.0 + RESTART_GAP + 2, seq=3)
+    assert sink.updates == [(1, 1), (1, 0), (1, 1)]
+    assert dedup.stats()["stale"] == 0
+
+
+def test_dead_sensors_follow_the_ttl(sink):
+    dedup = DedupFilter(3, sink, ttl=90)
+    dedup.put(1, 1, timestamp=100.0)
+    dedup.put(2, 0, timestamp=150.0)
+    assert dedup.dead_sensors(now=180.0) == []
+    assert dedup.dead_sensors(now=200.0) == [1]   # Slot 3 never reported
+    dedup.put(1, 1, timestamp=200.0)              # A heartbeat revives it
+    assert dedup.dead_sensors(now=250.0) == [2]
+
+
+def test_frames_forward_only_changed_slots(sink):
+    dedup = DedupFilter(8, sink)
+    assert dedup.put_frame("c1", decode_frame(encode_frame(1, [0, 1, 0, 0], seq=1)), 1.0) == 4
+    sink.updates.clear()
+    frame = decode_frame(encode_frame(1, [0, 0, 0, 1], seq=2))
+    assert dedup.put_frame("c1", frame, 2.0) == 2
+    assert sink.updates == [(2, 0), (4, 1)]
+    assert dedup.put_frame("c1", decode_frame(encode_frame(1, [0, 0, 0, 1], seq=3)), 3.0) == 0
+    assert dedup.stats() == {"delivered": 6, "suppressed": 6, "stale": 0}
+
+
+def test_frames_drop_stale_and_accept_restarts(sink):
+    dedup = DedupFilter(8, sink)
+    dedup.put_frame("c1", decode_frame(encode_frame(1, [1, 1], seq=9)), 10.0)
+    assert dedup.put_frame("c1", decode_frame(encode_frame(1, [0, 0], seq=8)), 10.1) == 0
+    assert dedup.stats()["stale"] == 2
+    later = 10.1 + RESTART_GAP + 1
+    assert dedup.put_frame("c1", decode_frame(encode_frame(1, [0, 0], seq=2)), later) == 2
+    assert dedup.dead_sensors(now=later + 1) == []
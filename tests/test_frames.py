@@ -0,0 +1,74 @@
+import pytest
+
+from dedup import DedupFilter
+from frames import HEADER, FrameError, decode_frame, encode_frame
+
+STATES = [1, 0, 0, 1, 1, 0, 1, 0, 0, 1, 1]
+
+
+class Sink:
+    def __init__(self):
+        self.updates = []
+
+    def put(self, slot_num, status, timestamp):
+        self.updates.append((slot_num, status))
+
+
+@pytest.mark.parametrize("timestamp", [None, 1_700_000_000])
+@pytest.mark.parametrize("distances", [None, list(range(20, 31))])
+def test_round_trip(timestamp, distances):
+    payload = encode_frame(5, STATES, seq=70_000, timestamp=timestamp, distances=distances)
+    frame = decode_frame(payload)
+    assert (frame.first_slot, frame.count, frame.seq) == (5, len(STATES), 70_000)
+    assert frame.timestamp == timestamp
+    assert list(frame.states()) == [(5 + i, state) for i, state in enumerate(STATES)]
+    assert (None if frame.distances is None else list(frame.distances)) == distances
+
+
+def test_truncated_frames_are_rejected():
+    payload = encode_frame(1, STATES, seq=1, timestamp=1_700_000_000, distances=[50] * 11)
+    for length in range(len(payload)):
+        with pytest.raises(FrameError):
+            decode_frame(payload[:length])
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda payload: b"\x02" + payload[1:],                 # Unknown version
+    lambda payload: payload[:1] + b"\x80" + payload[2:],   # Unknown flag
+    lambda payload: payload + b"\x00",                     # Trailing bytes
+    lambda payload: payload[:1] + b"\x01" + payload[2:],   # Claims distances it lacks
+])
+def test_corrupt_frames_are_rejected(corrupt):
+    payload = encode_frame(1, STATES, seq=1)
+    with pytest.raises(FrameError):
+        decode_frame(corrupt(payload))
+
+
+def test_header_only_frame_with_no_slots():
+    frame = decode_frame(encode_frame(1, [], seq=3))
+    assert frame.count == 0 and list(frame.states()) == []
+    assert len(encode_frame(1, [], seq=3)) == HEADER.size
+
+
+def test_partial_change_yields_exactly_those_transitions():
+    sink = Sink()
+    dedup = DedupFilter(40, sink)
+    before = [0] * 24
+    dedup.put_frame("c1", decode_frame(encode_frame(10, before, seq=1)), 1.0)
+    sink.updates.clear()
+    after = list(before)
+    for i in (0, 7, 8, 23):
+        after[i] = 1
+    assert dedup.put_frame("c1", decode_frame(encode_frame(10, after, seq=2)), 2.0) == 4
+    assert sink.updates == [(10, 1), (17, 1), (18, 1), (33, 1)]
+    sink.updates.clear()
+    after[8] = 0
+    assert dedup.put_frame("c1", decode_frame(encode_frame(10, after, seq=3)), 3.0) == 1
+    assert sink.updates == [(18, 0)]
+
+
+def test_frame_slots_outside_the_lot_are_ignored():
+    sink = Sink()
+    dedup = DedupFilter(4, sink)
+    assert dedup.put_frame("c1", decode_frame(encode_frame(3, [1, 1, 1, 1], seq=1)), 1.0) == 2
+    assert sink.updates == [(3, 1), (4, 1)]
@@ -0,0 +1,177 @@
+import threading
+
+import pytest
+
+import config
+import persistence
+from engine import ParkingEngine
+from journal import SessionJournal
+from slot_store import SlotStateStore
+
+T0 = 1_700_000_000.0
+
+
+def recovered(path, slot_count=8):
+    """Opens a journal like a restart would; returns (journal, slots, finished)"""
+    slots = SlotStateStore(slot_count)
+    journal = SessionJournal(str(path))
+    finished = journal.recover(slots)
+    return journal, slots, finished
+
+
+def state(slots):
+    return [(slots.is_occupied(n), slots.entry_time(n), slots.exit_time(n))
+            for n in range(1, slots.slot_count + 1)]
+
+
+def log_events(journal, slots, events):
+    """Applies (slot, occupied, timestamp) events to slots and the journal"""
+    for slot_num, occupied, timestamp in events:
+        if occupied:
+            if slots.set_occupied(slot_num, timestamp):
+                journal.log_entry(slot_num, timestamp)
+        elif slots.set_empty(slot_num, timestamp) is not None:
+            journal.log_exit(slot_num, timestamp)
+
+
+def test_crash_recovery_replays_the_journal(tmp_path):
+    path = tmp_path / "parking.journal"
+    journal, slots, finished = recovered(path)
+    assert finished == []
+    log_events(journal, slots, [(1, 1, T0), (2, 1, T0 + 1), (1, 0, T0 + 60), (3, 1, T0 + 70)])
+    expected = state(slots)
+    journal.map.flush()  # Process dies without a checkpoint or close()
+
+    journal, slots, finished = recovered(path)
+    assert state(slots) == expected
+    assert finished == [(1, T0, T0 + 60)]
+    assert journal.events == 4
+
+
+def test_torn_record_ends_the_log(tmp_path):
+    path = tmp_path / "parking.journal"
+    journal, slots, _ = recovered(path)
+    log_events(journal, slots, [(1, 1, T0), (2, 1, T0 + 1)])
+    journal.map[journal.position - 1] ^= 0xFF  # Half-written last record
+    journal.close()
+
+    journal, slots, _ = recovered(path)
+    assert slots.is_occupied(1) and not slots.is_occupied(2)
+    assert journal.events == 1
+
+
+@pytest.mark.parametrize("later_events", [0, 1, 5])
+def test_checkpoint_at_keeps_later_events(tmp_path, later_events):
+    path = tmp_path / "parking.journal"
+    journal, slots, _ = recovered(path)
+    log_events(journal, slots, [(n, 1, T0 + n) for n in range(1, 6)])
+    snapshot, position = slots.snapshot(), journal.position
+    # Exits logged while the checkpoint's flush was in flight
+    log_events(journal, slots, [(n, 0, T0 + 100 + n) for n in range(1, later_events + 1)])
+    expected = state(slots)
+
+    journal.checkpoint_at(snapshot, position)
+    assert journal.events == later_events
+    journal.close()
+
+    journal, slots, finished = recovered(path)
+    assert state(slots) == expected
+    assert finished == [(n, T0 + n, T0 + 100 + n) for n in range(1, later_events + 1)]
+
+
+def test_crash_after_snapshot_before_journal_rewrite(tmp_path):
+    path = tmp_path / "parking.journal"
+    journal, slots, _ = recovered(path)
+    log_events(journal, slots, [(n, 1, T0 + n) for n in range(1, 6)])
+    snapshot, position = slots.snapshot(), journal.position
+    log_events(journal, slots, [(1, 0, T0 + 200)])
+    expected = state(slots)
+
+    # Die right after the snapshot is renamed into place: the journal
+    # rewrite goes to a scratch copy instead of the mapped file
+    mapped = journal.map
+    journal.map = bytearray(mapped)
+    journal.checkpoint_at(snapshot, position)
+    journal.map = mapped
+    journal.close()
+
+    journal, slots, finished = recovered(path)
+    assert state(slots) == expected
+    assert finished == [(1, T0 + 1, T0 + 200)]
+
+
+@pytest.fixture
+def engine_factory(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "METRICS_PORT", 0)
+    monkeypatch.setattr(config, "METRICS_LOG_S", 0)
+    monkeypatch.setattr(config, "capture_path", None)
+    engines = []
+
+    def make():
+        engine = ParkingEngine(
+            slot_count=4, db_path=str(tmp_path / "parking.db"),
+            use_mqtt=False, use_hardware=False, processes=0
+        )
+        engines.append(engine)
+        engine.start()
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+
+def finish_checkpoint(engine):
+    engine.checkpoint()
+    assert engine.pending_checkpoint[0].event.wait(5)
+    engine.finish_checkpoint()
+
+
+def records(engine):
+    return engine.db.reader().execute(
+        "SELECT slot, entry_time, exit_time FROM parking_records"
+    ).fetchall()
+
+
+def test_checkpoint_keeps_stays_that_failed_to_commit(engine_factory, monkeypatch):
+    monkeypatch.setattr(persistence, "INSERT_RECORD", "INSERT INTO missing_table VALUES (?, ?, ?, ?, ?)")
+    engine = engine_factory()
+    engine.start_timer(1, T0)
+    engine.stop_timer(1, T0 + 600)
+    finish_checkpoint(engine)
+    assert engine.journal.events == 2
+    engine.close()
+
+    monkeypatch.undo()
+    engine = engine_factory()
+    assert engine.record_writer.flush(timeout=5)
+    assert records(engine) == [(1, int(T0), int(T0 + 600))]
+
+
+def test_writer_retries_failed_rows(engine_factory, monkeypatch):
+    engine = engine_factory()
+    monkeypatch.setattr(persistence, "INSERT_RECORD", "INSERT INTO missing_table VALUES (?, ?, ?, ?, ?)")
+    engine.start_timer(2, T0)
+    engine.stop_timer(2, T0 + 60)
+    assert not engine.record_writer.flush(timeout=5)
+    assert engine.record_writer.pending() == 1
+
+    monkeypatch.undo()
+    finish_checkpoint(engine)
+    assert engine.journal.events == 0
+    assert records(engine) == [(2, int(T0), int(T0 + 60))]
+
+
+def test_checkpoint_does_not_block(engine_factory, monkeypatch):
+    engine = engine_factory()
+    engine.start_timer(3, T0)
+    gate = threading.Event()
+    monkeypatch.setattr(engine.record_writer, "on_commit", lambda rows: gate.wait(5))
+    engine.stop_timer(3, T0 + 60)
+    engine.checkpoint()              # Returns at once while the writer is stuck
+    assert not engine.pending_checkpoint[0].done()
+    engine.start_timer(4, T0 + 70)   # Logged after the checkpoint's snapshot
+    gate.set()
+    assert engine.pending_checkpoint[0].event.wait(5)
+    engine.finish_checkpoint()
+    assert engine.journal.events == 1
@@ -0,0 +1,102 @@
+import sqlite3
+from datetime import datetime
+
+import migrations
+from migrations import MIGRATIONS, migrate, schema_version
+
+
+def legacy_database(path, rows):
+    """Creates an unversioned database with the original text columns"""
+    conn = sqlite3.connect(path)
+    migrations._create_base_tables(conn)
+    conn.executemany(
+        "INSERT INTO parking_records (id, slot, entry_time, exit_time, duration) "
+        "VALUES (?, ?, ?, ?, ?)", rows
+    )
+    conn.commit()
+    return conn
+
+
+def epoch(text):
+    return int(datetime.strptime(text, migrations.LEGACY_TIME_FORMAT).timestamp())
+
+
+def test_fresh_database_reaches_latest_version(tmp_path):
+    conn = sqlite3.connect(tmp_path / "new.db")
+    assert migrate(conn) == MIGRATIONS[-1][0]
+    assert schema_version(conn) == MIGRATIONS[-1][0]
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(parking_records)")]
+    assert columns == ["id", "slot", "entry_time", "exit_time", "duration", "charge"]
+    # Running again is a no-op
+    assert migrate(conn) == MIGRATIONS[-1][0]
+
+
+def test_legacy_rows_are_converted(tmp_path):
+    conn = legacy_database(tmp_path / "legacy.db", [
+        (1, 1, "2024-03-01 08:00:00", "2024-03-01 09:30:15", "90 min 15 sec"),
+        (2, 2, "2024-03-01 10:00:00", "2024-03-01 10:05:00", None),
+    ])
+    migrate(conn)
+    rows = conn.execute(
+        "SELECT id, slot, entry_time, exit_time, duration, charge "
+        "FROM parking_records ORDER BY id"
+    ).fetchall()
+    assert rows == [
+        (1, 1, epoch("2024-03-01 08:00:00"), epoch("2024-03-01 09:30:15"), 5415, None),
+        (2, 2, epoch("2024-03-01 10:00:00"), epoch("2024-03-01 10:05:00"), 300, None),
+    ]
+    stays, dwell = conn.execute("SELECT SUM(stays), SUM(dwell_seconds) FROM rollup_daily").fetchone()
+    assert (stays, dwell) == (2, 5715)
+
+
+def test_unconvertible_rows_are_kept(tmp_path, capsys):
+    conn = legacy_database(tmp_path / "legacy.db", [
+        (1, 1, "2024-03-01 08:00:00", "2024-03-01 09:00:00", "60 min 0 sec"),
+        (2, 2, "yesterday", "2024-03-01 09:00:00", "60 min 0 sec"),
+        (3, None, "2024-03-01 08:00:00", "2024-03-01 09:00:00", "60 min 0 sec"),
+    ])
+    migrate(conn)
+    assert conn.execute("SELECT id FROM parking_records").fetchall() == [(1,)]
+    kept = conn.execute(
+        "SELECT id, slot, entry_time, reason FROM parking_records_legacy ORDER BY id"
+    ).fetchall()
+    assert [row[:3] for row in kept] == [(2, 2, "yesterday"), (3, None, "2024-03-01 08:00:00")]
+    assert kept[0][3].startswith("unreadable time")
+    assert kept[1][3] == "missing slot"
+    assert "Kept 2 parking records" in capsys.readouterr().out
+
+
+def test_interrupted_backfill_resumes(tmp_path, monkeypatch):
+    rows = [
+        (record_id, record_id % 3 or None, "2024-03-01 08:00:00", "2024-03-01 08:10:00", None)
+        for record_id in range(1, 41)
+    ]
+    conn = legacy_database(tmp_path / "legacy.db", rows)
+    monkeypatch.setattr(migrations, "BACKFILL_CHUNK", 7)
+    migrations._create_base_tables(conn)
+    migrations._set_version(conn, 1)
+    conn.commit()
+
+    # Fail the step after a few chunks have been committed
+    calls = []
+    real_convert = migrations._convert_row
+
+    def failing_convert(row):
+        calls.append(row)
+        if len(calls) == 20:
+            raise sqlite3.OperationalError("disk I/O error")
+        return real_convert(row)
+
+    monkeypatch.setattr(migrations, "_convert_row", failing_convert)
+    try:
+        migrate(conn)
+    except sqlite3.OperationalError:
+        pass
+    assert schema_version(conn) == 1
+
+    monkeypatch.setattr(migrations, "_convert_row", real_convert)
+    migrate(conn)
+    converted = conn.execute("SELECT COUNT(*) FROM parking_records").fetchone()[0]
+    kept = conn.execute("SELECT COUNT(*) FROM parking_records_legacy").fetchone()[0]
+    assert converted == 27
+    assert kept == 13
@@ -0,0 +1,28 @@
+import os
+
+from replay import IR, MQTT, CaptureLog, read_capture, rotated_path
+
+STARTED = 1_700_006_400
+
+
+def test_each_start_gets_its_own_capture(tmp_path):
+    base = str(tmp_path / "capture.bin")
+    first = rotated_path(base, STARTED)
+    assert os.path.dirname(first) == str(tmp_path)
+    assert first.endswith(".bin") and first != base
+
+    log = CaptureLog(first)
+    log.record_message("parking/lot/slot/1", b"occupied", STARTED + 1.5)
+    log.record_edge(1, STARTED + 2.0)
+    log.close()
+
+    # A second start within the same second must not reuse the file
+    second = rotated_path(base, STARTED)
+    assert second != first
+    CaptureLog(second).close()
+
+    assert list(read_capture(first)) == [
+        (MQTT, STARTED + 1.5, "parking/lot/slot/1", b"occupied"),
+        (IR, STARTED + 2.0, 1, b""),
+    ]
+    assert list(read_capture(second)) == []
@@ -0,0 +1,91 @@
+import sqlite3
+
+import migrations
+from migrations import migrate, schema_version
+from reports import DAY, HOUR, ParkingReports, update_revenue, update_rollups, update_slot_rollups
+
+DAY_START = 1_700_006_400         # A UTC midnight
+
+
+def database(path, records):
+    """Migrated database holding records the way RecordWriter commits them"""
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO parking_records (slot, entry_time, exit_time, duration, charge) "
+        "VALUES (?, ?, ?, ?, ?)", records
+    )
+    update_rollups(conn, records)
+    update_slot_rollups(conn, records)
+    update_revenue(conn, records)
+    conn.commit()
+    return conn
+
+
+def stay(slot, exit_time, duration=1800, charge=None):
+    return (slot, exit_time - duration, exit_time, duration, charge)
+
+
+def test_turnover_rate_uses_the_reported_days(tmp_path):
+    # One stay a day in slot 1 for 16 days of the same month
+    records = [stay(1, DAY_START + day * DAY + 12 * HOUR) for day in range(16)]
+    conn = database(tmp_path / "parking.db", records)
+    reports = ParkingReports(conn, slot_count=2)
+
+    end = DAY_START + 15 * DAY + 23 * HOUR
+    # The last 24 hours touch two UTC days, each with one stay
+    assert reports.turnover_by_slot(end - DAY, end) == [(1, 2, 1.0, 1800.0)]
+    assert reports.turnover_by_slot(DAY_START, DAY_START + 16 * DAY) == [(1, 16, 1.0, 1800.0)]
+
+
+def test_revenue_skips_unpriced_stays(tmp_path):
+    conn = database(tmp_path / "parking.db", [
+        stay(1, DAY_START + HOUR, charge=250),
+        stay(2, DAY_START + 2 * HOUR, charge=None),
+        stay(1, DAY_START + DAY + HOUR, charge=100),
+    ])
+    reports = ParkingReports(conn, slot_count=2)
+    assert reports.revenue(DAY_START, DAY_START + DAY) == (1, 250)
+    assert reports.revenue(DAY_START, DAY_START + 2 * DAY) == (2, 350)
+
+
+def test_rollup_backfill_resumes_without_double_counting(tmp_path, monkeypatch):
+    path = tmp_path / "parking.db"
+    conn = sqlite3.connect(path)
+    migrations._create_base_tables(conn)
+    migrations._typed_records(conn)
+    migrations._set_version(conn, 2)
+    conn.commit()
+    records = [stay(slot % 5 + 1, DAY_START + slot * 60) for slot in range(50)]
+    conn.executemany(
+        "INSERT INTO parking_records (slot, entry_time, exit_time, duration) VALUES (?, ?, ?, ?)",
+        [record[:4] for record in records]
+    )
+    conn.commit()
+    monkeypatch.setattr(migrations, "BACKFILL_CHUNK", 8)
+
+    # Stop the hourly/daily backfill after three committed chunks
+    chunks = []
+
+    def failing_fold(conn, rows):
+        if len(chunks) == 3:
+            raise sqlite3.OperationalError("database is locked")
+        chunks.append(len(rows))
+        update_rollups(conn, rows)
+
+    monkeypatch.setattr(migrations, "update_rollups", failing_fold)
+    steps = [(3, "rollups", migrations._rollups)]
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:2] + steps)
+    try:
+        migrate(conn)
+    except sqlite3.OperationalError:
+        pass
+    assert schema_version(conn) == 2
+    assert conn.execute("SELECT last_id FROM migration_progress").fetchone() == (24,)
+
+    monkeypatch.undo()
+    migrate(conn)
+    assert conn.execute("SELECT COUNT(*) FROM migration_progress").fetchone() == (0,)
+    assert conn.execute("SELECT SUM(stays) FROM rollup_daily").fetchone() == (50,)
+    assert conn.execute("SELECT SUM(departures) FROM rollup_hourly").fetchone() == (50,)
+    assert conn.execute("SELECT SUM(stays) FROM rollup_slot_daily").fetchone() == (50,)
@@ -0,0 +1,131 @@
+import functools
+import sqlite3
+import threading
+import time
+from multiprocessing import shared_memory
+
+import pytest
+
+import config
+from database import open_database
+from shared_ingest import IngestCluster, SharedSlotState
+from slot_store import NOT_PARKED
+
+
+class ScriptedTransport:
+    """MQTT stand-in that publishes a fixed list of (topic, payload) once started"""
+    def __init__(self, messages):
+        self.messages = messages
+
+    def connect(self):
+        pass
+
+    def start(self, patterns, on_message):
+        def run():
+            for topic, payload in self.messages:
+                time.sleep(0.05)
+                on_message(topic, payload)
+        threading.Thread(target=run, daemon=True).start()
+
+    def close(self):
+        pass
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def state():
+    state = SharedSlotState(4)
+    yield state
+    state.close()
+
+
+def test_read_waits_while_a_write_is_in_progress(state):
+    state.set_occupied(2, 100.0)
+    state.versions[2] += 1            # A writer is half way through
+    result = []
+    reader = threading.Thread(target=lambda: result.append(state.read_slot(2)))
+    reader.start()
+    reader.join(0.2)
+    assert reader.is_alive() and result == []
+
+    state.occupied[2] = 0
+    state.entry_times[2] = NOT_PARKED
+    state.exit_times[2] = 160.0
+    state.last_durations[2] = 60.0
+    state.versions[2] += 1
+    reader.join(5)
+    assert result == [(False, None, 160.0, 60.0)]
+
+
+def test_read_retries_when_a_write_lands_mid_read(state, monkeypatch):
+    state.set_occupied(1, 100.0)
+    real_entry_time = state.entry_time
+    reads = []
+
+    def racing_entry_time(slot_num):
+        value = real_entry_time(slot_num)
+        if not reads:
+            state.set_empty(1, 130.0)  # Another process writes after this field was read
+        reads.append(value)
+        return value
+
+    monkeypatch.setattr(state, "entry_time", racing_entry_time)
+    # Never a mix of the occupied flag from before and the exit from after
+    assert state.read_slot(1) == (False, None, 130.0, 30.0)
+    assert reads == [100.0, None]
+
+
+def test_changed_slots_follow_writes(state):
+    state.changed_slots()
+    state.set_occupied(3, 10.0)
+    state.set_occupied(1, 11.0)
+    assert sorted(state.changed_slots()) == [1, 3]
+    assert state.changed_slots() == []
+
+
+def test_cluster_applies_updates_and_persists_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "tariff_path", None)
+    db_path = str(tmp_path / "parking.db")
+    open_database(db_path).close()
+    messages = [
+        ("parking/north/slots/1", b"occupied"),
+        ("parking/north/slots/2", b"occupied"),
+        ("parking/north/slots/1", b"occupied"),   # Heartbeat
+        ("parking/north/slots/1", b"empty"),
+    ]
+    # One ingest worker and the writer process
+    cluster = IngestCluster(
+        {"north": 4}, db_path, str(tmp_path / "parking.journal"), 1,
+        functools.partial(ScriptedTransport, messages)
+    )
+    cluster.start()
+    try:
+        assert wait_for(lambda: cluster.received() == len(messages))
+        slots = cluster.slots
+        assert wait_for(lambda: slots.read_slot(1)[2] is not None)
+        assert [slots.read_slot(n)[0] for n in range(1, 5)] == [False, True, False, False]
+        assert cluster.dedup_stats() == {"delivered": 3, "suppressed": 1, "stale": 0}
+        assert len(cluster.workers) == 1 and cluster.writer.is_alive()
+        name = slots.name
+    finally:
+        cluster.stop()
+
+    # The writer drained its queue and committed the finished stay on stop
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT slot, charge FROM parking_records").fetchall()
+    conn.close()
+    assert len(rows) == 1 and rows[0][0] == 1 and rows[0][1] is not None
+
+    # stop() joined every process and freed the shared memory block
+    assert cluster.slots is None and cluster.writer is None and cluster.workers == []
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+    cluster.stop()                    # A second stop is harmless
@@ -0,0 +1,68 @@
+import json
+import random
+
+from slot_layout import ACCESSIBLE, EV, NearestSlotAllocator, SlotLayout, load_layout, parse_flags
+
+
+def random_layout(rng, slot_count):
+    layout = SlotLayout(slot_count, {"main": (0, 0.0, 0.0), "north": (2, 40.0, 90.0)})
+    for slot_num in range(1, slot_count + 1):
+        layout.set_slot(
+            slot_num, rng.randrange(3), rng.randrange(4),
+            rng.uniform(0, 100), rng.uniform(0, 100), rng.choice((0, 0, 0, EV, ACCESSIBLE))
+        )
+    return layout
+
+
+def brute_force(layout, occupied, entrance, flags, zone):
+    candidates = [
+        (layout.distance(slot_num, entrance), slot_num)
+        for slot_num in range(1, layout.slot_count + 1)
+        if not occupied[slot_num] and layout.flags[slot_num] & flags == flags
+        and (zone is None or layout.zones[slot_num] == zone)
+    ]
+    return min(candidates)[1] if candidates else None
+
+
+def test_nearest_free_matches_brute_force_under_churn():
+    rng = random.Random(22)
+    layout = random_layout(rng, 300)
+    occupied = bytearray(rng.random() < 0.5 for _ in range(301))
+    occupied[0] = 0
+    allocator = NearestSlotAllocator(layout, occupied)
+    for _ in range(5000):
+        slot_num = rng.randrange(1, 301)
+        if occupied[slot_num]:
+            occupied[slot_num] = 0
+            allocator.release(slot_num)
+        else:
+            occupied[slot_num] = 1
+        entrance = rng.choice(("main", "north"))
+        flags = rng.choice((0, EV, ACCESSIBLE))
+        zone = rng.choice((None, 0, 1, 2, 3))
+        assert allocator.nearest_free(entrance, flags, zone) == brute_force(
+            layout, occupied, entrance, flags, zone
+        )
+
+
+def test_full_lot_has_no_free_slot():
+    layout = SlotLayout(3)
+    occupied = bytearray([0, 1, 1, 1])
+    allocator = NearestSlotAllocator(layout, occupied)
+    assert allocator.nearest_free() is None
+    occupied[2] = 0
+    allocator.release(2)
+    assert allocator.nearest_free() == 2
+
+
+def test_load_layout(tmp_path):
+    path = tmp_path / "layout.json"
+    path.write_text(json.dumps({
+        "entrances": {"east": [1, 10, 0]},
+        "slots": [[2, 1, 3, 12.0, 0.0, ["ev"]], [3, 0, 1, 0.0, 0.0, "ev,accessible"]],
+    }))
+    layout = load_layout(str(path), 4)
+    assert list(layout.zones) == [0, 0, 3, 1, 0]
+    assert layout.flags[3] == parse_flags("ev,accessible") == EV | ACCESSIBLE
+    assert layout.distance(2, "east") == 2.0
+    assert layout.describe(2) == "Slot 2: level 1, zone 3 (ev)"
@@ -0,0 +1,114 @@
+from timer_wheel import TimerWheel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_until(wheel, clock, seconds, step=0.01):
+    """Advances the fake clock in small steps, like a driving loop would"""
+    end = clock.now + seconds
+    while clock.now < end:
+        clock.now = round(clock.now + step, 6)
+        wheel.advance()
+
+
+def test_call_later_fires_after_delay():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.05, size=8, clock=clock)
+    fired = []
+    wheel.call_later(0.2, lambda: fired.append(clock.now))
+    run_until(wheel, clock, 1.0)
+    assert len(fired) == 1
+    assert 0.2 <= fired[0] <= 0.25
+
+
+def test_reschedule_from_callback_fires_next_tick():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.05, size=8, clock=clock)
+    fired = []
+
+    def again():
+        fired.append(clock.now)
+        if len(fired) < 5:
+            wheel.call_later(0.05, again)
+
+    wheel.call_later(0.05, again)
+    run_until(wheel, clock, 1.0)
+    assert len(fired) == 5
+    gaps = [b - a for a, b in zip(fired, fired[1:])]
+    # One tick apart, not a full lap of the wheel (8 ticks)
+    assert all(0.04 <= gap <= 0.06 for gap in gaps)
+
+
+def test_zero_delay_from_callback_is_not_lost():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.05, size=8, clock=clock)
+    fired = []
+    wheel.call_later(0.05, lambda: wheel.call_later(0, lambda: fired.append(clock.now)))
+    run_until(wheel, clock, 0.2)
+    assert fired and fired[0] <= 0.11
+
+
+def test_call_every_keeps_its_period_and_cancels():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.05, size=8, clock=clock)
+    fired = []
+    handle = wheel.call_every(0.1, lambda: fired.append(clock.now))
+    run_until(wheel, clock, 1.0)
+    assert len(fired) == 10
+    handle.cancel()
+    run_until(wheel, clock, 1.0)
+    assert len(fired) == 10
+    assert wheel.active == 0
+
+
+def test_long_delay_wraps_the_wheel():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.05, size=8, clock=clock)
+    fired = []
+    wheel.call_later(1.0, lambda: fired.append(clock.now))  # 20 ticks on an 8-slot wheel
+    run_until(wheel, clock, 0.9)
+    assert fired == []
+    run_until(wheel, clock, 0.2)
+    assert len(fired) == 1 and 1.0 <= fired[0] <= 1.05
+
+
+def test_idle_wheel_sleeps_until_the_next_due_timer():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.05, size=64, clock=clock)
+    # Nothing scheduled: sleep a whole lap rather than one tick
+    assert abs(wheel.time_until_next() - 64 * 0.05) < 1e-9
+    wheel.call_every(1.0, lambda: None)
+    assert abs(wheel.time_until_next() - 1.0) < 1e-9
+    run_until(wheel, clock, 1.0)
+    assert abs(wheel.time_until_next() - 1.0) < 0.011
+    # A cancelled timer does not wake the driver
+    handle = wheel.call_later(0.2, lambda: None)
+    assert wheel.time_until_next() < 0.25
+    handle.cancel()
+    assert wheel.time_until_next() > 0.9
+
+
+def test_scheduling_before_the_wake_up_notifies_the_driver():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=0.05, size=64, clock=clock)
+    woken = []
+    wheel.on_earlier = lambda: woken.append(wheel.time_until_next())
+    wheel.call_every(1.0, lambda: None)
+    assert woken == []                # No driver asleep yet
+    wheel.time_until_next()
+    wheel.call_later(2.0, lambda: None)
+    assert woken == []                # Due after the wake-up
+    wheel.call_later(0.1, lambda: None)
+    assert len(woken) == 1 and abs(woken[0] - 0.1) < 1e-9
+    # Timers scheduled by callbacks wait for the driver's next call
+    wheel.call_later(0.05, lambda: wheel.call_later(0.05, lambda: None))
+    assert len(woken) == 2
+    clock.now = 0.06
+    wheel.advance()
+    assert len(woken) == 2
@@ -0,0 +1,153 @@
+import time
+
+# ===== Timer Wheel Configuration =====
+DEFAULT_TICK = 0.1                # Seconds per wheel slot; timers fire on tick boundaries
+DEFAULT_SIZE = 512                # Wheel slots; longer delays wrap around
+
+
+class TimerHandle:
+    """Returned by TimerWheel.call_later/call_every; cancel() stops the timer"""
+    __slots__ = ("due_tick", "interval_ticks", "callback", "args", "cancelled")
+
+    def __init__(self, due_tick, interval_ticks, callback, args):
+        self.due_tick = due_tick
+        self.interval_ticks = interval_ticks  # 0 for one-shot timers
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Stops the timer; safe to call more than once or from its own callback"""
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel that runs all periodic work from one driver.
+    Timers are bucketed by due tick, so scheduling and cancelling are
+    O(1) and a tick only looks at one bucket. A periodic timer is a single
+    handle that re-arms itself, so there is never more than one chain per
+    job, and cancelling the handle is enough to stop it for good.
+    The owner calls advance() from one thread (the Tk loop or the engine
+    loop); callbacks run on that thread.
+    """
+    def __init__(self, tick=DEFAULT_TICK, size=DEFAULT_SIZE, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self.buckets = [[] for _ in range(size)]
+        self.current_tick = 0         # Next tick to process; advanced before a tick's callbacks run
+        self.start = clock()
+        self.active = 0               # Timers scheduled and not yet dropped
+        self.wake_tick = None         # Tick the driver sleeps until, see time_until_next()
+        self.on_earlier = None        # Called when a timer is scheduled before wake_tick
+
+    def _ticks(self, delay):
+        return max(1, int(-(-delay // self.tick)))
+
+    def _insert(self, handle):
+        self.buckets[handle.due_tick % len(self.buckets)].append(handle)
+
+    def _schedule(self, handle):
+        self._insert(handle)
+        self.active += 1
+        if self.wake_tick is not None and handle.due_tick < self.wake_tick:
+            # Scheduled outside advance() while the driver sleeps past it
+            self.wake_tick = handle.due_tick
+            if self.on_earlier is not None:
+                self.on_earlier()
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        """Runs callback(*args) once after delay seconds"""
+        return self._schedule(
+            TimerHandle(self.current_tick + self._ticks(delay) - 1, 0, callback, args)
+        )
+
+    def call_every(self, interval, callback, *args, first=None):
+        """
+        Runs callback(*args) every interval seconds, first after first
+        seconds (default: one interval).
+        """
+        ticks = self._ticks(interval)
+        delay = interval if first is None else first
+        return self._schedule(
+            TimerHandle(self.current_tick + self._ticks(delay) - 1, ticks, callback, args)
+        )
+
+    def next_deadline(self):
+        """Returns the clock time at which the next tick is due"""
+        return self.start + (self.current_tick + 1) * self.tick
+
+    def next_due_tick(self):
+        """
+        Returns the first tick whose bucket holds a timer due on that lap,
+        looking at most one lap ahead (the lap's last tick if none is).
+        """
+        buckets = self.buckets
+        size = len(buckets)
+        first = self.current_tick
+        for tick in range(first, first + size):
+            for handle in buckets[tick % size]:
+                if handle.due_tick <= tick and not handle.cancelled:
+                    return tick
+        return first + size - 1
+
+    def time_until_next(self, now=None):
+        """
+        Returns the seconds until the next timer is due, never negative
+        and at most one lap of the wheel, so an idle driver can sleep.
+        The wake-up tick is remembered: scheduling anything earlier before
+        the next advance() calls on_earlier, so the driver can wake sooner.
+        """
+        if now is None:
+            now = self.clock()
+        self.wake_tick = tick = self.next_due_tick()
+        return max(0.0, self.start + (tick + 1) * self.tick - now)
+
+    def advance(self, now=None):
+        """
+        Runs every timer that came due up to now.
+        Returns the number of callbacks run.
+        """
+        if now is None:
+            now = self.clock()
+        self.wake_tick = None         # The driver asks time_until_next() again afterwards
+        target = int((now - self.start) / self.tick)
+        ran = 0
+        size = len(self.buckets)
+        while self.current_tick < target:
+            tick = self.current_tick
+            bucket = self.buckets[tick % size]
+            if bucket:
+                keep = []
+                due = []
+                for handle in bucket:
+                    if handle.cancelled:
+                        self.active -= 1
+                    elif handle.due_tick <= tick:
+                        due.append(handle)
+                    else:
+                        keep.append(handle)  # Due on a later lap of the wheel
+                self.buckets[tick % size] = keep
+                # Timers scheduled by these callbacks start from the next tick,
+                # never the bucket that was just taken
+                self.current_tick = tick + 1
+                for handle in due:
+                    if handle.cancelled:
+                        self.active -= 1
+                        continue
+                    try:
+                        handle.callback(*handle.args)
+                    except Exception as e:
+                        name = getattr(handle.callback, "__name__", handle.callback)
+                        print(f"Error in timer {name}: {e}")
+                    ran += 1
+                    if handle.interval_ticks and not handle.cancelled:
+                        # Re-arm from the tick it was due, so the period does not
+                        # drift; after a stall, resume from now instead of catching up
+                        handle.due_tick = max(tick, target - 1) + handle.interval_ticks
+                        self._insert(handle)
+                    else:
+                        self.active -= 1
+            self.current_tick = tick + 1
+        return ran